@@ -0,0 +1,118 @@
+""" Benchmarks for geodesy conversions, distances and time conversions
+
+Written in the asv format (time_* and peakmem_* methods, params) so the same
+classes can be run by asv or by benchmarks/run.py.
+"""
+import numpy
+
+import geodesy.conversions
+import geodesy.distance
+
+N_POINTS = [1, 1000, 1000000]
+
+# minimum points per second at 1e6 points, checked by run.py --check
+THROUGHPUT_TARGETS = {
+    'Conversions.time_lla_to_xyz': 1.0e7,
+    'Conversions.time_xyz_to_lla': 4.0e6,
+    'Conversions.time_lla_to_ned': 5.0e6,
+    'Conversions.time_ned_to_lla': 3.0e6,
+    'Distance.time_get_distance': 1.0e7,
+    'Distance.time_vincenty': 5.0e5,
+    'TimeConversions.time_datetime_to_gps': 1.0e7,
+    'TimeConversions.time_gps_to_unix': 5.0e6,
+    'TimeConversions.time_unix_to_gps': 5.0e6,
+    }
+
+def random_lla(n_points, seed=0):
+    """ Generate random lat/lon/alt points
+
+    Arguments:
+        n_points: number of points
+        seed: optional random seed
+
+    Returns:
+        lla: n_pointsx3 numpy array of lat/lon/alt in radians and meters
+    """
+    rng = numpy.random.RandomState(seed)
+    lla = numpy.empty((n_points, 3))
+    lla[:, 0] = rng.uniform(-numpy.pi / 2.0, numpy.pi / 2.0, n_points)
+    lla[:, 1] = rng.uniform(-numpy.pi, numpy.pi, n_points)
+    lla[:, 2] = rng.uniform(-100.0, 1.0e4, n_points)
+    return lla
+
+class Conversions(object):
+    """ Coordinate conversions between lla, ecef and ned
+    """
+    params = N_POINTS
+    param_names = ['n_points']
+
+    def setup(self, n_points):
+        self.lla = random_lla(n_points)
+        self.lla_ref = numpy.array([[0.6, -1.5, 100.0]])
+        self.xyz = geodesy.conversions.lla_to_xyz(self.lla)
+        self.ned = geodesy.conversions.lla_to_ned(self.lla, self.lla_ref)
+
+    def time_lla_to_xyz(self, n_points):
+        geodesy.conversions.lla_to_xyz(self.lla)
+
+    def time_xyz_to_lla(self, n_points):
+        geodesy.conversions.xyz_to_lla(self.xyz)
+
+    def time_lla_to_ned(self, n_points):
+        geodesy.conversions.lla_to_ned(self.lla, self.lla_ref)
+
+    def time_ned_to_lla(self, n_points):
+        geodesy.conversions.ned_to_lla(self.ned, self.lla_ref)
+
+    def peakmem_lla_to_ned(self, n_points):
+        geodesy.conversions.lla_to_ned(self.lla, self.lla_ref)
+
+    def peakmem_ned_to_lla(self, n_points):
+        geodesy.conversions.ned_to_lla(self.ned, self.lla_ref)
+
+class Distance(object):
+    """ Element-wise distances between two sets of points
+    """
+    params = N_POINTS
+    param_names = ['n_points']
+
+    def setup(self, n_points):
+        self.lla0 = random_lla(n_points, 0)
+        self.lla1 = random_lla(n_points, 1)
+
+    def time_get_distance(self, n_points):
+        geodesy.conversions.get_distance(self.lla0, self.lla1)
+
+    def time_vincenty(self, n_points):
+        geodesy.distance.vincenty(self.lla0, self.lla1)
+
+    def peakmem_vincenty(self, n_points):
+        geodesy.distance.vincenty(self.lla0, self.lla1)
+
+class TimeConversions(object):
+    """ Conversions between datetime, gps and unix time
+    """
+    params = N_POINTS
+    param_names = ['n_points']
+
+    def setup(self, n_points):
+        rng = numpy.random.RandomState(0)
+        # stay inside the leap second table, 1980 to 2025
+        self.unix = rng.uniform(3.2e8, 1.75e9, n_points)
+        self.gps = geodesy.conversions.unix_to_gps(self.unix)
+        self.epochs = (
+            numpy.datetime64('1970-01-01T00:00:00', 'us') +
+            (self.unix * 1.0e6).astype('timedelta64[us]'))
+        if n_points == 1:
+            self.unix = float(self.unix[0])
+            self.gps = float(self.gps[0])
+            self.epochs = self.epochs[0].tolist()
+
+    def time_datetime_to_gps(self, n_points):
+        geodesy.conversions.datetime_to_gps(self.epochs)
+
+    def time_gps_to_unix(self, n_points):
+        geodesy.conversions.gps_to_unix(self.gps)
+
+    def time_unix_to_gps(self, n_points):
+        geodesy.conversions.unix_to_gps(self.unix)
@@ -0,0 +1,68 @@
+""" Benchmarks for parsing nmea sentences
+
+Written in the asv format (time_* methods, params) so the same classes can be
+run by asv or by benchmarks/run.py. The point count is the number of RMC
+sentences, so throughputs are in sentences per second.
+"""
+import random
+
+import parsers.nmea
+
+N_SENTENCES = [1000, 100000]
+
+# minimum sentences per second at 1e5 sentences, checked by run.py --check
+THROUGHPUT_TARGETS = {
+    'NMEAParsing.time_parse_string': 1.5e5,
+    'NMEAParsing.time_feed': 1.5e5,
+    }
+
+def rmc_sentences(n_sentences, seed=0):
+    """ Generate RMC sentences at 1 Hz
+
+    Arguments:
+        n_sentences: number of sentences
+        seed: optional random seed
+
+    Returns:
+        text: string of newline terminated sentences
+    """
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n_sentences):
+        seconds = 36000 + i
+        body = 'GPRMC,{:02d}{:02d}{:02d}.00,A,40{:07.4f},N,105{:07.4f},W,'\
+            '{:.1f},{:.1f},{:02d}0722,,,A'.format(
+                seconds // 3600 % 24, seconds // 60 % 60, seconds % 60,
+                rng.uniform(0.0, 59.9), rng.uniform(0.0, 59.9),
+                rng.uniform(0.0, 90.0), rng.uniform(0.0, 359.0),
+                15 + seconds // 86400)
+        checksum = 0
+        for character in body:
+            checksum ^= ord(character)
+        lines.append('${}*{:02X}\r\n'.format(body, checksum))
+    return ''.join(lines)
+
+class NMEAParsing(object):
+    """ Parsing RMC sentences line by line, as text and as a byte stream
+    """
+    params = N_SENTENCES
+    param_names = ['n_sentences']
+
+    def setup(self, n_sentences):
+        self.text = rmc_sentences(n_sentences)
+        self.lines = self.text.split('\n')
+        data = self.text.encode('ascii')
+        self.chunks = [data[i:i + 4096] for i in range(0, len(data), 4096)]
+
+    def time_parse_sentence(self, n_sentences):
+        parser = parsers.nmea.NMEA()
+        for line in self.lines:
+            parser.parse_sentence(line)
+
+    def time_parse_string(self, n_sentences):
+        parsers.nmea.NMEA(string_data=self.text)
+
+    def time_feed(self, n_sentences):
+        parser = parsers.nmea.NMEA()
+        for chunk in self.chunks:
+            parser.feed(chunk)
@@ -0,0 +1,300 @@
+""" Correctness checks for the nmea, Perlan and IGC parsers
+
+Each check_* function raises AssertionError (or whatever the parser raised)
+if the parsers misbehave. Run them all with
+
+    python benchmarks/check_nmea.py
+
+which prints a line per check and exits non-zero if any failed.
+"""
+import asyncio
+import datetime
+import os
+import sys
+import traceback
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+import geodesy.conversions
+import parsers.igc
+import parsers.nmea
+import parsers.nmea_asyncio
+import parsers.perlan
+
+import bench_nmea
+
+# lines whose checksum field holds bytes which aren't hex digits
+_GARBAGE_CHECKSUM_LINES = (
+    b'$GPRMC,1*\xff\xff',
+    b'$GPRMC,1*\x00\x7f',
+    b'$GPRMC,1*G0',
+    b'$GPRMC,1*\xc4\x80A',
+    b'$GPRMC,1*',
+    b'$GPRMC,1*0',
+    b'*\xff$GPRMC*\xff',
+    )
+
+def check_garbage_checksums():
+    """ Sentences with garbage checksums are dropped, not raised
+    """
+    valid = bench_nmea.rmc_sentences(1).encode('ascii')
+    garbage = b'\r\n'.join(_GARBAGE_CHECKSUM_LINES) + b'\r\n'
+
+    parser = parsers.nmea.NMEA()
+    # short chunks are split line by line, long ones framed with numpy
+    for chunk in (garbage, garbage * 4 + valid, valid + garbage):
+        for line in chunk.split(b'\n'):
+            parser.feed(line + b'\n')
+        parser.feed(chunk)
+    assert len(parser.latitude()[0]) == 4, 'valid sentences were lost'
+
+    for line in _GARBAGE_CHECKSUM_LINES:
+        text = line.decode('latin-1')
+        # a known sentence id with bad data gives None for the data
+        assert not parser.parse_sentence(text)[1]
+        assert parser.parse_rmc(text) is None
+        assert not parser.verify_checksum(text)
+    assert not parser.parse_sentence(u'$GPRMC,1*\u0100A')[1]
+
+    perlan = parsers.perlan.PerlanParser()
+    perlan.feed(b'\r\n'.join(
+        b'0:' + line for line in _GARBAGE_CHECKSUM_LINES * 4) + b'\r\n')
+    assert len(perlan.latitude()[0]) == 0
+
+def _rmc_sentence(time_of_day, date):
+    """ Make an RMC sentence with a valid checksum
+
+    Arguments:
+        time_of_day: hhmmss.ss time field
+        date: ddmmyy date field
+
+    Returns:
+        sentence: newline terminated string
+    """
+    body = 'GPRMC,{},A,4000.0000,N,10500.0000,W,1.0,1.0,{},,,A'.format(
+        time_of_day, date)
+    checksum = 0
+    for character in body:
+        checksum ^= ord(character)
+    return '${}*{:02X}\r\n'.format(body, checksum)
+
+def _latin_1_rmc_lines():
+    """ RMC lines with a byte above 127 in an unused field
+
+    Returns:
+        lines: list of bytes lines, alternately with the checksum of the raw
+            bytes (which matches) and of the byte replaced by ? (which
+            doesn't)
+    """
+    lines = []
+    for second in range(10):
+        sentence = _rmc_sentence('1200{:02d}.00'.format(second), '150722')
+        body = sentence[1:sentence.index('*')].encode('ascii')
+        body = body.replace(b',,,A', b',\xe9,,A')
+        replaced = body.replace(b'\xe9', b'?')
+        checksum = 0
+        for byte in bytearray(body if second % 2 == 0 else replaced):
+            checksum ^= byte
+        lines.append(b'$' + body + '*{:02X}\r\n'.format(checksum).encode())
+    return lines
+
+def check_latin_1_checksums():
+    """ Short and framed buffers checksum the same bytes of a line
+    """
+    lines = _latin_1_rmc_lines()
+    start, stop, framed_ok = parsers.nmea._frame_lines(b''.join(lines))
+    split_ok = [
+        parsers.nmea._split_sentence(line.decode('latin-1'))[1]
+        for line in lines]
+    assert framed_ok == split_ok == [True, False] * 5
+
+    short = parsers.nmea.NMEA()
+    for line in lines:
+        short.feed(line)
+    framed = parsers.nmea.NMEA()
+    framed.feed(b''.join(lines * 2))
+    assert len(short.latitude()[0]) == 5
+    assert len(framed.latitude()[0]) == 10
+
+def _midnight(year, month, day):
+    """ gps time at the start of a date
+    """
+    return geodesy.conversions.datetime_to_gps(
+        datetime.datetime(year, month, day))
+
+def check_gps_times():
+    """ RMC and B record times across midnight and across a leap second
+
+    Times are on the TAI scale, so every day is 86400 s long and the leap
+    second 2016-12-31 23:59:60 lands on 2017-01-01 00:00:00.
+    """
+    new_year = _midnight(2016, 12, 31)
+    assert _midnight(2017, 1, 1) == new_year + 86400.0
+    summer = _midnight(2022, 7, 15)
+
+    rmc = (
+        ('235959.50', '311216', new_year + 86399.5),
+        ('235960.00', '311216', new_year + 86400.0),
+        ('000000.00', '010117', new_year + 86400.0),
+        ('000000.75', '010117', new_year + 86400.75),
+        ('120012.50', '150722', summer + 43212.5),
+        ('235959.00', '150722', summer + 86399.0),
+        ('000001.00', '160722', summer + 86401.0),
+        )
+    text = ''.join(_rmc_sentence(t, d) for (t, d, _) in rmc)
+    expected = [time for (_, _, time) in rmc]
+    # the second parser meets each date again with its offset remembered
+    parser = parsers.nmea.NMEA(string_data=text)
+    parser.parse_string(text)
+    assert parser.latitude()[0].tolist() == expected * 2
+    for sentence in text.splitlines():
+        assert parser.parse_sentence(sentence, save=False)[1][0] in expected
+
+    records = b''.join(
+        b'B' + time_of_day + b'4000000N10500000WA0100001000\r\n'
+        for time_of_day in (b'235959', b'235960', b'000000', b'000001'))
+    expected = [new_year + seconds for seconds in (
+        86399.0, 86400.0, 86400.0, 86401.0)]
+    date = datetime.date(2016, 12, 31)
+    for _ in range(2):
+        fixes = parsers.igc.decode_b_records(records, date)
+        assert fixes['time'].tolist() == expected
+    # decoded in two parts, the day rollover is carried by last_time
+    split = len(records) // 2
+    first = parsers.igc.decode_b_records(records[:split], date)
+    second = parsers.igc.decode_b_records(
+        records[split:], date, first['time'][-1])
+    assert first['time'].tolist() + second['time'].tolist() == expected
+
+async def _tcp_sources(logs, n_sentences, max_queued):
+    """ Send logs over concurrent TCP connections to one parser
+
+    Arguments:
+        logs: list of bytes, each sent by its own connection in small
+            chunks which split lines
+        n_sentences: number of valid sentences in the logs
+        max_queued: size of the SentenceStream the sentences go to
+
+    Returns:
+        parser: the NMEA parser fed by every connection
+        sentences: list of (sentence_id, data, source) from the stream
+    """
+    parser = parsers.nmea.NMEA()
+    stream = parsers.nmea_asyncio.SentenceStream(max_queued)
+    server = await parsers.nmea_asyncio.serve_tcp(
+        parser, '127.0.0.1', 0, stream=stream)
+    port = server.sockets[0].getsockname()[1]
+
+    async def send(log):
+        writer = (await asyncio.open_connection('127.0.0.1', port))[1]
+        for start in range(0, len(log), 97):
+            writer.write(log[start:start + 97])
+            await writer.drain()
+        writer.close()
+
+    senders = asyncio.gather(*[send(log) for log in logs])
+    sentences = []
+    while len(sentences) < n_sentences:
+        sentences.append(await asyncio.wait_for(stream.get(), 10.0))
+        # a slow consumer, so the stream fills up and pauses the senders
+        if len(sentences) % 10 == 0:
+            await asyncio.sleep(0.001)
+    await senders
+    server.close()
+    await server.wait_closed()
+    return (parser, sentences)
+
+async def _udp_backpressure(n_datagrams, max_queued):
+    """ Send one sentence per datagram to a stream which isn't read at first
+
+    Arguments:
+        n_datagrams: number of sentences to send
+        max_queued: size of the SentenceStream the sentences go to
+
+    Returns:
+        paused: True if reading was paused while the stream was full
+        n_queued: sentences queued while paused
+        resumed: True if reading resumed once the stream was drained
+        sentences: list of (sentence_id, data, source) from the stream
+    """
+    loop = asyncio.get_running_loop()
+    stream = parsers.nmea_asyncio.SentenceStream(max_queued)
+    transport = (await parsers.nmea_asyncio.open_udp(
+        parsers.nmea.NMEA(), ('127.0.0.1', 0), stream=stream))[0]
+    sender = (await loop.create_datagram_endpoint(
+        asyncio.DatagramProtocol,
+        remote_addr=transport.get_extra_info('sockname')))[0]
+    # every other datagram leaves out the line ending
+    for i, line in enumerate(
+            bench_nmea.rmc_sentences(n_datagrams).encode('ascii').split(
+                b'\n')[:n_datagrams]):
+        sender.sendto(line + b'\n' if i % 2 else line.rstrip(b'\r'))
+    for _ in range(20):
+        await asyncio.sleep(0.005)
+    paused = not transport.is_reading()
+    n_queued = len(stream)
+
+    sentences = []
+    while len(sentences) < n_datagrams:
+        sentences.append(await asyncio.wait_for(stream.get(), 10.0))
+    resumed = transport.is_reading()
+    sender.close()
+    transport.close()
+    return (paused, n_queued, resumed, sentences)
+
+def check_asyncio_sources():
+    """ NMEAStreamProtocol against local TCP and UDP stand-ins
+    """
+    logs = [
+        bench_nmea.rmc_sentences(300, seed).encode('ascii')
+        for seed in (1, 2)]
+    # a bad byte on the line must not drop the connection
+    line_end = logs[0].index(b'\n', 1000) + 1
+    logs[0] = (
+        logs[0][:line_end] + b'$GPRMC,1*\xff\xff\r\n' + logs[0][line_end:])
+    parser, sentences = asyncio.run(_tcp_sources(logs, 600, 16))
+    expected = parsers.nmea.NMEA(
+        string_data=b''.join(logs).decode('latin-1'))
+    assert len(sentences) == 600
+    assert len(set(source for (_, _, source) in sentences)) == 2
+    for channel in ('latitude', 'longitude', 'ground_speed'):
+        got = getattr(parser, channel)()
+        want = getattr(expected, channel)()
+        assert sorted(zip(*got)) == sorted(zip(*want)), channel
+
+    paused, n_queued, resumed, sentences = asyncio.run(
+        _udp_backpressure(100, 8))
+    assert paused and n_queued < 100 and resumed
+    assert len(sentences) == 100
+
+CHECKS = (
+    check_garbage_checksums,
+    check_latin_1_checksums,
+    check_gps_times,
+    check_asyncio_sources,
+    )
+
+def main():
+    """ Run every check and print the outcome
+
+    Arguments:
+        no arguments
+
+    Returns:
+        status: 0 if every check passed
+    """
+    status = 0
+    for check in CHECKS:
+        try:
+            check()
+            note = 'ok'
+        except Exception:
+            note = 'FAILED\n' + traceback.format_exc()
+            status = 1
+        print('{:40s} {}'.format(check.__name__, note))
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
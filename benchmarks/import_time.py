@@ -0,0 +1,138 @@
+""" Record and check import times for the packages in this repo
+
+Each module is imported in a fresh interpreter with `python -X importtime`
+so that the numbers include everything it drags in. Besides reporting the
+cumulative import time, the check fails if a module pulls in one of the
+heavy optional dependencies at import time, those should only be loaded on
+first use.
+
+Usage:
+    python benchmarks/import_time.py [--record results.json] [--budget ms]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# heavy dependencies which must not be imported until they are used
+HEAVY_MODULES = ('astropy', 'scipy', 'shapely')
+
+MODULES = (
+    'geodesy.conversions',
+    'geodesy.leap_seconds',
+    'geodesy.additional_geometry',
+    'geodesy.distance',
+    'geodesy.track_index',
+    'geometry.rotations',
+    'geometry.lines',
+    'geometry.quaternion',
+    'meteorology.thermals',
+    'parsers.buffers',
+    'parsers.cache',
+    'parsers.flight_collection',
+    'parsers.igc',
+    'parsers.interpolation',
+    'parsers.nmea',
+    'parsers.nmea_asyncio',
+    'parsers.perlan',
+    'robot_control.path_following',
+    )
+
+_IMPORTTIME_LINE = re.compile(
+    r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def measure(module):
+    """ Import a module in a clean interpreter and parse -X importtime
+
+    Arguments:
+        module: dotted name of the module to import
+
+    Returns:
+        result: dict with
+            cumulative_ms: total time to import the module, milliseconds
+            heavy: sorted list of heavy dependencies that were imported
+            error: stderr of the interpreter if the import failed, else None
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [SRC_DIR] + [p for p in [env.get('PYTHONPATH')] if p])
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr = process.communicate()[1].decode('utf-8', 'replace')
+
+    cumulative_us = None
+    imported = set()
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        imported.add(name.split('.')[0])
+        if name == module:
+            cumulative_us = int(match.group(2))
+
+    result = {
+        'cumulative_ms': None,
+        'heavy': sorted(imported.intersection(HEAVY_MODULES)),
+        'error': None,
+        }
+    if process.returncode != 0 or cumulative_us is None:
+        result['error'] = stderr.strip().splitlines()[-1] if stderr else ''
+    else:
+        result['cumulative_ms'] = cumulative_us / 1000.0
+    return result
+
+def main(argv=None):
+    """ Measure every module, print a table and return an exit code
+
+    Arguments:
+        argv: optional command line arguments
+
+    Returns:
+        status: 0 if all modules imported cleanly and within budget
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--record', help='append the measurements to this json lines file')
+    parser.add_argument(
+        '--budget', type=float, default=None,
+        help='fail if any module takes longer than this many milliseconds')
+    args = parser.parse_args(argv)
+
+    results = {}
+    status = 0
+    for module in MODULES:
+        result = measure(module)
+        results[module] = result
+        if result['error'] is not None:
+            note = 'failed: ' + result['error']
+            status = 1
+        elif result['heavy']:
+            note = 'imports ' + ', '.join(result['heavy'])
+            status = 1
+        elif args.budget is not None and result['cumulative_ms'] > args.budget:
+            note = 'over budget'
+            status = 1
+        else:
+            note = ''
+        ms = result['cumulative_ms']
+        print('{:32s} {:>10s}  {}'.format(
+            module, '-' if ms is None else '{:.1f} ms'.format(ms), note))
+
+    if args.record:
+        with open(args.record, 'a') as record_file:
+            record_file.write(json.dumps({
+                'time': time.time(),
+                'python': sys.version.split()[0],
+                'results': results}) + '\n')
+
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
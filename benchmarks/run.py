@@ -0,0 +1,154 @@
+""" Run the asv-format benchmarks without asv
+
+For every benchmark class, parameter and time_* method this reports the best
+time per call, the throughput in points per second and the peak memory
+allocated during one call (measured with tracemalloc). With --check it
+exits non-zero if any benchmark with an entry in its module's
+THROUGHPUT_TARGETS is slower than the target at the largest size.
+
+Usage:
+    python benchmarks/run.py [--check] [--filter substring] [module ...]
+"""
+import argparse
+import importlib
+import inspect
+import os
+import sys
+import timeit
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+DEFAULT_MODULES = ('bench_geodesy', 'bench_nmea')
+
+def time_call(function, min_time=0.2):
+    """ Find the best time per call of a function
+
+    Arguments:
+        function: callable taking no arguments
+        min_time: optional, minimum total time to spend in each repeat (s)
+
+    Returns:
+        seconds: best time for one call
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 1e6:
+            break
+        number *= 10
+    best = min([elapsed] + timer.repeat(repeat=2, number=number))
+    return best / number
+
+def peak_memory(function):
+    """ Measure the peak memory allocated while calling a function
+
+    Arguments:
+        function: callable taking no arguments
+
+    Returns:
+        peak: peak traced allocation in bytes
+    """
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run_module(module_name, name_filter=None):
+    """ Run every benchmark in a module
+
+    Arguments:
+        module_name: name of the benchmark module in this directory
+        name_filter: optional substring that benchmark names must contain
+
+    Returns:
+        results: list of (name, n_points, seconds, peak_bytes) tuples
+    """
+    module = importlib.import_module(module_name)
+    results = []
+    for class_name, bench_class in inspect.getmembers(module, inspect.isclass):
+        if bench_class.__module__ != module.__name__:
+            continue
+        methods = sorted(
+            name for name in dir(bench_class) if name.startswith('time_'))
+        for n_points in getattr(bench_class, 'params', [None]):
+            instance = bench_class()
+            for method in methods:
+                name = '{}.{}'.format(class_name, method)
+                if name_filter and name_filter not in name:
+                    continue
+                if hasattr(instance, 'setup'):
+                    instance.setup(n_points)
+                function = getattr(instance, method)
+                call = lambda: function(n_points)
+                seconds = time_call(call)
+                peak = peak_memory(call)
+                results.append((name, n_points, seconds, peak))
+                print('{:45s} {:>9} {:>12.3g} s {:>12.3g} pts/s {:>10.1f} MB'.format(
+                    name, n_points, seconds, (n_points or 1) / seconds,
+                    peak / 1.0e6))
+                sys.stdout.flush()
+    return results
+
+def check_targets(module_name, results):
+    """ Compare throughput at the largest size against module targets
+
+    Arguments:
+        module_name: name of the benchmark module
+        results: results from run_module
+
+    Returns:
+        failures: list of messages for benchmarks slower than their target
+    """
+    targets = getattr(
+        importlib.import_module(module_name), 'THROUGHPUT_TARGETS', {})
+    largest = {}
+    for name, n_points, seconds, _ in results:
+        if n_points is None:
+            continue
+        if name not in largest or n_points > largest[name][0]:
+            largest[name] = (n_points, seconds)
+
+    failures = []
+    for name, target in sorted(targets.items()):
+        if name not in largest:
+            continue
+        n_points, seconds = largest[name]
+        throughput = n_points / seconds
+        if throughput < target:
+            failures.append('{}: {:.3g} pts/s is below target {:.3g}'.format(
+                name, throughput, target))
+    return failures
+
+def main(argv=None):
+    """ Run benchmarks and optionally check throughput targets
+
+    Arguments:
+        argv: optional command line arguments
+
+    Returns:
+        status: 0 on success, 1 if --check was given and a target was missed
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--filter', default=None)
+    parser.add_argument('--check', action='store_true')
+    args = parser.parse_args(argv)
+
+    failures = []
+    for module_name in args.modules:
+        results = run_module(module_name, args.filter)
+        if args.check:
+            failures.extend(check_targets(module_name, results))
+
+    for failure in failures:
+        print('FAILED ' + failure)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
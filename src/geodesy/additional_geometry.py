@@ -5,15 +5,17 @@ Created on Mon Jun  1 13:12:40 2015
 @author: nate
 """
 import numpy as np
-from shapely.geometry import Point, Polygon
-from shapely.ops import cascaded_union
 from geodesy.conversions import lla2ned
 from geodesy.conversions import ned2lla
+from geodesy.conversions import lla_to_ned
+from geodesy.conversions import ned_to_lla
+import geodesy.distance
 
 class GeoPolygon(object):
     """class holds both the lla and ned polygons that make up a shape on the
     map."""
     def __init__(self, coords=None, ref_pt=None):
+        from shapely.geometry import Polygon
         # set the reference point for this polygon
         if ref_pt is not None:
             self.ref_pt = ref_pt
@@ -44,6 +46,7 @@ class GeoPolygon(object):
                 coordinates (rad). Alternatively, poly may be an array of
                 points defining the corners of the lla polygon
         """
+        from shapely.geometry import Polygon
         # check the input
         if type(poly) is not Polygon:
             # if we weren't given a polygon, turn the coordinates into one
@@ -70,6 +73,7 @@ class GeoPolygon(object):
                 this value isn't provided, the object's current reference point
                 is used
         """
+        from shapely.geometry import Polygon
         # check the input
         if type(input_poly) is not Polygon:
             # if we weren't given a polygon, turn the coordinates into one
@@ -122,6 +126,8 @@ class GeoPolygon(object):
                 lla coordinates (rad). Alternatively, poly may be an array of
                 points defining the corners of the lla polygon
         """
+        from shapely.geometry import Polygon
+        from shapely.ops import unary_union
         # check the input
         if type(input_poly) is not Polygon:
         #if not isinstance(input_poly, Polygon):
@@ -155,7 +161,7 @@ class GeoPolygon(object):
             ned_coords = lla2ned(lla_coords, self._ref_pt)
             # add this region to the list
             keep_out_list.append(Polygon(ned_coords) )
-        keep_out = cascaded_union(keep_out_list)
+        keep_out = unary_union(keep_out_list)
 
         # now make a valid mission area polygon
         self._ned_shape = ned_exterior.difference(keep_out)
@@ -174,6 +180,7 @@ class GeoPolygon(object):
                 ned coordinates (meters). Alternatively, poly may be an array
                 of points defining the corners of the ned polygon
         """
+        from shapely.geometry import Polygon
         # check the input
         if type(input_poly) is not Polygon:
         #if not isinstance(input_poly, Polygon):
@@ -202,13 +209,399 @@ class GeoPolygon(object):
 
 class GeoPoint(object):
     """Class to hold a point in both lla and ned coordinates."""
-    def __init__(self):
+    def __init__(self, coords=None, ref_pt=None):
+        from shapely.geometry import Point
         self._lla_pt = Point()
         self._ned_pt = Point()
         self._ref_pt = np.array([[0.0]*3])
+        # set the reference point for this point
+        if ref_pt is not None:
+            self.ref_pt = ref_pt
+        # as with GeoPolygon, coordinates are ned if we have a reference
+        if coords is not None:
+            if ref_pt is None:
+                self.lla = coords
+            else:
+                self.ned = coords
+
+    @property
+    def ref_pt(self):
+        """Returns the point's reference point as a 3 place list"""
+        return self._ref_pt.flatten().tolist()
+
+    @ref_pt.setter
+    def ref_pt(self, input_pt):
+        """Takes a three place list and sets the current reference point to
+        equal this value. The ned point is recomputed from the lla point."""
+        if input_pt is not None:
+            self._ref_pt = np.array([[0.0]*3])
+            self._ref_pt[0] = input_pt
+            if not self._lla_pt.is_empty:
+                self.lla = self._lla_pt
+
+    @property
+    def lla(self):
+        """Returns the point in lla coordinates as a shapely Point"""
+        return self._lla_pt
+
+    @lla.setter
+    def lla(self, input_pt):
+        """Sets the point from lla coordinates
+
+        Args:
+            input_pt: shapely.geometry.Point or 2/3 place array of lat/lon/alt
+                in rad and meters
+        """
+        from shapely.geometry import Point
+        lla_coords = _point_coords(input_pt)
+        self._lla_pt = Point(lla_coords)
+        self._ned_pt = Point(lla_to_ned(lla_coords, self._ref_pt))
+
+    @property
+    def ned(self):
+        """Returns the point in ned coordinates as a shapely Point"""
+        return self._ned_pt
+
+    @ned.setter
+    def ned(self, input_pt):
+        """Sets the point from ned coordinates relative to the reference point
+
+        Args:
+            input_pt: shapely.geometry.Point or 2/3 place array of
+                north/east/down in meters
+        """
+        from shapely.geometry import Point
+        ned_coords = _point_coords(input_pt)
+        self._ned_pt = Point(ned_coords)
+        self._lla_pt = Point(ned_to_lla(ned_coords, self._ref_pt))
 
     def distance(self, other_pt, is_lla=True):
         """Method takes in another point and returns the unsigned distance
         between the two points. This method assumes that the compare point is
-        given in lla (the really useful part of this class)."""
-        return 0.0
+        given in lla (the really useful part of this class).
+
+        Args:
+            other_pt: GeoPoint, shapely.geometry.Point or 2/3 place array
+            is_lla: optional, defaults True. If True the compare point is in
+                lla and the distance is along the WGS84 ellipsoid (altitude
+                is ignored). If False it is ned relative to this point's
+                reference and the straight line distance is returned.
+
+        Returns:
+            distance: distance between the points in meters
+        """
+        if isinstance(other_pt, GeoPoint):
+            other_pt = other_pt.lla if is_lla else other_pt.ned
+        other_coords = _point_coords(other_pt)
+
+        if is_lla:
+            return float(geodesy.distance.vincenty(
+                _point_coords(self._lla_pt)[:2], other_coords[:2]))
+
+        delta = other_coords - _point_coords(self._ned_pt)
+        return float(np.linalg.norm(delta))
+
+class GeofenceSet(object):
+    """Class holds many GeoPolygons and answers containment and distance
+    queries for whole arrays of points at once.
+
+    Spatial indices (an STRtree over the shapes, their bounding boxes and
+    prepared geometries) are built for the lla and ned shapes the first time
+    each is queried, and rebuilt after polygons are added."""
+    def __init__(self, polygons=None):
+        """
+        Args:
+            polygons: optional iterable of GeoPolygon instances
+        """
+        self._polygons = []
+        self._indices = {}
+        if polygons is not None:
+            for polygon in polygons:
+                self.add(polygon)
+
+    def add(self, polygon):
+        """Add a GeoPolygon to the set
+
+        Args:
+            polygon: GeoPolygon instance. It should not be changed after it is
+                added, or the set's indices will be stale
+        """
+        assert isinstance(polygon, GeoPolygon), "polygon must be a GeoPolygon"
+        self._polygons.append(polygon)
+        self._indices = {}
+
+    def __len__(self):
+        return len(self._polygons)
+
+    def __getitem__(self, key):
+        return self._polygons[key]
+
+    def contains(self, points, is_lla=True):
+        """Test which polygons contain each point
+
+        The batch is first matched against the STRtree, then each candidate
+        polygon only tests the points inside its bounding box.
+
+        Args:
+            points: nx2 or nx3 numpy array of points, lat/lon in rad if is_lla
+                otherwise north/east in meters. ned points must be relative to
+                the (common) reference point of the polygons
+            is_lla: optional, defaults True. Whether points are lla or ned
+
+        Returns:
+            inside: n x len(self) boolean numpy array, inside[i, j] is True if
+                polygon j contains point i
+        """
+        from shapely.geometry import box
+
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        x = points[:, 0]
+        y = points[:, 1]
+        inside = np.zeros((points.shape[0], len(self._polygons)), dtype=bool)
+        if points.shape[0] == 0 or len(self._polygons) == 0:
+            return inside
+
+        index = self._get_index(is_lla)
+        batch_box = box(x.min(), y.min(), x.max(), y.max())
+        for j in _tree_query(index['tree'], index['ids'], batch_box):
+            min_x, min_y, max_x, max_y = index['bounds'][j]
+            in_box = np.flatnonzero(
+                (x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y))
+            if in_box.shape[0] == 0:
+                continue
+            inside[in_box, j] = _contains_xy(
+                index['prepared'][j], x[in_box], y[in_box])
+        return inside
+
+    def any_contains(self, points, is_lla=True):
+        """Test whether each point is inside any polygon of the set
+
+        Args:
+            points: nx2 or nx3 numpy array of points, see contains
+            is_lla: optional, defaults True. Whether points are lla or ned
+
+        Returns:
+            inside: n, boolean numpy array
+        """
+        return self.contains(points, is_lla).any(axis=1)
+
+    def distance_to_boundary(self, points, is_lla=True, max_distance=None):
+        """Compute the distance from each point to each polygon's boundary
+
+        Distances are measured in each polygon's ned frame, lla points are
+        converted into every distinct reference frame once. Without
+        max_distance every point is measured against every edge of every
+        polygon. With it, polygons whose bounding box is farther than
+        max_distance from the whole batch are skipped using the STRtree, and
+        each remaining polygon only measures the points inside its bounding
+        box grown by max_distance.
+
+        Args:
+            points: nx2 or nx3 numpy array of points, see contains
+            is_lla: optional, defaults True. Whether points are lla or ned
+            max_distance: optional distance (m) beyond which distances are
+                not needed, they are reported as inf
+
+        Returns:
+            distance: n x len(self) numpy array of unsigned distances (m)
+        """
+        from shapely.geometry import box
+
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        fill = 0.0 if max_distance is None else np.inf
+        distance = np.full((points.shape[0], len(self._polygons)), fill)
+        if points.shape[0] == 0 or len(self._polygons) == 0:
+            return distance
+
+        index = self._get_index(False)
+        if is_lla:
+            lla = np.zeros((points.shape[0], 3))
+            lla[:, :points.shape[1]] = points[:, :3]
+            ned_by_ref = dict(
+                (ref, lla_to_ned(lla, np.array(ref))[:, :2])
+                for ref in set(index['refs']))
+        else:
+            assert len(set(index['refs'])) == 1, \
+                "ned queries need polygons with a common reference point"
+            ned_by_ref = {index['refs'][0]: points[:, :2]}
+
+        for ref, ned in ned_by_ref.items():
+            if max_distance is None:
+                candidates = range(len(self._polygons))
+            else:
+                batch_box = box(
+                    ned[:, 0].min() - max_distance,
+                    ned[:, 1].min() - max_distance,
+                    ned[:, 0].max() + max_distance,
+                    ned[:, 1].max() + max_distance)
+                candidates = _tree_query(
+                    index['tree'], index['ids'], batch_box)
+
+            for j in candidates:
+                if index['refs'][j] != ref:
+                    continue
+                edges = index['edges'][j]
+                if max_distance is None:
+                    distance[:, j] = _segment_distance(ned, edges)
+                    continue
+                min_x, min_y, max_x, max_y = index['bounds'][j]
+                near = np.flatnonzero(
+                    (ned[:, 0] >= min_x - max_distance) &
+                    (ned[:, 0] <= max_x + max_distance) &
+                    (ned[:, 1] >= min_y - max_distance) &
+                    (ned[:, 1] <= max_y + max_distance))
+                if near.shape[0] == 0:
+                    continue
+                near_distance = _segment_distance(ned[near], edges)
+                near_distance[near_distance > max_distance] = np.inf
+                distance[near, j] = near_distance
+        return distance
+
+    def _get_index(self, is_lla):
+        """Get (building if needed) the spatial index for lla or ned shapes
+
+        Args:
+            is_lla: whether to get the index of the lla or ned shapes
+
+        Returns:
+            index: dict of tree, ids, bounds, prepared, and for ned edges
+                and refs
+        """
+        frame = 'lla' if is_lla else 'ned'
+        if frame in self._indices:
+            return self._indices[frame]
+
+        from shapely.strtree import STRtree
+
+        shapes = [
+            polygon.lla if is_lla else polygon.ned
+            for polygon in self._polygons]
+        index = {
+            'tree': STRtree(shapes),
+            'ids': dict((id(shape), j) for j, shape in enumerate(shapes)),
+            'bounds': np.array([shape.bounds for shape in shapes]),
+            'prepared': [_prepare(shape) for shape in shapes],
+            }
+        if not is_lla:
+            index['refs'] = [
+                tuple(polygon.ref_pt) for polygon in self._polygons]
+            index['edges'] = [_boundary_edges(shape) for shape in shapes]
+        self._indices[frame] = index
+        return index
+
+def _tree_query(tree, ids, geometry):
+    """Get the indices of the shapes in an STRtree whose extents intersect a
+    geometry, shapely 2 returns indices while 1.x returns the shapes
+
+    Args:
+        tree: shapely.strtree.STRtree
+        ids: dict mapping id() of each shape in the tree to its index
+        geometry: the geometry to query with
+
+    Returns:
+        indices: sorted list of indices of candidate shapes
+    """
+    result = tree.query(geometry)
+    return sorted(
+        int(item) if isinstance(item, (int, np.integer)) else ids[id(item)]
+        for item in result)
+
+def _prepare(shape):
+    """Prepare a shape for repeated point in polygon tests, shapely 2
+    prepares the geometry itself while 1.x wraps it in a PreparedGeometry
+
+    Args:
+        shape: shapely Polygon or MultiPolygon
+
+    Returns:
+        prepared: the prepared shape (shapely 2) or PreparedGeometry (1.x),
+            for _contains_xy
+    """
+    import shapely
+    if hasattr(shapely, 'prepare'):
+        shapely.prepare(shape)
+        return shape
+    from shapely.prepared import prep
+    return prep(shape)
+
+def _contains_xy(prepared, x, y):
+    """Vectorized point in polygon test
+
+    Args:
+        prepared: shape returned by _prepare
+        x: numpy array of x coordinates
+        y: numpy array of y coordinates
+
+    Returns:
+        inside: boolean numpy array
+    """
+    import shapely
+    if hasattr(shapely, 'contains_xy'):
+        return shapely.contains_xy(prepared, x, y)
+    from shapely.vectorized import contains
+    return contains(prepared, x, y)
+
+def _boundary_edges(shape):
+    """Get the line segments making up the boundary of a (multi)polygon
+
+    Args:
+        shape: shapely Polygon or MultiPolygon
+
+    Returns:
+        edges: kx2x2 numpy array of segment start and end points
+    """
+    edges = [np.zeros((0, 2, 2))]
+    for polygon in getattr(shape, 'geoms', [shape]):
+        if polygon.is_empty:
+            continue
+        for ring in [polygon.exterior] + list(polygon.interiors):
+            coords = np.array(ring.coords)[:, :2]
+            edges.append(np.stack((coords[:-1], coords[1:]), axis=1))
+    return np.concatenate(edges)
+
+def _segment_distance(points, edges, chunk_elements=2**20):
+    """Minimum distance from points to a set of line segments
+
+    Args:
+        points: nx2 numpy array
+        edges: kx2x2 numpy array of segment start and end points
+        chunk_elements: optional, number of point/segment pairs to evaluate
+            at once
+
+    Returns:
+        distance: n, numpy array
+    """
+    if edges.shape[0] == 0:
+        return np.full((points.shape[0],), np.inf)
+
+    start = edges[:, 0]
+    direction = edges[:, 1] - edges[:, 0]
+    length_sqr = np.sum(direction * direction, axis=1)
+    length_sqr[length_sqr == 0.0] = 1.0
+
+    distance = np.empty((points.shape[0],))
+    chunk = max(1, chunk_elements // edges.shape[0])
+    for i in range(0, points.shape[0], chunk):
+        delta = points[i:i + chunk, np.newaxis, :] - start[np.newaxis]
+        t = np.clip(np.sum(delta * direction, axis=2) / length_sqr, 0.0, 1.0)
+        delta -= t[:, :, np.newaxis] * direction[np.newaxis]
+        distance[i:i + chunk] = np.sqrt(
+            np.min(np.sum(delta * delta, axis=2), axis=1))
+    return distance
+
+def _point_coords(input_pt):
+    """Get a 3 place coordinate array from a point
+
+    Args:
+        input_pt: shapely.geometry.Point or 2/3 place array-like, a missing
+            third coordinate is taken as zero
+
+    Returns:
+        coords: 3, numpy array
+    """
+    if hasattr(input_pt, 'coords'):
+        input_pt = list(input_pt.coords)[0]
+    coords = np.zeros((3,))
+    input_pt = np.asarray(input_pt, dtype=float).flatten()
+    coords[:input_pt.shape[0]] = input_pt
+    return coords
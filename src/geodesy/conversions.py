@@ -1,15 +1,23 @@
 # -*- coding: utf-8 -*-
 import numpy
 
-import astropy.time
 import datetime
+import collections
+import numbers
+import threading
 
 import numpy as np
 from geometry.rotations import rotate
-from geometry.conversions import d2r
-from math import sin, cos, atan2, sqrt, pi
+import geodesy.distance
+import geodesy.leap_seconds
+from math import pi
 import warnings
 
+# WGS84 ellipsoid
+_A_EARTH = 6378137.0
+_FLATTENING = 1.0 / 298.257223563
+_E2 = (2.0 - _FLATTENING) * _FLATTENING
+
 def kml2lla(lla_kml):
     """ Alias to kml_to_lla
     """
@@ -30,15 +38,9 @@ def kml_to_lla(lla_kml):
     Returns:
         lla: nx3 numpy array giving lat/long/alt in rad/m
     """
-    if lla_kml.ndim > 1:
-        lla = np.zeros(lla_kml.shape)
-        for (kml, i) in zip(lla_kml, range(0, lla_kml.shape[0])):
-            lla[i] = kml2lla(kml)
-        return lla
-
-    lla = np.zeros(lla_kml.shape)
-    lla[[0,1]] = d2r(lla_kml[[1,0]])
-    lla[2] = lla_kml[2]
+    lla = numpy.array(lla_kml, dtype=float)
+    lla[..., 0] = numpy.deg2rad(lla_kml[..., 1])
+    lla[..., 1] = numpy.deg2rad(lla_kml[..., 0])
     return lla
 
 
@@ -49,7 +51,7 @@ def lla2ned(lla, lla_ref):
         + ' lla_to_ned from the same module.', DeprecationWarning)
     return lla_to_ned(lla, lla_ref)
 
-def lla_to_ned(lla, lla_ref):
+def lla_to_ned(lla, lla_ref, out=None, dtype=None):
     """ lla to ned
 
     Converts lat/long/alt to north/east/down
@@ -58,14 +60,19 @@ def lla_to_ned(lla, lla_ref):
         lla: nx3 numpy array giving lat/long/alt position in radians and meters
         lla_ref: 1x3 numpy array giving the lat/long/alt position to
             report ned points relative to
+        out: optional numpy array of the same shape to write the result
+            into, it may be the input array itself
+        dtype: optional dtype of the returned array if out is not given,
+            defaults to float64. Computation is always in double precision
 
     Returns:
-        ned: nx3 numpy array giving north/east/down positions
+        ned: nx3 numpy array giving north/east/down positions, 1x3 for a
+            single point
 
     Notes: all measured to WGS84
     """
-    xyz = lla_to_xyz(lla)
-    return xyz_to_ned(xyz, lla_ref)
+    return numpy.atleast_2d(
+        local_tangent_frame(lla_ref).to_ned(lla, out, dtype))
 
 def lla2xyz(lla):
     """ Alias to lla_to_xyz
@@ -74,34 +81,46 @@ def lla2xyz(lla):
         + ' lla_to_xyz from the same module.', DeprecationWarning)
     return lla_to_xyz(lla)
 
-def lla_to_xyz(lla):
+def lla_to_xyz(lla, out=None, dtype=None):
     """  lla to xyz
 
     converts lat/long/alt to ecef xyz
 
     Args:
         lla: lat/long/alt position in radians and meters
+        out: optional numpy array of the same shape to write the result
+            into, it may be the input array itself
+        dtype: optional dtype of the returned array if out is not given,
+            defaults to float64. Computation is always in double precision
 
     Returns:
         xyz: ecef xyz position in meters
 
     Notes: all measured to WGS84
     """
-    if lla.ndim > 1:
-        xyz = np.zeros(lla.shape)
-        for (coord,i) in zip(lla, range(lla.shape[0])):
-            xyz[i] = lla2xyz(coord)
-        return xyz
+    return _convert_rows(_lla_to_xyz_rows, lla, out, dtype)
 
-    a_earth = 6378137
-    e2 = 0.006694379990140
-    r_n = a_earth/sqrt(1 - e2*pow(sin(lla[0]),2))
+def _lla_to_xyz_rows(lla, xyz):
+    """ lla_to_xyz on a block of rows
 
-    x = (r_n + lla[2]) * cos(lla[0]) * cos(lla[1])
-    y = (r_n + lla[2]) * cos(lla[0]) * sin(lla[1])
-    z = (r_n * (1 - e2) + lla[2]) * sin(lla[0])
-    xyz = np.array([x,y,z])
-    return xyz
+    Args:
+        lla: kx3 float64 numpy array of lat/lon/alt
+        xyz: kx3 numpy array to write the result into, may be lla
+    """
+    lat = lla[:, 0]
+    lon = lla[:, 1]
+    alt = lla[:, 2]
+
+    sin_lat = numpy.sin(lat)
+    r_n = _A_EARTH / numpy.sqrt(1.0 - _E2 * sin_lat * sin_lat)
+
+    # everything that needs lat or alt comes before we write in case the
+    # output is the input
+    r_cos_lat = (r_n + alt) * numpy.cos(lat)
+    z = (r_n * (1.0 - _E2) + alt) * sin_lat
+    numpy.multiply(r_cos_lat, numpy.cos(lon), out=xyz[:, 0])
+    numpy.multiply(r_cos_lat, numpy.sin(lon), out=xyz[:, 1])
+    xyz[:, 2] = z
 
 def xyz2ned(xyz, lla_ref):
     """ Alias to xyz_to_ned
@@ -110,7 +129,7 @@ def xyz2ned(xyz, lla_ref):
         + ' xyz_to_ned from the same module.', DeprecationWarning)
     return xyz_to_ned(xyz, lla_ref)
 
-def xyz_to_ned(xyz, lla_ref):
+def xyz_to_ned(xyz, lla_ref, out=None, dtype=None):
     """ ecef xyz to ned
 
     converts ecef xyz coordinates to surface north/east/down
@@ -119,27 +138,19 @@ def xyz_to_ned(xyz, lla_ref):
         xyz: 3, or nx3 numpy array or giving locations in meters
         lla_ref: 1x3 numpy array giving the reference position to report
             north/east/down position relative to, radians and metersr
+        out: optional numpy array of the same shape to write the result
+            into, it may be the input array itself
+        dtype: optional dtype of the returned array if out is not given,
+            defaults to float64. Computation is always in double precision
 
     Returns:
-        ned: nx3 numpy array giving position in meters
+        ned: nx3 numpy array giving position in meters, 1x3 for a single
+            point
 
     Notes: all measured to WGS84
     """
-    if xyz.ndim > 1:
-        ned = np.zeros(xyz.shape)
-        for (coord, i) in zip(xyz, range(xyz.shape[0])):
-            ned[i] = xyz2ned(coord, lla_ref)
-        return ned
-
-    xyz_ref = lla2xyz(lla_ref)
-
-    R1 = rotate('z', pi/2 + lla_ref[0][1])
-    R2 = rotate('x', pi/2 - lla_ref[0][0])
-    R = np.dot(R2,R1)
-
-    diff_xyz = xyz - xyz_ref
-    enu = np.dot(R, diff_xyz.T).T
-    return enu2ned(enu)
+    return numpy.atleast_2d(
+        local_tangent_frame(lla_ref).from_ecef(xyz, out, dtype))
 
 def ned2xyz(ned, lla_ref):
     """ Alias to ned2xyz
@@ -148,7 +159,7 @@ def ned2xyz(ned, lla_ref):
         + ' ned_to_xyz from the same module.', DeprecationWarning)
     return ned_to_xyz(ned, lla_ref)
 
-def ned_to_xyz(ned, lla_ref):
+def ned_to_xyz(ned, lla_ref, out=None, dtype=None):
     """ north/east/down to ecef xyz
 
     takes north/east/down coordinates and gives earth centered earth
@@ -159,28 +170,18 @@ def ned_to_xyz(ned, lla_ref):
             meters
         lla_ref: 1x3 numpy array giving lat/long/alt point ned is
             measured from in rad and meters
+        out: optional numpy array of the same shape to write the result
+            into, it may be the input array itself
+        dtype: optional dtype of the returned array if out is not given,
+            defaults to float64. Computation is always in double precision
 
     Returns:
-        xyz: nx3 numpy array giving xyz in m
+        xyz: nx3 numpy array giving xyz in m, 1x3 for a single point
 
     Notes: all measured to WGS84
     """
-    if ned.ndim > 1:
-        xyz = np.zeros(ned.shape)
-        for (coords, i) in zip(ned, range(ned.shape[0])):
-            xyz[i] = ned2xyz(coords, lla_ref)
-        return xyz
-
-    R1 = rotate('z', pi/2 + lla_ref[0][1])
-    R2 = rotate('x', pi/2 - lla_ref[0][0])
-    R = np.dot(R2,R1)
-
-    enu = ned2enu(ned)
-
-    xyz_ref = lla2xyz(lla_ref)
-
-    diff_xyz = np.dot(R.T, enu.T).T
-    return diff_xyz + xyz_ref
+    return numpy.atleast_2d(
+        local_tangent_frame(lla_ref).to_ecef(ned, out, dtype))
 
 def xyz2lla(xyz):
     """ Alias to xyz_to_lla
@@ -189,13 +190,27 @@ def xyz2lla(xyz):
         + ' xyz_to_lla from the same module.', DeprecationWarning)
     return xyz_to_lla(xyz)
 
-def xyz_to_lla(xyz):
+def xyz_to_lla(xyz, out=None, dtype=None):
     """ ecef xyz to lla
 
-    takes earth-fixed and centered xyz coordinates to lat/lon/alt
+    takes earth-fixed and centered xyz coordinates to lat/lon/alt. This uses
+    the closed form solution of Vermeille (2002), "Direct transformation from
+    geocentric coordinates to geodetic coordinates", J. Geodesy 76, so there
+    is no per-point iteration and nx3 arrays are converted in one pass.
+
+    The solution is exact up to floating point error for any point outside
+    the evolute of the ellipsoid (everything further than ~43 km from the
+    center of the earth). The error is set by double precision rounding, a
+    few parts in 1e16 of the geocentric distance: round trips through
+    lla_to_xyz agree to better than 1e-8 m for altitudes between -1e4 and
+    1e7 m and to better than 1e-7 m out to 1e8 m.
 
     Args:
         xyz: 3, or nx3 numpy array giving xyz in m
+        out: optional numpy array of the same shape to write the result
+            into, it may be the input array itself
+        dtype: optional dtype of the returned array if out is not given,
+            defaults to float64. Computation is always in double precision
 
     Returns:
         lla: 3, or nx3 numpy array giving lat/lon/alt position in
@@ -203,80 +218,40 @@ def xyz_to_lla(xyz):
 
     Notes: all measured to WGS84
     """
-    if xyz.ndim > 1:
-        lla = np.zeros(xyz.shape)
-        for (coords, i) in zip(xyz, range(xyz.shape[0])):
-            lla[i] = xyz2lla(coords)
-        return lla
+    return _convert_rows(_xyz_to_lla_rows, xyz, out, dtype)
 
-    a_earth = 6378137.0
-    flattening = 1/298.257223563
-    e2 = (2 - flattening) * flattening
-
-    if (xyz[0] == 0.0) and (xyz[1] == 0.0):
-        lon = 0.0
-    else:
-        lon = atan2(xyz[1], xyz[0])
+def _xyz_to_lla_rows(xyz, lla):
+    """ xyz_to_lla on a block of rows
 
-    if (np.sum(xyz) == 0.0):
-        lla = np.zeros((3,))
-    else:
-        rho_sqr = xyz[0]*xyz[0] + xyz[1]*xyz[1]
-        rho = sqrt(rho_sqr)
-
-        lat_temp = atan2(xyz[2],rho)
-        alt_temp = sqrt(rho_sqr + xyz[2]*xyz[2]) - a_earth
-
-        rho_error = 10000.0
-        alt_error = 10000.0
-
-        niter = 0
-        while (((abs(rho_error) > 1e-6) or (abs(alt_error) > 1e-6))
-            and (niter < 1e4)):
-            niter = niter + 1
-            sin_lat = sin(lat_temp)
-            cos_lat = cos(lat_temp)
-
-            q = 1.0 - e2 * sin_lat * sin_lat
-            r_n = a_earth / sqrt(q)
-            drdl = r_n * e2 * sin_lat * cos_lat / q
-
-            rho_error = (r_n + alt_temp) * cos_lat - rho
-            alt_error = (r_n *(1 - e2) + alt_temp) * sin_lat - xyz[2]
-
-            aa = drdl * cos_lat - (r_n + alt_temp) * sin_lat
-            bb = cos_lat
-            cc = (1 - e2) * (drdl * sin_lat + r_n * cos_lat)
-            dd = sin_lat
-
-            det_inv = 1.0/(aa*dd - bb*cc)
-            lat_temp = lat_temp - det_inv * (dd * rho_error -
-                bb * alt_error)
-            alt_temp = alt_temp - det_inv * (-cc * rho_error +
-                aa * alt_error)
-
-            if (niter == 1e4):
-                N = a_earth
-                Nph = sqrt(np.sum(np.multiply(xyz, xyz)))
-                lat = 0
-                lat_last = 100
-                niter = 0
-                while ((abs(lat - lat_last) > 1e-6) and (niter < 1e4)):
-                    niter = niter + 1
-                    lat_last = lat
-
-                    lat = atan2(xyz[2], sqrt(xyz[0] * xyz[0] +
-                        xyz[1] * xyz[1]) * (1 - N * e2 / Nph))
-                    N = a_earth / sqrt(1 - e2 * sin(lat) * sin(lat))
-                    Nph = sqrt(xyz[0] * xyz[0] + xyz[1] *
-                        xyz[1]) / cos(lat)
-
-                    h = Nph - N
-
-                    alt_temp = h
-                    lat_temp = lat
-
-    return np.array([lat_temp, lon, alt_temp])
+    Args:
+        xyz: kx3 float64 numpy array of ecef positions
+        lla: kx3 numpy array to write the result into, may be xyz
+    """
+    x = xyz[:, 0]
+    y = xyz[:, 1]
+    z = xyz[:, 2]
+
+    e4 = _E2 * _E2
+    rho_sqr = x * x + y * y
+    rho = numpy.sqrt(rho_sqr)
+
+    p = rho_sqr / (_A_EARTH * _A_EARTH)
+    q = (1.0 - _E2) * z * z / (_A_EARTH * _A_EARTH)
+    r = (p + q - e4) / 6.0
+    s = e4 * p * q / (4.0 * r * r * r)
+    t = numpy.cbrt(1.0 + s + numpy.sqrt(s * (2.0 + s)))
+    u = r * (1.0 + t + 1.0 / t)
+    v = numpy.sqrt(u * u + e4 * q)
+    w = _E2 * (u + v - q) / (2.0 * v)
+    k = numpy.sqrt(u + v + w * w) - w
+    d = k * rho / (k + _E2)
+    d_z = numpy.sqrt(d * d + z * z)
+
+    lat = 2.0 * numpy.arctan2(z, d + d_z)
+    lon = numpy.arctan2(y, x)
+    lla[:, 2] = (k + _E2 - 1.0) / k * d_z
+    lla[:, 1] = lon
+    lla[:, 0] = lat
 
 def ned2lla(ned, lla_ref):
     """ Alias to ned_to_lla
@@ -285,7 +260,7 @@ def ned2lla(ned, lla_ref):
         + ' ned_to_lla from the same module.', DeprecationWarning)
     return ned_to_lla(ned, lla_ref)
 
-def ned_to_lla(ned, lla_ref):
+def ned_to_lla(ned, lla_ref, out=None, dtype=None):
     """ converts from north/east/down to lat/lon/alt
 
     Converts north/east/down meters to lat/lon/alt radians and meters
@@ -295,15 +270,19 @@ def ned_to_lla(ned, lla_ref):
             meters
         lla_ref: 3, numpy array giving lat/lon/alt reference point in
             radians and meters that ned is measured from
+        out: optional numpy array of the same shape to write the result
+            into, it may be the input array itself
+        dtype: optional dtype of the returned array if out is not given,
+            defaults to float64. Computation is always in double precision
 
     Returns:
-        lla: lat/lon/alt position in radians and meters
+        lla: nx3 numpy array giving lat/lon/alt position in radians and
+            meters, 1x3 for a single point
 
     Notes: all measured to WGS84
     """
-    xyz = ned2xyz(ned, lla_ref)
-    lla = xyz2lla(xyz)
-    return lla
+    return numpy.atleast_2d(
+        local_tangent_frame(lla_ref).to_lla(ned, out, dtype))
 
 def enu2ned(enu):
     """ Alias to enu_to_ned
@@ -312,7 +291,7 @@ def enu2ned(enu):
         + ' enu_to_ned from the same module.', DeprecationWarning)
     return enu_to_ned(enu)
 
-def enu_to_ned(enu):
+def enu_to_ned(enu, out=None, dtype=None):
     """
     convert from enu to ned
 
@@ -321,24 +300,17 @@ def enu_to_ned(enu):
 
     Args:
         enu: 3, or nx3 numpy array
+        out: optional numpy array of the same shape to write the result
+            into, it may be the input array itself
+        dtype: optional dtype of the returned array if out is not given,
+            defaults to float64
 
     Returns:
         ned: 3, nx3 numpy array matching input dimensions
 
     Notes: all measured to WGS84
     """
-    if enu.ndim > 1:
-        ned = np.zeros(enu.shape)
-        for (coords, i) in zip(enu, range(enu.shape[0])):
-            ned[i] = enu2ned(coords)
-        return ned
-
-    R = np.zeros([3,3])
-    R[1,0] = 1.0
-    R[0,1] = 1.0
-    R[2,2] = -1.0
-
-    return np.dot(R, enu)
+    return _convert_rows(_swap_ned_enu_rows, enu, out, dtype)
 
 def ned2enu(ned):
     """ Alias to ned_to_enu
@@ -347,7 +319,7 @@ def ned2enu(ned):
         + ' ned_to_enu from the same module.', DeprecationWarning)
     return ned_to_enu(ned)
 
-def ned_to_enu(ned):
+def ned_to_enu(ned, out=None, dtype=None):
     """
     convert from ned to enu
 
@@ -356,65 +328,287 @@ def ned_to_enu(ned):
 
     Args:
         enu: 3, or nx3 numpy array
+        out: optional numpy array of the same shape to write the result
+            into, it may be the input array itself
+        dtype: optional dtype of the returned array if out is not given,
+            defaults to float64
 
     Returns:
         ned: 3, or nx3 numpy array
 
     Notes: all measured to WGS84
     """
-    if ned.ndim > 1:
-        enu = np.zeros(ned.shape)
-        for (coords, i) in zip(ned, range(ned.shape[0])):
-            enu[i] = ned2enu(coords)
-        return enu
+    return _convert_rows(_swap_ned_enu_rows, ned, out, dtype)
+
+def _swap_ned_enu_rows(vec, swapped):
+    """ swap a block of rows between ned and enu coordinates
+
+    the transformation is its own inverse, so this serves both enu_to_ned and
+    ned_to_enu.
+
+    Args:
+        vec: kx3 float64 numpy array in either ned or enu
+        swapped: kx3 numpy array to write the other frame into, may be vec
+    """
+    first = vec[:, 0].copy()
+    swapped[:, 0] = vec[:, 1]
+    swapped[:, 1] = first
+    numpy.negative(vec[:, 2], out=swapped[:, 2])
+
+# rows converted at a time, this bounds the size of temporaries
+_BLOCK_ROWS = 4096
+
+def _convert_rows(kernel, points, out=None, dtype=None):
+    """ apply a row conversion to an array a block of rows at a time
+
+    Args:
+        kernel: function taking a kx3 float64 input block and a kx3 output
+            block to write into
+        points: 3, or ...x3 array-like of input points
+        out: optional array of the same shape as points to write into
+        dtype: optional dtype for the output if out is not given
+
+    Returns:
+        out: the converted points
+    """
+    points = numpy.asarray(points)
+    assert points.shape[-1] == 3, "points must be 3, or nx3"
+    if out is None:
+        if dtype is None:
+            dtype = float
+        out = numpy.empty(points.shape, dtype=dtype)
+    assert out.shape == points.shape, "out must match the input shape"
+
+    rows_in = points.reshape(-1, 3)
+    rows_out = out.reshape(-1, 3)
+    for start in range(0, rows_in.shape[0], _BLOCK_ROWS):
+        block = numpy.asarray(rows_in[start:start + _BLOCK_ROWS], dtype=float)
+        kernel(block, rows_out[start:start + _BLOCK_ROWS])
+
+    # reshape copies if out couldn't be viewed as rows
+    if not numpy.shares_memory(rows_out, out):
+        out[...] = rows_out.reshape(out.shape)
+    return out
+
+def _reference_point(lla_ref):
+    """ flatten a reference point to a 3, array
+
+    Args:
+        lla_ref: 3, or 1x3 array-like giving lat/lon/alt in rad and meters
+
+    Returns:
+        lla_ref: 3, numpy array of the reference point
+    """
+    lla_ref = numpy.asarray(lla_ref, dtype=float).reshape(-1)
+    assert lla_ref.shape == (3,), "lla_ref must have exactly three elements"
+    return lla_ref
+
+def _ned_rotation(lla_ref):
+    """ rotation from ecef xyz to north/east/down at a reference point
+
+    Args:
+        lla_ref: 3, numpy array giving the reference lat/lon/alt in radians
+            and meters
+
+    Returns:
+        R: 3x3 numpy array such that ned = R.dot(xyz - xyz_ref)
+    """
+    R1 = rotate('z', pi/2 + lla_ref[1])
+    R2 = rotate('x', pi/2 - lla_ref[0])
+    R_enu = np.dot(R2, R1)
+    return enu_to_ned(R_enu.T).T
+
+class LocalTangentFrame(object):
+    """ A north/east/down frame tangent to the ellipsoid at a reference point
+
+    The reference point's ecef position and the ecef to ned rotation are
+    computed once at construction, so repeated conversions against the same
+    reference only pay for the batch arithmetic. All methods take either a
+    single 3, point or an nx3 array of them.
+    """
+    def __init__(self, lla_ref):
+        """ Constructor
+
+        Arguments:
+            lla_ref: 3, or 1x3 array-like giving the lat/lon/alt origin of the
+                frame in radians and meters
+
+        Returns:
+            class instance
+        """
+        super(LocalTangentFrame, self).__init__()
+
+        self._lla_ref = _reference_point(lla_ref)
+        self._xyz_ref = lla_to_xyz(self._lla_ref)
+        self._R = _ned_rotation(self._lla_ref)
+
+    @property
+    def lla_ref(self):
+        """ getter for the frame origin in lat/lon/alt (rad, m)
+        """
+        return self._lla_ref.copy()
+
+    @property
+    def xyz_ref(self):
+        """ getter for the frame origin in ecef xyz (m)
+        """
+        return self._xyz_ref.copy()
+
+    @property
+    def R(self):
+        """ getter for the rotation matrix taking ecef deltas to ned
+        """
+        return self._R.copy()
+
+    def to_ned(self, lla, out=None, dtype=None):
+        """ Convert lat/lon/alt points into this frame
+
+        Arguments:
+            lla: 3, or nx3 numpy array giving lat/lon/alt in radians and meters
+            out: optional numpy array of the same shape to write the result
+                into, it may be the input array itself
+            dtype: optional dtype of the returned array if out is not given,
+                defaults to float64
+
+        Returns:
+            ned: 3, or nx3 numpy array of north/east/down positions (m)
+        """
+        return _convert_rows(self._to_ned_rows, lla, out, dtype)
+
+    def from_ecef(self, xyz, out=None, dtype=None):
+        """ Convert ecef xyz points into this frame
+
+        Arguments:
+            xyz: 3, or nx3 numpy array giving ecef positions in meters
+            out: optional numpy array of the same shape to write the result
+                into, it may be the input array itself
+            dtype: optional dtype of the returned array if out is not given,
+                defaults to float64
+
+        Returns:
+            ned: 3, or nx3 numpy array of north/east/down positions (m)
+        """
+        return _convert_rows(self._from_ecef_rows, xyz, out, dtype)
+
+    def to_ecef(self, ned, out=None, dtype=None):
+        """ Convert points in this frame to ecef xyz
 
-    R = np.zeros([3,3])
-    R[1,0] = 1.0
-    R[0,1] = 1.0
-    R[2,2] = -1.0
+        Arguments:
+            ned: 3, or nx3 numpy array of north/east/down positions (m)
+            out: optional numpy array of the same shape to write the result
+                into, it may be the input array itself
+            dtype: optional dtype of the returned array if out is not given,
+                defaults to float64
 
-    return np.dot(R, ned)
+        Returns:
+            xyz: 3, or nx3 numpy array giving ecef positions in meters
+        """
+        return _convert_rows(self._to_ecef_rows, ned, out, dtype)
+
+    def to_lla(self, ned, out=None, dtype=None):
+        """ Convert points in this frame to lat/lon/alt
+
+        Arguments:
+            ned: 3, or nx3 numpy array of north/east/down positions (m)
+            out: optional numpy array of the same shape to write the result
+                into, it may be the input array itself
+            dtype: optional dtype of the returned array if out is not given,
+                defaults to float64
+
+        Returns:
+            lla: 3, or nx3 numpy array giving lat/lon/alt in radians and meters
+        """
+        return _convert_rows(self._to_lla_rows, ned, out, dtype)
+
+    def _from_ecef_rows(self, xyz, ned):
+        """ from_ecef on a block of rows, see _convert_rows
+        """
+        diff_xyz = xyz - self._xyz_ref
+        numpy.matmul(diff_xyz, self._R.T, out=ned)
+
+    def _to_ecef_rows(self, ned, xyz):
+        """ to_ecef on a block of rows, see _convert_rows
+        """
+        diff_xyz = numpy.dot(ned, self._R)
+        numpy.add(diff_xyz, self._xyz_ref, out=xyz)
+
+    def _to_ned_rows(self, lla, ned):
+        """ to_ned on a block of rows, see _convert_rows
+        """
+        xyz = numpy.empty(lla.shape)
+        _lla_to_xyz_rows(lla, xyz)
+        self._from_ecef_rows(xyz, ned)
+
+    def _to_lla_rows(self, ned, lla):
+        """ to_lla on a block of rows, see _convert_rows
+        """
+        xyz = numpy.empty(ned.shape)
+        self._to_ecef_rows(ned, xyz)
+        _xyz_to_lla_rows(xyz, lla)
+
+_FRAME_CACHE_SIZE = 16
+_frame_cache = collections.OrderedDict()
+_frame_cache_lock = threading.Lock()
+
+def local_tangent_frame(lla_ref):
+    """ Get a LocalTangentFrame for a reference point
+
+    Frames for the most recently used reference points are kept in a small
+    least-recently-used cache so that callers whose reference changes only
+    occasionally (or who convert several things against the same reference
+    in a cycle) do not rebuild the rotation every call.
+
+    Arguments:
+        lla_ref: 3, or 1x3 array-like giving the lat/lon/alt origin of the
+            frame in radians and meters
+
+    Returns:
+        frame: LocalTangentFrame instance for lla_ref. This is shared between
+            callers and should not be modified.
+    """
+    if isinstance(lla_ref, LocalTangentFrame):
+        return lla_ref
+
+    key = tuple(_reference_point(lla_ref))
+    with _frame_cache_lock:
+        frame = _frame_cache.pop(key, None)
+        if frame is None:
+            frame = LocalTangentFrame(key)
+        _frame_cache[key] = frame
+        while len(_frame_cache) > _FRAME_CACHE_SIZE:
+            _frame_cache.popitem(last=False)
+    return frame
 
 def get_distance(lla0, lla1):
-    """Method uses the speherical cosine law to return a distance. This is
-        fast, but not particularly accurate. For more accuracy, use the
-        Haversine formula: http://www.movable-type.co.uk/scripts/latlong.html
+    """Method uses the haversine formula to return a great circle distance.
+        This is fast and well behaved at short range, but ignores the
+        ellipsoid. For more accuracy, use geodesy.distance.vincenty
 
         Args:
-            lla0: a list [lat, lon] with the origin
-            lla1: a list [lat, lon] with the destintation
+            lla0: a list [lat, lon] with the origin, or an nx2 or nx3 array
+            lla1: a list [lat, lon] with the destintation, or an nx2 or nx3
+                array
 
         Returns:
             distance between X0 and X1 in meters
         """
-    lat0 = lla0[0]
-    lon0 = lla0[1]
-    lat1 = lla1[0]
-    lon1 = lla1[1]
-    delta_lon = lon1 - lon0
-    R = 6371000.0
-    return np.arccos(np.sin(lat1) * np.sin(lat0) +
-                     np.cos(lat1) * np.cos(lat0) * np.cos(delta_lon)) * R
+    return geodesy.distance.haversine(lla0, lla1)
 
 def datetime_to_gps(epoch):
     """ Convert a datetime instance to seconds since the gps epoch.
 
+    datetimes are interpreted on the tai scale, which differs from gps time
+    by a constant, so this is pure integer arithmetic on the datetime fields.
+
     Arguments:
         epoch: datetime instance specifying the epoch of interest. Can also
-            be list or tuple of same.
+            be list or tuple of same, or numpy datetime64 array
 
     Returns:
-        secs: floating point seconds since gps epoch. if input was list or
-            tuple then will return a numpy array
+        secs: floating point seconds since gps epoch. if input was list,
+            tuple or array then will return a numpy array
     """
-    if isinstance(epoch, tuple) or isinstance(epoch, list):
-        return numpy.array([datetime_to_gps(e) for e in epoch])
-
-    assert isinstance(epoch, datetime.datetime),\
-        "epoch must be a datetime instance"
-    ap_epoch = astropy.time.Time(epoch, scale='tai')
-    secs = ap_epoch.gps
-    return secs
+    return _tai_seconds(epoch) - _GPS_EPOCH_TAI
 
 def gps_to_datetime(secs):
     """ Convert seconds since the gps epoch to a datetime instance.
@@ -431,32 +625,28 @@ def gps_to_datetime(secs):
     if (isinstance(secs, numpy.ndarray) or
         isinstance(secs, list) or
         isinstance(secs, tuple)):
-        return tuple(gps_to_datetime(s) for s in secs)
+        tai_secs = numpy.asarray(secs, dtype=float) + _GPS_EPOCH_TAI
+        return tuple(_tai_datetime64(tai_secs).tolist())
 
-    assert isinstance(secs, float), "gps time must be float seconds"
-    ap_epoch = astropy.time.Time(secs, scale='tai', format='gps')
-    epoch = ap_epoch.datetime
-    return epoch
+    assert isinstance(secs, numbers.Real), "gps time must be float seconds"
+    return _TAI_EPOCH + datetime.timedelta(seconds=secs + _GPS_EPOCH_TAI)
 
 def datetime_to_unix(epoch):
     """ Convert a datetime instance to seconds since the unix epoch.
 
+    datetimes are interpreted on the tai scale. The leap second table in
+    geodesy.leap_seconds is used to get to utc, epochs outside of it fall
+    back to astropy.
+
     Arguments:
         epoch: datetime instance specifying the epoch of interest. can also
-            be a list or tuple of datetime
+            be a list or tuple of datetime, or numpy datetime64 array
 
     Returns:
-        secs: floating point seconds since unix epoch. If input was list or
-            tuple then will return a numpy array
+        secs: floating point seconds since unix epoch. If input was list,
+            tuple or array then will return a numpy array
     """
-    if isinstance(epoch, tuple) or isinstance(epoch, list):
-        return numpy.array([datetime_to_unix(e) for e in epoch])
-
-    assert isinstance(epoch, datetime.datetime),\
-        "epoch must be a datetime instance"
-    ap_epoch = astropy.time.Time(epoch, scale='tai')
-    secs = ap_epoch.unix
-    return secs
+    return _tai_to_unix(_tai_seconds(epoch))
 
 def unix_to_datetime(secs):
     """ Convert seconds since the unix epoch to a datetime instance.
@@ -473,13 +663,11 @@ def unix_to_datetime(secs):
     if (isinstance(secs, numpy.ndarray) or
         isinstance(secs, list) or
         isinstance(secs, tuple)):
-        return tuple(unix_to_datetime(s) for s in secs)
-
-    assert isinstance(secs, float), "unix time must be float seconds"
-    ap_epoch = astropy.time.Time(secs, scale='tai', format='unix')
-    epoch = ap_epoch.datetime
-    return epoch
+        tai_secs = _unix_to_tai(numpy.asarray(secs, dtype=float))
+        return tuple(_tai_datetime64(tai_secs).tolist())
 
+    assert isinstance(secs, numbers.Real), "unix time must be float seconds"
+    return _TAI_EPOCH + datetime.timedelta(seconds=_unix_to_tai(secs))
 
 def gps_to_unix(gps_secs):
     """Convert seconds since the gps epoch to seconds since unix epoch
@@ -490,17 +678,17 @@ def gps_to_unix(gps_secs):
 
     Returns:
         unix_secs: corresponding floating point seconds since unix epcoh. if
-            input was numpy array, list, or tuple then will return a tuple of
-            datetime instances
+            input was numpy array, list, or tuple then will return a numpy
+            array
     """
     if (isinstance(gps_secs, numpy.ndarray) or
         isinstance(gps_secs, list) or
         isinstance(gps_secs, tuple)):
-        return tuple(s.gps_to_unix for s in gps_secs)
-
-    assert isinstance(gps_secs, float), "gps time must be float seconds"
-    epoch = astropy.time.Time(gps_secs, scale='tai', format='gps')
-    return epoch.unix
+        gps_secs = numpy.asarray(gps_secs, dtype=float)
+    else:
+        assert isinstance(gps_secs, numbers.Real), \
+            "gps time must be float seconds"
+    return _tai_to_unix(gps_secs + _GPS_EPOCH_TAI)
 
 def unix_to_gps(unix_secs):
     """Convert seconds since the unix epoch to seconds since gps epoch
@@ -511,14 +699,93 @@ def unix_to_gps(unix_secs):
 
     Returns:
         gps_secs: corresponding floating point seconds since gps epoch. if
-            input was numpy array, list, or tuple then will return a tuple of
-            datetime instances
+            input was numpy array, list, or tuple then will return a numpy
+            array
     """
     if (isinstance(unix_secs, numpy.ndarray) or
         isinstance(unix_secs, list) or
         isinstance(unix_secs, tuple)):
-        return tuple(s.gps_to_unix for s in unix_secs)
+        unix_secs = numpy.asarray(unix_secs, dtype=float)
+    else:
+        assert isinstance(unix_secs, numbers.Real), \
+            "unix time must be float seconds"
+    return _unix_to_tai(unix_secs) - _GPS_EPOCH_TAI
+
+# naive datetimes are treated as tai labels, count from the same epoch as unix
+_TAI_EPOCH = datetime.datetime(1970, 1, 1)
+_TAI_EPOCH_64 = numpy.datetime64('1970-01-01T00:00:00', 'us')
+# 1980-01-06 00:00:00 utc, in tai seconds
+_GPS_EPOCH_TAI = 315964819.0
+
+def _tai_seconds(epoch):
+    """ Seconds since 1970-01-01 on the tai scale
+
+    Arguments:
+        epoch: datetime, list or tuple of datetime, or numpy datetime64
+
+    Returns:
+        tai_secs: float, or numpy array for sequence inputs
+    """
+    if (isinstance(epoch, numpy.ndarray) or
+        isinstance(epoch, numpy.datetime64) or
+        isinstance(epoch, list) or
+        isinstance(epoch, tuple)):
+        epoch = numpy.asarray(epoch, dtype='datetime64[us]')
+        return (epoch - _TAI_EPOCH_64).astype(numpy.int64) * 1.0e-6
+
+    assert isinstance(epoch, datetime.datetime),\
+        "epoch must be a datetime instance"
+    delta = epoch - _TAI_EPOCH
+    return (delta.days * 86400 + delta.seconds) + delta.microseconds * 1.0e-6
 
-    assert isinstance(unix_secs, float), "unix time must be float seconds"
-    epoch = astropy.time.Time(unix_secs, scale='tai', format='unix')
-    return epoch.gps
+def _tai_datetime64(tai_secs):
+    """ Convert tai seconds to numpy datetime64
+
+    Arguments:
+        tai_secs: numpy array of seconds since 1970-01-01 on the tai scale
+
+    Returns:
+        epoch: numpy datetime64[us] array
+    """
+    micros = numpy.round(tai_secs * 1.0e6).astype(numpy.int64)
+    return _TAI_EPOCH_64 + micros.astype('timedelta64[us]')
+
+def _tai_to_unix(tai_secs):
+    """ Convert tai seconds to unix seconds, using astropy outside the table
+
+    Arguments:
+        tai_secs: float or numpy array of seconds since 1970 on the tai scale
+
+    Returns:
+        unix_secs: float or numpy array matching the input
+    """
+    unix_secs = geodesy.leap_seconds.tai_to_unix(tai_secs)
+    outside = ~geodesy.leap_seconds.in_table_tai(tai_secs)
+    if numpy.any(outside):
+        import astropy.time
+        unix_secs[outside] = astropy.time.Time(
+            numpy.asarray(tai_secs)[outside] - _GPS_EPOCH_TAI,
+            scale='tai', format='gps').unix
+    if unix_secs.ndim == 0:
+        return float(unix_secs)
+    return unix_secs
+
+def _unix_to_tai(unix_secs):
+    """ Convert unix seconds to tai seconds, using astropy outside the table
+
+    Arguments:
+        unix_secs: float or numpy array of seconds since the unix epoch
+
+    Returns:
+        tai_secs: float or numpy array matching the input
+    """
+    tai_secs = geodesy.leap_seconds.unix_to_tai(unix_secs)
+    outside = ~geodesy.leap_seconds.in_table_unix(unix_secs)
+    if numpy.any(outside):
+        import astropy.time
+        tai_secs[outside] = astropy.time.Time(
+            numpy.asarray(unix_secs, dtype=float)[outside],
+            scale='tai', format='unix').gps + _GPS_EPOCH_TAI
+    if tai_secs.ndim == 0:
+        return float(tai_secs)
+    return tai_secs
@@ -0,0 +1,395 @@
+""" Distances between points on the earth
+
+All of the functions here take lat/lon (and optionally alt, which is
+ignored) in radians as the trailing axis of numpy arrays, so a single point
+is a 2, or 3, array and many points are an nx2 or nx3 array. Element-wise
+functions broadcast their inputs against each other, the pairwise functions
+compute every combination of two sets of points.
+"""
+import numpy
+
+# mean earth radius used for spherical approximations (m)
+EARTH_RADIUS = 6371000.0
+
+# WGS84 ellipsoid
+_A_EARTH = 6378137.0
+_FLATTENING = 1.0 / 298.257223563
+_B_EARTH = (1.0 - _FLATTENING) * _A_EARTH
+
+# number of distances to evaluate at once when chunking pairwise queries
+_CHUNK_ELEMENTS = 2**20
+
+def haversine(lla0, lla1, radius=EARTH_RADIUS):
+    """ Great circle distance on a sphere using the haversine formula
+
+    Well conditioned for short ranges, unlike the spherical law of cosines.
+    Error relative to the ellipsoid is up to about 0.5%.
+
+    Arguments:
+        lla0: 2, 3, nx2 or nx3 numpy array of origin lat/lon (rad)
+        lla1: 2, 3, nx2 or nx3 numpy array of destination lat/lon (rad)
+        radius: optional sphere radius, defaults to the mean earth radius (m)
+
+    Returns:
+        distance: float or numpy array of distances (m), broadcast from the
+            inputs
+    """
+    lla0 = numpy.asarray(lla0, dtype=float)
+    lla1 = numpy.asarray(lla1, dtype=float)
+    lat0 = lla0[..., 0]
+    lat1 = lla1[..., 0]
+
+    sin_dlat = numpy.sin((lat1 - lat0) / 2.0)
+    sin_dlon = numpy.sin((lla1[..., 1] - lla0[..., 1]) / 2.0)
+    h = sin_dlat * sin_dlat + numpy.cos(lat0) * numpy.cos(lat1) * (
+        sin_dlon * sin_dlon)
+    return 2.0 * radius * numpy.arcsin(numpy.sqrt(numpy.clip(h, 0.0, 1.0)))
+
+def vincenty(lla0, lla1, tol=1.0e-12, max_iter=200):
+    """ Geodesic distance on the WGS84 ellipsoid by Vincenty's inverse method
+
+    The iteration is carried out on whole arrays, each pass only working on
+    the points which have not yet converged. Accurate to well under a
+    millimeter. Vincenty's method can fail to converge for nearly antipodal
+    points, those fall back to the haversine distance.
+
+    Arguments:
+        lla0: 2, 3, nx2 or nx3 numpy array of origin lat/lon (rad)
+        lla1: 2, 3, nx2 or nx3 numpy array of destination lat/lon (rad)
+        tol: optional, convergence tolerance on longitude on the auxiliary
+            sphere (rad)
+        max_iter: optional, maximum number of iterations
+
+    Returns:
+        distance: float or numpy array of distances (m), broadcast from the
+            inputs
+    """
+    return _vincenty_inverse(lla0, lla1, tol, max_iter)[0]
+
+def vincenty_inverse(lla0, lla1, tol=1.0e-12, max_iter=200):
+    """ Geodesic distance and initial azimuth by Vincenty's inverse method
+
+    Points which fail to converge get the haversine distance, their azimuth
+    is that of the last iteration.
+
+    Arguments:
+        lla0: 2, 3, nx2 or nx3 numpy array of origin lat/lon (rad)
+        lla1: 2, 3, nx2 or nx3 numpy array of destination lat/lon (rad)
+        tol: optional, convergence tolerance on longitude on the auxiliary
+            sphere (rad)
+        max_iter: optional, maximum number of iterations
+
+    Returns:
+        (distance, azimuth)
+            distance: float or numpy array of distances (m)
+            azimuth: float or numpy array of the azimuth of the geodesic at
+                lla0, clockwise from north (rad)
+    """
+    return _vincenty_inverse(lla0, lla1, tol, max_iter, True)
+
+def _vincenty_inverse(lla0, lla1, tol, max_iter, azimuth=False):
+    """ Vincenty's inverse method, shared by vincenty and vincenty_inverse
+
+    Arguments:
+        lla0: origin lat/lon (rad)
+        lla1: destination lat/lon (rad)
+        tol: convergence tolerance on longitude on the auxiliary sphere (rad)
+        max_iter: maximum number of iterations
+        azimuth: optional, also compute the initial azimuth
+
+    Returns:
+        (distance, azimuth): azimuth is None unless requested
+    """
+    lla0 = numpy.asarray(lla0, dtype=float)
+    lla1 = numpy.asarray(lla1, dtype=float)
+    f = _FLATTENING
+
+    U0 = numpy.arctan((1.0 - f) * numpy.tan(lla0[..., 0]))
+    U1 = numpy.arctan((1.0 - f) * numpy.tan(lla1[..., 0]))
+    L = lla1[..., 1] - lla0[..., 1]
+    U0, U1, L = numpy.broadcast_arrays(U0, U1, L)
+    shape = L.shape
+    L = L.ravel()
+    sin_U0 = numpy.sin(U0).ravel()
+    cos_U0 = numpy.cos(U0).ravel()
+    sin_U1 = numpy.sin(U1).ravel()
+    cos_U1 = numpy.cos(U1).ravel()
+
+    lam = L.copy()
+    sin_sigma = numpy.empty(L.shape)
+    cos_sigma = numpy.empty(L.shape)
+    sigma = numpy.empty(L.shape)
+    cos2_alpha = numpy.empty(L.shape)
+    cos_2sigma_m = numpy.empty(L.shape)
+    # indices of the points which have not converged yet
+    active = numpy.arange(L.shape[0])
+    for i in range(max_iter):
+        sin_lam = numpy.sin(lam[active])
+        cos_lam = numpy.cos(lam[active])
+        su0 = sin_U0[active]
+        cu0 = cos_U0[active]
+        su1 = sin_U1[active]
+        cu1 = cos_U1[active]
+
+        s_sigma = numpy.hypot(cu1 * sin_lam, cu0 * su1 - su0 * cu1 * cos_lam)
+        c_sigma = su0 * su1 + cu0 * cu1 * cos_lam
+        sig = numpy.arctan2(s_sigma, c_sigma)
+
+        # coincident points have sin_sigma == 0, equatorial lines have
+        # cos2_alpha == 0. both are well defined limits
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            sin_alpha = numpy.where(
+                s_sigma > 0.0, cu0 * cu1 * sin_lam / s_sigma, 0.0)
+            c2_alpha = 1.0 - sin_alpha * sin_alpha
+            c_2sigma_m = numpy.where(
+                c2_alpha > 0.0, c_sigma - 2.0 * su0 * su1 / c2_alpha, 0.0)
+        C = f / 16.0 * c2_alpha * (4.0 + f * (4.0 - 3.0 * c2_alpha))
+
+        lam_next = L[active] + (1.0 - C) * f * sin_alpha * (
+            sig + C * s_sigma * (c_2sigma_m + C * c_sigma * (
+                -1.0 + 2.0 * c_2sigma_m * c_2sigma_m)))
+
+        sin_sigma[active] = s_sigma
+        cos_sigma[active] = c_sigma
+        sigma[active] = sig
+        cos2_alpha[active] = c2_alpha
+        cos_2sigma_m[active] = c_2sigma_m
+
+        moving = numpy.abs(lam_next - lam[active]) > tol
+        lam[active] = lam_next
+        active = active[moving]
+        if active.shape[0] == 0:
+            break
+
+    u2 = cos2_alpha * (_A_EARTH**2.0 - _B_EARTH**2.0) / _B_EARTH**2.0
+    A = 1.0 + u2 / 16384.0 * (
+        4096.0 + u2 * (-768.0 + u2 * (320.0 - 175.0 * u2)))
+    B = u2 / 1024.0 * (256.0 + u2 * (-128.0 + u2 * (74.0 - 47.0 * u2)))
+    delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4.0 * (
+        cos_sigma * (-1.0 + 2.0 * cos_2sigma_m * cos_2sigma_m) -
+        B / 6.0 * cos_2sigma_m * (-3.0 + 4.0 * sin_sigma * sin_sigma) * (
+            -3.0 + 4.0 * cos_2sigma_m * cos_2sigma_m)))
+    distance = _B_EARTH * A * (sigma - delta_sigma)
+
+    if active.shape[0] > 0:
+        fallback = numpy.broadcast_to(haversine(lla0, lla1), shape).ravel()
+        distance[active] = fallback[active]
+
+    if not azimuth:
+        return (distance.reshape(shape)[()], None)
+    alpha = numpy.arctan2(cos_U1 * numpy.sin(lam),
+        cos_U0 * sin_U1 - sin_U0 * cos_U1 * numpy.cos(lam))
+    return (distance.reshape(shape)[()], alpha.reshape(shape)[()])
+
+def vincenty_direct(lla, azimuth, distance, tol=1.0e-12, max_iter=20):
+    """ Travel a distance along a geodesic by Vincenty's direct method
+
+    The inverse of vincenty_inverse, evaluated on whole arrays. Unlike the
+    inverse method it converges everywhere, usually in three or four passes.
+
+    Arguments:
+        lla: 2, 3, nx2 or nx3 numpy array of start lat/lon (rad). altitude
+            is ignored
+        azimuth: float or numpy array of the initial azimuth, clockwise from
+            north (rad)
+        distance: float or numpy array of distances to travel (m)
+        tol: optional, convergence tolerance on the arc length on the
+            auxiliary sphere (rad)
+        max_iter: optional, maximum number of iterations
+
+    Returns:
+        lla: numpy array of the destination lat/lon (rad), shaped like the
+            broadcast inputs with a trailing axis of 2
+    """
+    lla = numpy.asarray(lla, dtype=float)
+    f = _FLATTENING
+    sin_alpha1 = numpy.sin(azimuth)
+    cos_alpha1 = numpy.cos(azimuth)
+
+    U1 = numpy.arctan((1.0 - f) * numpy.tan(lla[..., 0]))
+    sin_U1 = numpy.sin(U1)
+    cos_U1 = numpy.cos(U1)
+    sigma1 = numpy.arctan2(numpy.tan(U1), cos_alpha1)
+    sin_alpha = cos_U1 * sin_alpha1
+    cos2_alpha = 1.0 - sin_alpha * sin_alpha
+
+    u2 = cos2_alpha * (_A_EARTH**2.0 - _B_EARTH**2.0) / _B_EARTH**2.0
+    A = 1.0 + u2 / 16384.0 * (
+        4096.0 + u2 * (-768.0 + u2 * (320.0 - 175.0 * u2)))
+    B = u2 / 1024.0 * (256.0 + u2 * (-128.0 + u2 * (74.0 - 47.0 * u2)))
+
+    sigma0 = numpy.asarray(distance, dtype=float) / (_B_EARTH * A)
+    sigma = sigma0
+    for i in range(max_iter):
+        cos_2sigma_m = numpy.cos(2.0 * sigma1 + sigma)
+        sin_sigma = numpy.sin(sigma)
+        cos_sigma = numpy.cos(sigma)
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4.0 * (
+            cos_sigma * (-1.0 + 2.0 * cos_2sigma_m * cos_2sigma_m) -
+            B / 6.0 * cos_2sigma_m * (-3.0 + 4.0 * sin_sigma * sin_sigma) * (
+                -3.0 + 4.0 * cos_2sigma_m * cos_2sigma_m)))
+        sigma_next = sigma0 + delta_sigma
+        converged = numpy.all(numpy.abs(sigma_next - sigma) <= tol)
+        sigma = sigma_next
+        if converged:
+            break
+
+    cos_2sigma_m = numpy.cos(2.0 * sigma1 + sigma)
+    sin_sigma = numpy.sin(sigma)
+    cos_sigma = numpy.cos(sigma)
+    tmp = sin_U1 * sin_sigma - cos_U1 * cos_sigma * cos_alpha1
+    lat = numpy.arctan2(
+        sin_U1 * cos_sigma + cos_U1 * sin_sigma * cos_alpha1,
+        (1.0 - f) * numpy.hypot(sin_alpha, tmp))
+    lam = numpy.arctan2(sin_sigma * sin_alpha1,
+        cos_U1 * cos_sigma - sin_U1 * sin_sigma * cos_alpha1)
+    C = f / 16.0 * cos2_alpha * (4.0 + f * (4.0 - 3.0 * cos2_alpha))
+    L = lam - (1.0 - C) * f * sin_alpha * (
+        sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (
+            -1.0 + 2.0 * cos_2sigma_m * cos_2sigma_m)))
+    lon = numpy.mod(lla[..., 1] + L + numpy.pi, 2.0 * numpy.pi) - numpy.pi
+    return numpy.stack(numpy.broadcast_arrays(lat, lon), axis=-1)
+
+_METHODS = {'haversine': haversine, 'vincenty': vincenty}
+
+def distance(lla0, lla1, method='vincenty'):
+    """ Element-wise distance between points
+
+    Arguments:
+        lla0: 2, 3, nx2 or nx3 numpy array of origin lat/lon (rad)
+        lla1: 2, 3, nx2 or nx3 numpy array of destination lat/lon (rad)
+        method: optional, 'vincenty' (default) or 'haversine'
+
+    Returns:
+        distance: float or numpy array of distances (m), broadcast from the
+            inputs
+    """
+    assert method in _METHODS, "method must be one of " + str(
+        sorted(_METHODS.keys()))
+    return _METHODS[method](lla0, lla1)
+
+def pairwise_distance(lla0, lla1, method='haversine'):
+    """ Distance between every pair of points from two sets
+
+    Arguments:
+        lla0: nx2 or nx3 numpy array of lat/lon (rad)
+        lla1: mx2 or mx3 numpy array of lat/lon (rad)
+        method: optional, 'haversine' (default) or 'vincenty'
+
+    Returns:
+        distance: nxm numpy array, distance[i, j] is from lla0[i] to lla1[j]
+    """
+    lla0 = numpy.atleast_2d(numpy.asarray(lla0, dtype=float))
+    lla1 = numpy.atleast_2d(numpy.asarray(lla1, dtype=float))
+    return distance(lla0[:, numpy.newaxis, :2], lla1[numpy.newaxis, :, :2],
+        method)
+
+def iter_pairwise_distance(lla0, lla1, method='haversine', chunk_size=None):
+    """ Pairwise distances computed a block of columns at a time
+
+    Memory use is bounded by the size of one nxchunk_size block, so this
+    can be used when the full nxm matrix would not fit.
+
+    Arguments:
+        lla0: nx2 or nx3 numpy array of lat/lon (rad)
+        lla1: mx2 or mx3 numpy array of lat/lon (rad)
+        method: optional, 'haversine' (default) or 'vincenty'
+        chunk_size: optional number of lla1 points per block. If not
+            specified, blocks are sized to about a million distances
+
+    Yields:
+        (start, block)
+            start: index into lla1 of the first column of this block
+            block: nxk numpy array of distances to lla1[start:start + k]
+    """
+    lla0 = numpy.atleast_2d(numpy.asarray(lla0, dtype=float))
+    lla1 = numpy.atleast_2d(numpy.asarray(lla1, dtype=float))
+    if chunk_size is None:
+        chunk_size = max(1, _CHUNK_ELEMENTS // max(1, lla0.shape[0]))
+    assert chunk_size > 0, "chunk_size must be positive"
+
+    for start in range(0, lla1.shape[0], chunk_size):
+        yield (start, pairwise_distance(
+            lla0, lla1[start:start + chunk_size], method))
+
+def nearest(lla0, lla1, method='haversine', chunk_size=None):
+    """ Find the closest point in one set to each point in another
+
+    Evaluated in chunks with iter_pairwise_distance so memory stays bounded
+    for large sets.
+
+    Arguments:
+        lla0: nx2 or nx3 numpy array of lat/lon (rad)
+        lla1: mx2 or mx3 numpy array of lat/lon (rad)
+        method: optional, 'haversine' (default) or 'vincenty'
+        chunk_size: optional number of lla1 points per block
+
+    Returns:
+        (distance, index)
+            distance: n, numpy array of the distance to the nearest point (m)
+            index: n, numpy array of the index into lla1 of that point
+    """
+    lla0 = numpy.atleast_2d(numpy.asarray(lla0, dtype=float))
+    best_distance = numpy.full((lla0.shape[0],), numpy.inf)
+    best_index = numpy.zeros((lla0.shape[0],), dtype=int)
+    rows = numpy.arange(lla0.shape[0])
+
+    for start, block in iter_pairwise_distance(
+            lla0, lla1, method, chunk_size):
+        block_index = numpy.argmin(block, axis=1)
+        block_distance = block[rows, block_index]
+        closer = block_distance < best_distance
+        best_distance[closer] = block_distance[closer]
+        best_index[closer] = block_index[closer] + start
+    return (best_distance, best_index)
+
+def iter_resample(lla, spacing, chunk_size=_CHUNK_ELEMENTS):
+    """ Resample a polyline to points evenly spaced along the ellipsoid
+
+    Points are placed every spacing meters of geodesic distance along the
+    line, starting at the first vertex, and the last vertex is added so the
+    resampled line ends where the original does. They are generated a chunk
+    at a time, only the per-segment lengths and azimuths are held for the
+    whole line so very long lines can be resampled in bounded memory.
+    Altitude, if given, is interpolated linearly along each segment.
+
+    Arguments:
+        lla: nx2 or nx3 numpy array of the polyline vertices lat/lon(/alt)
+            (rad, rad, m)
+        spacing: distance between points (m)
+        chunk_size: optional maximum number of points per chunk
+
+    Yields:
+        lla: kx2 or kx3 numpy array of resampled points, k <= chunk_size
+    """
+    lla = numpy.atleast_2d(numpy.asarray(lla, dtype=float))
+    assert spacing > 0.0, "spacing must be positive"
+    assert chunk_size > 0, "chunk_size must be positive"
+
+    length, azimuth = vincenty_inverse(lla[:-1], lla[1:])
+    length = numpy.atleast_1d(length)
+    azimuth = numpy.atleast_1d(azimuth)
+    cumulative = numpy.concatenate(([0.0], numpy.cumsum(length)))
+    n_stations = int(numpy.floor(cumulative[-1] / spacing)) + 1
+    n_segments = length.shape[0]
+
+    for start in range(0, n_stations, chunk_size):
+        stations = numpy.arange(
+            start, min(start + chunk_size, n_stations)) * spacing
+        idx = numpy.searchsorted(cumulative, stations, side='right') - 1
+        idx = numpy.clip(idx, 0, max(n_segments - 1, 0))
+        along = stations - cumulative[idx]
+
+        chunk = numpy.empty((stations.shape[0], lla.shape[1]))
+        if n_segments == 0:
+            chunk[:] = lla[0]
+        else:
+            chunk[:, :2] = vincenty_direct(lla[idx], azimuth[idx], along)
+        if lla.shape[1] > 2 and n_segments > 0:
+            with numpy.errstate(invalid='ignore', divide='ignore'):
+                t = numpy.where(length[idx] > 0.0, along / length[idx], 0.0)
+            chunk[:, 2] = lla[idx, 2] + t * (lla[idx + 1, 2] - lla[idx, 2])
+        yield chunk
+
+    if cumulative[-1] - (n_stations - 1) * spacing > 1.0e-9 * spacing:
+        yield lla[-1:].copy()
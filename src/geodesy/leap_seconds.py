@@ -0,0 +1,140 @@
+""" Leap second table for converting between the TAI and UTC time scales
+
+All times here are floating point seconds since 1970-01-01 00:00:00 on the
+named scale, so "unix" seconds are UTC labels and "tai" seconds are TAI
+labels. Conversions follow astropy's convention for the unix format: on a day
+that ends in a leap second the 86401 SI seconds of the day are spread evenly
+over the 86400 unix seconds of its label.
+
+The table is valid from 1972-01-01 (before then TAI - UTC was not an integer
+number of seconds) until EXPIRES. Update both from IERS Bulletin C when a new
+leap second is announced.
+"""
+import datetime
+
+import numpy
+
+# (UTC date at whose midnight the offset takes effect, TAI - UTC in seconds)
+LEAP_SECONDS = (
+    (datetime.date(1972, 1, 1), 10),
+    (datetime.date(1972, 7, 1), 11),
+    (datetime.date(1973, 1, 1), 12),
+    (datetime.date(1974, 1, 1), 13),
+    (datetime.date(1975, 1, 1), 14),
+    (datetime.date(1976, 1, 1), 15),
+    (datetime.date(1977, 1, 1), 16),
+    (datetime.date(1978, 1, 1), 17),
+    (datetime.date(1979, 1, 1), 18),
+    (datetime.date(1980, 1, 1), 19),
+    (datetime.date(1981, 7, 1), 20),
+    (datetime.date(1982, 7, 1), 21),
+    (datetime.date(1983, 7, 1), 22),
+    (datetime.date(1985, 7, 1), 23),
+    (datetime.date(1988, 1, 1), 24),
+    (datetime.date(1990, 1, 1), 25),
+    (datetime.date(1991, 1, 1), 26),
+    (datetime.date(1992, 7, 1), 27),
+    (datetime.date(1993, 7, 1), 28),
+    (datetime.date(1994, 7, 1), 29),
+    (datetime.date(1996, 1, 1), 30),
+    (datetime.date(1997, 7, 1), 31),
+    (datetime.date(1999, 1, 1), 32),
+    (datetime.date(2006, 1, 1), 33),
+    (datetime.date(2009, 1, 1), 34),
+    (datetime.date(2012, 7, 1), 35),
+    (datetime.date(2015, 7, 1), 36),
+    (datetime.date(2017, 1, 1), 37),
+    )
+
+# last date for which the table is known to be complete
+EXPIRES = datetime.date(2026, 12, 28)
+
+_EPOCH = datetime.date(1970, 1, 1)
+_DAY = 86400.0
+
+_CHANGE_UNIX = numpy.array(
+    [(d - _EPOCH).days * _DAY for (d, _) in LEAP_SECONDS])
+_TAI_MINUS_UTC = numpy.array([float(dat) for (_, dat) in LEAP_SECONDS])
+_CHANGE_TAI = _CHANGE_UNIX + _TAI_MINUS_UTC
+
+_EXPIRES_UNIX = (EXPIRES - _EPOCH).days * _DAY
+_EXPIRES_TAI = _EXPIRES_UNIX + _TAI_MINUS_UTC[-1]
+
+def in_table_unix(unix_secs):
+    """ Check whether unix times are covered by the leap second table
+
+    Arguments:
+        unix_secs: float or numpy array of seconds since the unix epoch
+
+    Returns:
+        in_table: boolean or numpy boolean array
+    """
+    unix_secs = numpy.asarray(unix_secs, dtype=float)
+    return (unix_secs >= _CHANGE_UNIX[0]) & (unix_secs < _EXPIRES_UNIX)
+
+def in_table_tai(tai_secs):
+    """ Check whether tai times are covered by the leap second table
+
+    Arguments:
+        tai_secs: float or numpy array of seconds since 1970 on the tai scale
+
+    Returns:
+        in_table: boolean or numpy boolean array
+    """
+    tai_secs = numpy.asarray(tai_secs, dtype=float)
+    return (tai_secs >= _CHANGE_TAI[0]) & (tai_secs < _EXPIRES_TAI)
+
+def tai_to_unix(tai_secs):
+    """ Convert tai seconds to unix seconds
+
+    Values outside of the table are extrapolated with the nearest entry, use
+    in_table_tai to find them.
+
+    Arguments:
+        tai_secs: float or numpy array of seconds since 1970 on the tai scale
+
+    Returns:
+        unix_secs: numpy array of seconds since the unix epoch
+    """
+    tai_secs = numpy.asarray(tai_secs, dtype=float)
+    n_entries = _TAI_MINUS_UTC.shape[0]
+
+    idx = numpy.searchsorted(_CHANGE_TAI, tai_secs, side='right') - 1
+    idx = numpy.clip(idx, 0, n_entries - 1)
+    unix_secs = tai_secs - _TAI_MINUS_UTC[idx]
+
+    # stretch the day leading up to a leap second over its 86400 unix seconds
+    next_idx = numpy.minimum(idx + 1, n_entries - 1)
+    day_start_unix = _CHANGE_UNIX[next_idx] - _DAY
+    day_start_tai = day_start_unix + _TAI_MINUS_UTC[idx]
+    leap_day = (idx + 1 < n_entries) & (tai_secs >= day_start_tai)
+    stretched = day_start_unix + (tai_secs - day_start_tai) * (
+        _DAY / (_DAY + 1.0))
+    return numpy.where(leap_day, stretched, unix_secs)
+
+def unix_to_tai(unix_secs):
+    """ Convert unix seconds to tai seconds
+
+    Values outside of the table are extrapolated with the nearest entry, use
+    in_table_unix to find them.
+
+    Arguments:
+        unix_secs: float or numpy array of seconds since the unix epoch
+
+    Returns:
+        tai_secs: numpy array of seconds since 1970 on the tai scale
+    """
+    unix_secs = numpy.asarray(unix_secs, dtype=float)
+    n_entries = _TAI_MINUS_UTC.shape[0]
+
+    idx = numpy.searchsorted(_CHANGE_UNIX, unix_secs, side='right') - 1
+    idx = numpy.clip(idx, 0, n_entries - 1)
+    tai_secs = unix_secs + _TAI_MINUS_UTC[idx]
+
+    next_idx = numpy.minimum(idx + 1, n_entries - 1)
+    day_start_unix = _CHANGE_UNIX[next_idx] - _DAY
+    day_start_tai = day_start_unix + _TAI_MINUS_UTC[idx]
+    leap_day = (idx + 1 < n_entries) & (unix_secs >= day_start_unix)
+    stretched = day_start_tai + (unix_secs - day_start_unix) * (
+        (_DAY + 1.0) / _DAY)
+    return numpy.where(leap_day, stretched, tai_secs)
@@ -0,0 +1,414 @@
+""" A persistent spatial index of flight tracks for proximity queries
+
+Tracks are cut into short segments of consecutive fixes. Each segment has a
+lat/lon bounding box and a time range, and is registered in every cell of a
+lat/lon grid its box touches. A query for the tracks which passed near a
+point gathers the segments from the grid cells around it, drops those
+outside the time window, then measures the exact distance to the fixes of
+the segments that remain.
+
+The index keeps its own copy of the fix times and positions and can be saved
+to a directory of .npy files and memory-mapped back, so queries never need
+the original logs.
+"""
+import json
+import os
+
+import numpy
+
+import geodesy.distance
+
+# fields of the result of TrackIndex.query
+PROXIMITY_DTYPE = numpy.dtype([
+    ('track', numpy.int64),
+    ('distance', numpy.float64),
+    ('time', numpy.float64),
+    ])
+
+_ARRAYS = (
+    'time', 'latlon', 'track_offsets', 'segment_start', 'segment_stop',
+    'segment_box',
+    'segment_time', 'cell_keys', 'cell_offsets', 'cell_segments')
+
+_META_FILE = 'index.json'
+
+# segments whose boxes touch more grid cells than this are kept in one
+# overflow cell which every query searches, rather than in each cell
+_MAX_SEGMENT_CELLS = 256
+_OVERFLOW_KEY = -1
+
+def _ranges(start, stop):
+    """ Concatenate the integer ranges start[i]:stop[i] without a loop
+
+    Arguments:
+        start: numpy int array of range starts
+        stop: numpy int array of range stops
+
+    Returns:
+        idx: numpy int array of every integer in each range in turn
+    """
+    lengths = stop - start
+    first_out = numpy.concatenate(([0], numpy.cumsum(lengths)[:-1]))
+    return numpy.arange(numpy.sum(lengths)) + numpy.repeat(
+        start - first_out, lengths)
+
+class TrackIndex(object):
+    """ Index of many tracks for "who passed near here, and when" queries
+    """
+    def __init__(self, cell_size=numpy.deg2rad(0.25), segment_size=64):
+        """ Constructor
+
+        Arguments:
+            cell_size: optional size of the grid cells (rad)
+            segment_size: optional number of fixes per indexed segment
+
+        Returns:
+            class instance
+        """
+        self.cell_size = float(cell_size)
+        self.segment_size = int(segment_size)
+        self.metadata = []
+
+        self._pending = []
+        self._time = numpy.empty((0,))
+        self._latlon = numpy.empty((0, 2))
+        self._track_offsets = numpy.zeros((1,), dtype=numpy.int64)
+        self._is_built = False
+
+    @property
+    def n_columns(self):
+        """ getter for the number of grid cells around a circle of latitude
+        """
+        return int(numpy.ceil(2.0 * numpy.pi / self.cell_size))
+
+    def __len__(self):
+        """ Number of tracks in the index
+        """
+        return len(self.metadata)
+
+    def add(self, time, lla, metadata=None):
+        """ Add a track
+
+        Arguments:
+            time: n, numpy array of fix times
+            lla: nx2 or nx3 numpy array of lat/lon(/alt) (rad)
+            metadata: optional json serializable dict describing the track
+
+        Returns:
+            track: index of this track in the index
+        """
+        time = numpy.asarray(time, dtype=float)
+        lla = numpy.atleast_2d(numpy.asarray(lla, dtype=float))
+        assert lla.shape[0] == time.shape[0], 'need a position for every time'
+        self._pending.append((time, lla[:, :2], [time.shape[0]]))
+        self.metadata.append(metadata)
+        self._is_built = False
+        return len(self.metadata) - 1
+
+    def add_collection(self, collection):
+        """ Add every flight of a FlightCollection
+
+        Arguments:
+            collection: parsers.flight_collection.FlightCollection. the
+                flight metadata is stored with its date converted to a
+                string
+
+        Returns:
+            tracks: numpy int array of the indices of the added tracks
+        """
+        fixes = collection.fixes
+        latlon = numpy.vstack((fixes['latitude'], fixes['longitude'])).T
+        self._pending.append((fixes['time'], latlon, collection.lengths))
+
+        first = len(self.metadata)
+        for metadata in collection.metadata:
+            metadata = dict(metadata)
+            if metadata.get('date') is not None:
+                metadata['date'] = metadata['date'].isoformat()
+            self.metadata.append(metadata)
+        self._is_built = False
+        return numpy.arange(first, len(self.metadata))
+
+    def build(self):
+        """ Build the segments and grid, called automatically by query
+
+        Arguments:
+            no arguments
+
+        Returns:
+            no returns
+        """
+        if self._is_built:
+            return
+
+        if self._pending:
+            lengths = numpy.diff(self._track_offsets)
+            times = [self._time]
+            latlons = [self._latlon]
+            for time, latlon, track_lengths in self._pending:
+                times.append(time)
+                latlons.append(latlon)
+                lengths = numpy.concatenate((lengths, track_lengths))
+            self._time = numpy.concatenate(times)
+            self._latlon = numpy.concatenate(latlons)
+            self._track_offsets = numpy.concatenate(
+                ([0], numpy.cumsum(lengths))).astype(numpy.int64)
+            self._pending = []
+
+        self._build_segments()
+        self._build_grid()
+        self._is_built = True
+
+    def _build_segments(self):
+        """ Cut tracks into segments and find their bounding boxes
+
+        Arguments:
+            no arguments
+
+        Returns:
+            no returns
+        """
+        offsets = self._track_offsets
+        lengths = numpy.diff(offsets)
+        n_segments = -(-lengths // self.segment_size)
+        segment_track = numpy.repeat(
+            numpy.arange(lengths.shape[0]), n_segments)
+        first_segment = numpy.concatenate(([0], numpy.cumsum(n_segments)))
+        local = numpy.arange(segment_track.shape[0]) - first_segment[
+            segment_track]
+        start = offsets[segment_track] + local * self.segment_size
+        stop = numpy.minimum(
+            start + self.segment_size, offsets[segment_track + 1])
+
+        box = numpy.empty((start.shape[0], 4))
+        seg_time = numpy.empty((start.shape[0], 2))
+        if start.shape[0] > 0:
+            # segments tile the fixes in order so reduceat covers each one
+            lat = self._latlon[:, 0]
+            lon = self._latlon[:, 1]
+            box[:, 0] = numpy.minimum.reduceat(lat, start)
+            box[:, 1] = numpy.maximum.reduceat(lat, start)
+            box[:, 2] = numpy.minimum.reduceat(lon, start)
+            box[:, 3] = numpy.maximum.reduceat(lon, start)
+            seg_time[:, 0] = numpy.minimum.reduceat(self._time, start)
+            seg_time[:, 1] = numpy.maximum.reduceat(self._time, start)
+
+            # a segment crossing the antimeridian gets a box which wraps,
+            # from its most westerly eastern longitude to its most easterly
+            # western one, so box[:, 2] > box[:, 3]
+            wraps = box[:, 3] - box[:, 2] > numpy.pi
+            if numpy.any(wraps):
+                west = numpy.minimum.reduceat(
+                    numpy.where(lon >= 0.0, lon, numpy.inf), start)
+                east = numpy.maximum.reduceat(
+                    numpy.where(lon < 0.0, lon, -numpy.inf), start)
+                box[wraps, 2] = west[wraps]
+                box[wraps, 3] = east[wraps]
+
+        self._segment_start = start
+        self._segment_stop = stop
+        self._segment_box = box
+        self._segment_time = seg_time
+
+    def _cell_rows(self, lat):
+        """ Grid row of latitudes
+        """
+        n_rows = int(numpy.ceil(numpy.pi / self.cell_size))
+        return numpy.clip(
+            numpy.floor((lat + numpy.pi / 2.0) / self.cell_size).astype(
+                numpy.int64), 0, n_rows - 1)
+
+    def _cell_columns(self, lon):
+        """ Grid column of longitudes
+        """
+        return numpy.mod(
+            numpy.floor((lon + numpy.pi) / self.cell_size).astype(numpy.int64),
+            self.n_columns)
+
+    def _build_grid(self):
+        """ Register every segment in the grid cells its box touches
+
+        Arguments:
+            no arguments
+
+        Returns:
+            no returns
+        """
+        box = self._segment_box
+        row0 = self._cell_rows(box[:, 0])
+        row1 = self._cell_rows(box[:, 1])
+        col0 = self._cell_columns(box[:, 2])
+        col1 = self._cell_columns(box[:, 3])
+        col1 = numpy.where(col1 < col0, col1 + self.n_columns, col1)
+
+        n_rows = row1 - row0 + 1
+        n_cols = col1 - col0 + 1
+        n_cells = n_rows * n_cols
+        overflow = n_cells > _MAX_SEGMENT_CELLS
+        n_cells[overflow] = 1
+        segment = numpy.repeat(numpy.arange(box.shape[0]), n_cells)
+        k = _ranges(numpy.zeros_like(n_cells), n_cells)
+        rows = row0[segment] + k // n_cols[segment]
+        cols = numpy.mod(col0[segment] + k % n_cols[segment], self.n_columns)
+        keys = rows * self.n_columns + cols
+        keys[overflow[segment]] = _OVERFLOW_KEY
+
+        order = numpy.argsort(keys, kind='mergesort')
+        keys = keys[order]
+        self._cell_segments = segment[order]
+        self._cell_keys, first = numpy.unique(keys, return_index=True)
+        self._cell_offsets = numpy.concatenate(
+            (first, [keys.shape[0]])).astype(numpy.int64)
+
+    def _candidates(self, lat, lon, angle):
+        """ Find the segments in the grid cells around a point
+
+        Arguments:
+            lat: latitude of the point (rad)
+            lon: longitude of the point (rad)
+            angle: search radius as an angle on the sphere (rad)
+
+        Returns:
+            segments: numpy int array of candidate segment indices
+        """
+        lat0 = max(lat - angle, -numpy.pi / 2.0)
+        lat1 = min(lat + angle, numpy.pi / 2.0)
+        rows = numpy.arange(self._cell_rows(lat0), self._cell_rows(lat1) + 1)
+
+        max_abs_lat = max(abs(lat0), abs(lat1))
+        if max_abs_lat >= numpy.pi / 2.0 or angle >= numpy.pi / 2.0:
+            half_width = numpy.pi
+        else:
+            half_width = min(
+                numpy.arcsin(min(numpy.sin(angle) / numpy.cos(max_abs_lat),
+                    1.0)),
+                numpy.pi)
+        if half_width >= numpy.pi / 2.0:
+            cols = numpy.arange(self.n_columns)
+        else:
+            col0 = self._cell_columns(lon - half_width)
+            col1 = self._cell_columns(lon + half_width)
+            if col1 < col0:
+                col1 += self.n_columns
+            cols = numpy.mod(numpy.arange(col0, col1 + 1), self.n_columns)
+
+        keys = numpy.concatenate((
+            [_OVERFLOW_KEY],
+            (rows[:, numpy.newaxis] * self.n_columns + cols).ravel()))
+        if self._cell_keys.shape[0] == 0:
+            return numpy.empty((0,), dtype=numpy.int64)
+        idx = numpy.searchsorted(self._cell_keys, keys)
+        idx = numpy.minimum(idx, self._cell_keys.shape[0] - 1)
+        idx = idx[self._cell_keys[idx] == keys]
+        return numpy.unique(self._cell_segments[
+            _ranges(self._cell_offsets[idx], self._cell_offsets[idx + 1])])
+
+    def query(self, lla, radius, start_time=None, stop_time=None,
+            method='haversine'):
+        """ Find the tracks which passed within a distance of a point
+
+        Distances are to the nearest fix of each track, so a track whose
+        fixes are more widely spaced than the radius can be missed.
+
+        Arguments:
+            lla: 2, or 3, numpy array of the point lat/lon(/alt) (rad)
+            radius: search distance (m)
+            start_time: optional, only consider fixes at or after this time
+            stop_time: optional, only consider fixes at or before this time
+            method: optional distance method, 'haversine' (default) or
+                'vincenty', see geodesy.distance.distance
+
+        Returns:
+            tracks: numpy structured array of PROXIMITY_DTYPE with the
+                track index, the distance of its closest fix (m) and the
+                time of that fix, one entry per track sorted by distance
+        """
+        self.build()
+        lla = numpy.asarray(lla, dtype=float)
+        # pad the search a little so the ellipsoidal distance can't escape
+        angle = 1.01 * radius / geodesy.distance.EARTH_RADIUS
+
+        segments = self._candidates(lla[0], lla[1], angle)
+        box = self._segment_box[segments]
+        time = self._segment_time[segments]
+        keep = (box[:, 1] >= lla[0] - angle) & (box[:, 0] <= lla[0] + angle)
+        if start_time is not None:
+            keep &= time[:, 1] >= start_time
+        if stop_time is not None:
+            keep &= time[:, 0] <= stop_time
+        segments = segments[keep]
+
+        fixes = _ranges(
+            self._segment_start[segments], self._segment_stop[segments])
+        fix_time = self._time[fixes]
+        keep = numpy.ones(fixes.shape, dtype=bool)
+        if start_time is not None:
+            keep &= fix_time >= start_time
+        if stop_time is not None:
+            keep &= fix_time <= stop_time
+        fixes = fixes[keep]
+
+        distance = geodesy.distance.distance(
+            lla[:2], self._latlon[fixes], method)
+        near = distance <= radius
+        fixes = fixes[near]
+        distance = numpy.atleast_1d(distance)[near]
+        track = numpy.searchsorted(
+            self._track_offsets, fixes, side='right') - 1
+
+        # closest fix of each track
+        order = numpy.lexsort((distance, track))
+        first = numpy.ones(order.shape, dtype=bool)
+        first[1:] = track[order][1:] != track[order][:-1]
+        best = order[first]
+
+        result = numpy.empty(best.shape, dtype=PROXIMITY_DTYPE)
+        result['track'] = track[best]
+        result['distance'] = distance[best]
+        result['time'] = self._time[fixes[best]]
+        return result[numpy.argsort(result['distance'], kind='mergesort')]
+
+    def save(self, directory):
+        """ Save the index to a directory
+
+        Arguments:
+            directory: directory to write to, created if needed
+
+        Returns:
+            no returns
+        """
+        self.build()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for name in _ARRAYS:
+            numpy.save(
+                os.path.join(directory, name + '.npy'),
+                getattr(self, '_' + name))
+        with open(os.path.join(directory, _META_FILE), 'w') as meta_file:
+            json.dump({
+                'cell_size': self.cell_size,
+                'segment_size': self.segment_size,
+                'metadata': self.metadata,
+                }, meta_file)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """ Load an index saved with save
+
+        Arguments:
+            directory: directory the index was saved to
+            mmap: optional, memory-map the arrays rather than reading them
+
+        Returns:
+            index: TrackIndex instance. tracks can still be added to it
+        """
+        with open(os.path.join(directory, _META_FILE), 'r') as meta_file:
+            meta = json.load(meta_file)
+        index = cls(meta['cell_size'], meta['segment_size'])
+        index.metadata = meta['metadata']
+        for name in _ARRAYS:
+            setattr(index, '_' + name, numpy.load(
+                os.path.join(directory, name + '.npy'),
+                mmap_mode='r' if mmap else None))
+        index._is_built = True
+        return index
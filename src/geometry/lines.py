@@ -1,11 +1,31 @@
 """ contains line related things
 """
 
+import sys
+
 import numpy as np
 from math import sin, cos, sqrt, pi, fmod
-from shapely.geometry import Point, LineString, LinearRing
 import copy
 
+def _is_shapely(obj, *type_names):
+    """
+    check if an object is one of the named shapely geometry types
+
+    shapely is only imported by callers that construct its geometries, so if
+    it hasn't been loaded the object can't be one and we avoid importing it.
+
+    Arguments:
+        obj: the object to check
+        type_names: names of classes in shapely.geometry to test against
+
+    Return:
+        is_type: True if obj is an instance of one of the named types
+    """
+    geometry = sys.modules.get('shapely.geometry')
+    if geometry is None:
+        return False
+    return type(obj) in tuple(getattr(geometry, name) for name in type_names)
+
 def point_line_distance(pt, vertices, is_segment=True):
     """
     compute the minimum vector between a point and a line
@@ -23,10 +43,10 @@ def point_line_distance(pt, vertices, is_segment=True):
         x: numpy 2x3 array of the line segment
         i: the index of the beginning of the closest line segment
     """
-    if type(pt) is Point:
+    if _is_shapely(pt, 'Point'):
         pt = np.array(pt.coords)
 
-    if type(vertices) is LineString or type(vertices) is LinearRing:
+    if _is_shapely(vertices, 'LineString', 'LinearRing'):
         vertices = np.array(vertices.coords)
 
     if vertices.shape[0] > 2:
@@ -88,7 +108,7 @@ def get_point_on_line(datum, vertices, distance, tol=1.0e-4):
     if type(datum) is datum:
         datum = np.array(datum.coords)
 
-    if type(vertices) is LineString or type(vertices) is LinearRing:
+    if _is_shapely(vertices, 'LineString', 'LinearRing'):
         vertices = np.array(vertices.coords)
 
     # compute some directions
@@ -145,3 +165,50 @@ def line_intersections(Xa, ra, Xb ,rb):
     tb = np.cross(delta_X, ra)[2] / normal[2]
 
     return (ta, tb)
+
+def iter_resample(vertices, spacing, chunk_size=2**20):
+    """ Resample a polyline to evenly spaced points, a chunk at a time
+
+    Points are placed every spacing along the line starting at the first
+    vertex, and the last vertex is added so the resampled line ends where
+    the original does. Only the segment lengths are computed for the whole
+    line, the points themselves are generated in chunks so long lines can be
+    resampled without building the full array.
+
+    Arguments:
+        vertices: numpy nxm array of points defining the line (usually NED)
+            or a shapely LineString or LinearRing instance
+        spacing: distance between points along the line
+        chunk_size: optional maximum number of points per chunk
+
+    Yields:
+        points: numpy kxm array of resampled points, k <= chunk_size
+    """
+    if _is_shapely(vertices, 'LineString', 'LinearRing'):
+        vertices = np.array(vertices.coords)
+    vertices = np.atleast_2d(np.asarray(vertices, dtype=float))
+    assert spacing > 0.0, "spacing must be positive"
+    assert chunk_size > 0, "chunk_size must be positive"
+
+    segments = np.diff(vertices, axis=0)
+    length = np.sqrt(np.sum(segments * segments, axis=1))
+    cumulative = np.concatenate(([0.0], np.cumsum(length)))
+    n_stations = int(np.floor(cumulative[-1] / spacing)) + 1
+    n_segments = length.shape[0]
+
+    for start in range(0, n_stations, chunk_size):
+        stations = np.arange(
+            start, min(start + chunk_size, n_stations)) * spacing
+        if n_segments == 0:
+            yield np.repeat(vertices[:1], stations.shape[0], axis=0)
+            continue
+        idx = np.searchsorted(cumulative, stations, side='right') - 1
+        idx = np.clip(idx, 0, n_segments - 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = np.where(
+                length[idx] > 0.0, (stations - cumulative[idx]) / length[idx],
+                0.0)
+        yield vertices[idx] + t[:, np.newaxis] * segments[idx]
+
+    if cumulative[-1] - (n_stations - 1) * spacing > 1.0e-9 * spacing:
+        yield vertices[-1:].copy()
@@ -0,0 +1,314 @@
+""" Find thermals (circling climbs) in flight tracks
+
+Everything here works on whole arrays of fixes. A set of flights
+concatenated together (like parsers.flight_collection.FlightCollection
+fixes) can be analyzed at once by passing the offsets of each flight, finite
+differences and circling segments then never cross from one flight into the
+next.
+"""
+import numpy
+
+import geodesy.distance
+
+# default thresholds for circling detection
+MIN_TURN_RATE = numpy.deg2rad(8.0)
+MIN_DURATION = 30.0
+MAX_GAP = 10.0
+
+# per-thermal statistics returned by find_thermals
+THERMAL_DTYPE = numpy.dtype([
+    ('flight', numpy.int64),
+    ('start', numpy.int64),
+    ('stop', numpy.int64),
+    ('entry_time', numpy.float64),
+    ('exit_time', numpy.float64),
+    ('duration', numpy.float64),
+    ('latitude', numpy.float64),
+    ('longitude', numpy.float64),
+    ('entry_altitude', numpy.float64),
+    ('exit_altitude', numpy.float64),
+    ('altitude_gain', numpy.float64),
+    ('climb_rate', numpy.float64),
+    ('turn_rate', numpy.float64),
+    ('drift_north', numpy.float64),
+    ('drift_east', numpy.float64),
+    ])
+
+def _flight_bounds(n_fixes, offsets):
+    """ Mark the first and last fix of each flight
+
+    Arguments:
+        n_fixes: total number of fixes
+        offsets: optional numpy int array of flight start indices followed by
+            the total number of fixes. None means one flight
+
+    Returns:
+        (is_first, is_last, flight)
+            is_first: numpy boolean array, True at the first fix of a flight
+            is_last: numpy boolean array, True at the last fix of a flight
+            flight: numpy int array, the flight index of each fix
+    """
+    if offsets is None:
+        offsets = numpy.array([0, n_fixes])
+    offsets = numpy.asarray(offsets, dtype=numpy.int64)
+    assert offsets[-1] == n_fixes, 'offsets must end at the number of fixes'
+
+    lengths = numpy.diff(offsets)
+    nonempty = offsets[:-1][lengths > 0]
+    is_first = numpy.zeros((n_fixes,), dtype=bool)
+    is_last = numpy.zeros((n_fixes,), dtype=bool)
+    is_first[nonempty] = True
+    is_last[offsets[1:][lengths > 0] - 1] = True
+    flight = numpy.repeat(numpy.arange(lengths.shape[0]), lengths)
+    return (is_first, is_last, flight)
+
+def _central_difference(values, time, is_first, is_last, angle=False):
+    """ Derivative by central differences, one sided at flight ends
+
+    Arguments:
+        values: numpy array of values
+        time: numpy array of times
+        is_first: numpy boolean array marking the first fix of each flight
+        is_last: numpy boolean array marking the last fix of each flight
+        angle: optional, wrap differences into [-pi, pi)
+
+    Returns:
+        rate: numpy array, nan for flights with a single fix
+    """
+    idx = numpy.arange(values.shape[0])
+    prev_idx = numpy.where(is_first, idx, idx - 1)
+    next_idx = numpy.where(is_last, idx, idx + 1)
+    delta = values[next_idx] - values[prev_idx]
+    if angle:
+        delta = numpy.mod(delta + numpy.pi, 2.0 * numpy.pi) - numpy.pi
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        return delta / (time[next_idx] - time[prev_idx])
+
+def rates(time, lla, offsets=None):
+    """ Compute ground speed, track, turn rate and climb rate of flights
+
+    Velocities come from central differences of the fixes, using a local
+    spherical earth which is plenty for fixes a few seconds apart.
+
+    Arguments:
+        time: n, numpy array of fix times (s)
+        lla: nx3 numpy array of lat/lon/alt (rad, rad, m)
+        offsets: optional numpy int array of the start of each flight plus
+            the total number of fixes, when several flights are concatenated
+
+    Returns:
+        (ground_speed, track, turn_rate, climb_rate)
+            ground_speed: n, numpy array (m/s)
+            track: n, numpy array of ground track clockwise from north in
+                [0, 2 pi) (rad)
+            turn_rate: n, numpy array, positive turning right (rad/s)
+            climb_rate: n, numpy array (m/s)
+    """
+    time = numpy.asarray(time, dtype=float)
+    lla = numpy.asarray(lla, dtype=float)
+    is_first, is_last, _ = _flight_bounds(time.shape[0], offsets)
+    radius = geodesy.distance.EARTH_RADIUS
+
+    v_north = radius * _central_difference(
+        lla[:, 0], time, is_first, is_last)
+    v_east = radius * numpy.cos(lla[:, 0]) * _central_difference(
+        lla[:, 1], time, is_first, is_last, angle=True)
+    ground_speed = numpy.hypot(v_north, v_east)
+    track = numpy.mod(numpy.arctan2(v_east, v_north), 2.0 * numpy.pi)
+    turn_rate = _central_difference(
+        track, time, is_first, is_last, angle=True)
+    climb_rate = _central_difference(lla[:, 2], time, is_first, is_last)
+    return (ground_speed, track, turn_rate, climb_rate)
+
+def runs(mask, breaks=None):
+    """ Run length encode a boolean mask
+
+    Arguments:
+        mask: n, numpy boolean array
+        breaks: optional n, numpy boolean array. a run is split before any
+            index marked True here (ex the first fix of each flight)
+
+    Returns:
+        (start, stop): numpy int arrays, the runs of True are
+            mask[start[i]:stop[i]]
+    """
+    mask = numpy.asarray(mask, dtype=bool)
+    n = mask.shape[0]
+    begins = numpy.ones((n,), dtype=bool)
+    ends = numpy.ones((n,), dtype=bool)
+    begins[1:] = ~mask[:-1]
+    ends[:-1] = ~mask[1:]
+    if breaks is not None:
+        begins |= breaks
+        ends[:-1] |= breaks[1:]
+    return (
+        numpy.flatnonzero(mask & begins),
+        numpy.flatnonzero(mask & ends) + 1)
+
+def _segment_indices(start, stop):
+    """ List the indices in a set of segments without a loop
+
+    Arguments:
+        start: numpy int array of segment starts
+        stop: numpy int array of segment stops
+
+    Returns:
+        (segment, idx)
+            segment: numpy int array, the segment each index belongs to
+            idx: numpy int array of every index in start[i]:stop[i] for
+                each segment in turn
+    """
+    lengths = stop - start
+    first_out = numpy.concatenate(([0], numpy.cumsum(lengths)[:-1]))
+    segment = numpy.repeat(numpy.arange(start.shape[0]), lengths)
+    idx = numpy.arange(numpy.sum(lengths)) + numpy.repeat(
+        start - first_out, lengths)
+    return (segment, idx)
+
+def circling(time, turn_rate, offsets=None, min_turn_rate=MIN_TURN_RATE,
+        min_duration=MIN_DURATION, max_gap=MAX_GAP):
+    """ Find sustained circling
+
+    Fixes are circling when the turn rate is above min_turn_rate. Breaks in
+    circling shorter than max_gap (where the turn rate dips while centering)
+    are bridged, then circling segments shorter than min_duration dropped.
+
+    Arguments:
+        time: n, numpy array of fix times (s)
+        turn_rate: n, numpy array of turn rates (rad/s) from rates
+        offsets: optional flight offsets, as for rates
+        min_turn_rate: optional threshold on the magnitude of turn rate
+        min_duration: optional shortest segment to keep (s)
+        max_gap: optional longest break in circling to bridge (s)
+
+    Returns:
+        (start, stop): numpy int arrays, circling segment i is the fixes
+            start[i]:stop[i]
+    """
+    time = numpy.asarray(time, dtype=float)
+    is_first, is_last, _ = _flight_bounds(time.shape[0], offsets)
+    with numpy.errstate(invalid='ignore'):
+        mask = numpy.abs(turn_rate) > min_turn_rate
+
+    # bridge short gaps which have circling on both sides
+    gap_start, gap_stop = runs(~mask, is_first)
+    if gap_start.shape[0] > 0:
+        inside = ~is_first[gap_start] & ~is_last[gap_stop - 1]
+        gap_duration = (
+            time[numpy.minimum(gap_stop, time.shape[0] - 1)] -
+            time[numpy.maximum(gap_start - 1, 0)])
+        bridge = inside & (gap_duration <= max_gap)
+        mask[_segment_indices(gap_start[bridge], gap_stop[bridge])[1]] = True
+
+    start, stop = runs(mask, is_first)
+    duration = time[stop - 1] - time[start]
+    keep = duration >= min_duration
+    return (start[keep], stop[keep])
+
+def _segment_sums(values, start, stop):
+    """ Sum values over segments without a loop
+
+    Arguments:
+        values: n, numpy array
+        start: numpy int array of segment starts
+        stop: numpy int array of segment stops
+
+    Returns:
+        sums: numpy array of values[start[i]:stop[i]].sum()
+    """
+    cumulative = numpy.concatenate(([0.0], numpy.cumsum(values)))
+    return cumulative[stop] - cumulative[start]
+
+def find_thermals(time, lla, offsets=None, min_turn_rate=MIN_TURN_RATE,
+        min_duration=MIN_DURATION, max_gap=MAX_GAP):
+    """ Find thermals and compute statistics for each of them
+
+    The drift of a thermal is the least squares slope of position against
+    time over the whole segment, so it averages over the circles rather than
+    depending on where in a circle the glider entered and left.
+
+    Arguments:
+        time: n, numpy array of fix times (s)
+        lla: nx3 numpy array of lat/lon/alt (rad, rad, m)
+        offsets: optional flight offsets, as for rates
+        min_turn_rate: optional circling threshold (rad/s), see circling
+        min_duration: optional shortest thermal (s)
+        max_gap: optional longest break in circling to bridge (s)
+
+    Returns:
+        thermals: numpy structured array of THERMAL_DTYPE. start and stop
+            index the fixes, latitude and longitude are the mean position
+            (rad), altitudes in m, rates in m/s and rad/s and drift is the
+            velocity of the thermal (m/s)
+    """
+    time = numpy.asarray(time, dtype=float)
+    lla = numpy.asarray(lla, dtype=float)
+    _, _, flight = _flight_bounds(time.shape[0], offsets)
+    _, _, turn_rate, _ = rates(time, lla, offsets)
+    start, stop = circling(
+        time, turn_rate, offsets, min_turn_rate, min_duration, max_gap)
+
+    thermals = numpy.empty(start.shape, dtype=THERMAL_DTYPE)
+    if start.shape[0] == 0:
+        return thermals
+    last = stop - 1
+    n = (stop - start).astype(float)
+
+    thermals['flight'] = flight[start]
+    thermals['start'] = start
+    thermals['stop'] = stop
+    thermals['entry_time'] = time[start]
+    thermals['exit_time'] = time[last]
+    thermals['duration'] = time[last] - time[start]
+    thermals['entry_altitude'] = lla[start, 2]
+    thermals['exit_altitude'] = lla[last, 2]
+    thermals['altitude_gain'] = lla[last, 2] - lla[start, 2]
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        thermals['climb_rate'] = (
+            thermals['altitude_gain'] / thermals['duration'])
+    thermals['turn_rate'] = _segment_sums(
+        numpy.nan_to_num(turn_rate), start, stop) / n
+
+    # regress lat and lon against time, relative to the segment entry so
+    # longitude doesn't wrap within a thermal
+    segment, fixes = _segment_indices(start, stop)
+    t = time[fixes] - time[start][segment]
+    dlat = lla[fixes, 0] - lla[start, 0][segment]
+    dlon = numpy.mod(
+        lla[fixes, 1] - lla[start, 1][segment] + numpy.pi,
+        2.0 * numpy.pi) - numpy.pi
+
+    t_mean = numpy.bincount(segment, t) / n
+    dlat_mean = numpy.bincount(segment, dlat) / n
+    dlon_mean = numpy.bincount(segment, dlon) / n
+    t_centered = t - t_mean[segment]
+    t_var = numpy.bincount(segment, t_centered * t_centered)
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        lat_rate = numpy.bincount(segment, t_centered * dlat) / t_var
+        lon_rate = numpy.bincount(segment, t_centered * dlon) / t_var
+
+    latitude = lla[start, 0] + dlat_mean
+    radius = geodesy.distance.EARTH_RADIUS
+    thermals['latitude'] = latitude
+    thermals['longitude'] = numpy.mod(
+        lla[start, 1] + dlon_mean + numpy.pi, 2.0 * numpy.pi) - numpy.pi
+    thermals['drift_north'] = radius * lat_rate
+    thermals['drift_east'] = radius * numpy.cos(latitude) * lon_rate
+    return thermals
+
+def collection_thermals(collection, altitude='gps_altitude', **kwargs):
+    """ Find the thermals in every flight of a FlightCollection
+
+    Arguments:
+        collection: parsers.flight_collection.FlightCollection
+        altitude: optional, 'gps_altitude' (default) or 'pressure_altitude'
+        kwargs: optional thresholds passed to find_thermals
+
+    Returns:
+        thermals: numpy structured array of THERMAL_DTYPE, the flight field
+            indexes the collection
+    """
+    fixes = collection.fixes
+    lla = numpy.vstack((
+        fixes['latitude'], fixes['longitude'], fixes[altitude])).T
+    return find_thermals(fixes['time'], lla, collection.offsets, **kwargs)
@@ -0,0 +1,284 @@
+""" Append-only numpy sample buffers for parsed channels
+
+A SampleBuffer collects samples one (or a few) at a time like a list but
+keeps them in a numpy array, so reading the whole history is a view rather
+than a conversion. A float costs 8 bytes rather than the 32 of a list entry
+and its float object. Without a capacity it grows by doubling, appends are
+amortized O(1) and never write over samples already held, so a view taken
+earlier stays valid. With a capacity it is a ring buffer which keeps only
+the latest samples; every sample is written twice, at its slot and one
+capacity further on, so the retained samples are always a single contiguous
+slice of the storage and can still be returned as a view.
+
+Writing one sample into a numpy array from python is slow compared to
+appending to a list, so single appends are staged in an array.array, which
+is just as compact, and copied into the numpy storage together when the
+samples are next read or the stage fills up.
+"""
+import array
+
+import numpy
+
+_INITIAL_SIZE = 64
+
+# most values staged before they are copied into the numpy storage
+_MAX_STAGED = 4096
+
+class SampleBuffer(object):
+    """ Growable or fixed capacity buffer of float samples
+    """
+    def __init__(self, width=None, capacity=None):
+        """ Constructor
+
+        Arguments:
+            width: optional number of values in each sample. if None (the
+                default) samples are scalars and views are 1-d
+            capacity: optional maximum number of samples to keep. the oldest
+                are dropped once it is reached. if None the buffer grows
+                without limit
+
+        Returns:
+            class instance
+        """
+        assert capacity is None or capacity > 0, 'capacity must be positive'
+        self.width = width
+        self.capacity = capacity
+
+        self._n_stored = 0
+        self._n_staged = 0
+        self._staged = array.array('d')
+        if capacity is None:
+            size = _INITIAL_SIZE
+            self._max_staged = _MAX_STAGED
+        else:
+            size = 2 * capacity
+            self._max_staged = min(_MAX_STAGED, capacity * (width or 1))
+        self._storage = numpy.empty(self._shape(size))
+
+    @classmethod
+    def from_array(cls, values, width=None, capacity=None):
+        """ Make a buffer holding some samples
+
+        A growable buffer uses the array as its storage until it needs to
+        grow, so a read-only memory-mapped array is not read or copied until
+        samples are appended.
+
+        Arguments:
+            values: n, (or nxwidth) numpy float array of samples
+            width: optional number of values in each sample
+            capacity: optional maximum number of samples to keep
+
+        Returns:
+            buffer: SampleBuffer instance
+        """
+        buffer = cls(width, capacity)
+        if capacity is None:
+            buffer._storage = numpy.asarray(values, dtype=float).reshape(
+                buffer._shape(-1))
+            buffer._n_stored = buffer._storage.shape[0]
+        else:
+            buffer.extend(values)
+        return buffer
+
+    def _shape(self, n_samples):
+        """ Shape of an array of n_samples samples
+        """
+        if self.width is None:
+            return (n_samples,)
+        return (n_samples, self.width)
+
+    @property
+    def n_appended(self):
+        """ getter for the number of samples ever appended, including any
+        dropped because of the capacity
+        """
+        return self._n_stored + self._n_staged
+
+    def __len__(self):
+        """ Number of samples currently held
+        """
+        if self.capacity is None:
+            return self.n_appended
+        return min(self.n_appended, self.capacity)
+
+    def append(self, value):
+        """ Add one sample
+
+        Arguments:
+            value: float, or sequence of width floats for buffers with a
+                width
+
+        Returns:
+            no returns
+        """
+        if self.width is None:
+            self._staged.append(value)
+        else:
+            if len(value) != self.width:
+                raise ValueError('samples must have {} values'.format(
+                    self.width))
+            self._staged.extend(value)
+        self._n_staged += 1
+        if len(self._staged) >= self._max_staged:
+            self._flush()
+
+    def extend(self, values):
+        """ Add several samples
+
+        Arguments:
+            values: n, (or nxwidth) array-like of samples
+
+        Returns:
+            no returns
+        """
+        self._flush()
+        values = numpy.asarray(values, dtype=float)
+        if values.ndim < self._storage.ndim:
+            values = values.reshape(self._shape(-1))
+        self._store(values)
+
+    def _flush(self):
+        """ Copy the staged samples into the numpy storage
+
+        Arguments:
+            no arguments
+
+        Returns:
+            no returns
+        """
+        if self._n_staged == 0:
+            return
+        staged = numpy.frombuffer(self._staged, dtype=float).reshape(
+            self._shape(self._n_staged))
+        self._n_staged = 0
+        self._store(staged)
+        # the array can't be resized while a numpy view of it exists
+        del staged
+        del self._staged[:]
+
+    def _store(self, values):
+        """ Write samples after those already stored
+
+        Arguments:
+            values: n, (or nxwidth) numpy array of samples
+
+        Returns:
+            no returns
+        """
+        n_values = values.shape[0]
+        if self.capacity is None:
+            if self._n_stored + n_values > self._storage.shape[0]:
+                self._grow(self._n_stored + n_values)
+            self._storage[self._n_stored:self._n_stored + n_values] = values
+        else:
+            # older values would be overwritten in this same call
+            kept = values[max(n_values - self.capacity, 0):]
+            slots = numpy.mod(
+                numpy.arange(self._n_stored + n_values - kept.shape[0],
+                    self._n_stored + n_values),
+                self.capacity)
+            self._storage[slots] = kept
+            self._storage[slots + self.capacity] = kept
+        self._n_stored += n_values
+
+    def _grow(self, n_samples):
+        """ Reallocate the storage of a growable buffer
+
+        Arguments:
+            n_samples: number of samples the storage must be able to hold
+
+        Returns:
+            no returns
+        """
+        size = max(2 * self._storage.shape[0], n_samples, _INITIAL_SIZE)
+        storage = numpy.empty(self._shape(size))
+        storage[:self._n_stored] = self._storage[:self._n_stored]
+        self._storage = storage
+
+    def view(self):
+        """ The samples held, oldest first
+
+        The view shares memory with the buffer and is read-only. The samples
+        in the view of a growable buffer never change, but a ring buffer
+        overwrites its oldest samples so hold on to its view only until the
+        next append, or use snapshot.
+
+        Arguments:
+            no arguments
+
+        Returns:
+            samples: n, (or nxwidth) numpy array view
+        """
+        self._flush()
+        n_held = len(self)
+        if self.capacity is None:
+            start = 0
+        else:
+            start = (self._n_stored - n_held) % self.capacity
+        samples = self._storage[start:start + n_held]
+        samples.flags.writeable = False
+        return samples
+
+    def snapshot(self):
+        """ The samples held, oldest first, which later appends won't change
+
+        Arguments:
+            no arguments
+
+        Returns:
+            samples: n, (or nxwidth) read-only numpy array, a view for a
+                growable buffer and a copy for a ring buffer
+        """
+        if self.capacity is None:
+            return self.view()
+        samples = numpy.array(self.view())
+        samples.flags.writeable = False
+        return samples
+
+    def last(self):
+        """ The latest sample, without making a view
+
+        Arguments:
+            no arguments
+
+        Returns:
+            sample: float, or sequence of width floats. raises IndexError if
+                the buffer is empty
+        """
+        if self._n_staged > 0:
+            if self.width is None:
+                return self._staged[-1]
+            return self._staged[len(self._staged) - self.width:]
+        if self._n_stored == 0:
+            raise IndexError('no samples in the buffer')
+        if self.capacity is None:
+            return self._storage[self._n_stored - 1]
+        return self._storage[(self._n_stored - 1) % self.capacity]
+
+    def __getitem__(self, key):
+        """ Index or slice the samples held, like a list
+        """
+        return self.view()[key]
+
+    def __array__(self, dtype=None, copy=None):
+        """ Convert to a numpy array, see snapshot
+        """
+        samples = self.snapshot()
+        if copy or (dtype is not None and samples.dtype != dtype):
+            return numpy.array(samples, dtype=dtype)
+        return samples
+
+    def clear(self):
+        """ Drop every sample
+
+        Arguments:
+            no arguments
+
+        Returns:
+            no returns
+        """
+        self._n_stored = 0
+        self._n_staged = 0
+        del self._staged[:]
+        if self.capacity is None:
+            self._storage = numpy.empty(self._shape(_INITIAL_SIZE))
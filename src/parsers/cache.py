@@ -0,0 +1,186 @@
+""" On-disk cache of parsed flight logs
+
+Parsing a log produces a handful of numpy columns. The cache stores them as
+.npy files, one directory per parsed file, so that a warm load only has to
+memory-map them. Entries are keyed by the parser, the path and the file's
+size and modification time, or optionally by a hash of its contents so that
+copies and moved files still hit. The cache is bounded in size and evicts the
+least recently used entries.
+
+The cache is opt-in, pass a ParseCache to the parsers:
+
+    cache = parsers.cache.ParseCache('/tmp/flight_cache')
+    flight = parsers.igc.IGC('flight.igc', cache=cache)
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy
+
+# bump when the cached columns of any parser change so old entries miss
+CACHE_VERSION = 3
+
+_DEFAULT_DIRECTORY = os.path.join('~', '.cache', 'bird_utils', 'parsers')
+
+_META_FILE = 'meta.json'
+
+class ParseCache(object):
+    """ A size bounded, least recently used cache of parsed columns
+    """
+    def __init__(self, directory=None, max_bytes=2**30, key='stat'):
+        """ Constructor
+
+        Arguments:
+            directory: optional directory to keep the cache in. defaults to
+                ~/.cache/bird_utils/parsers
+            max_bytes: optional maximum total size of the cache (bytes)
+            key: optional, how to identify files. 'stat' (default) uses the
+                absolute path, size and modification time. 'hash' uses a
+                sha1 of the contents, which reads the file but survives
+                copies and touches
+
+        Returns:
+            class instance
+        """
+        assert key in ('stat', 'hash'), "key must be 'stat' or 'hash'"
+        if directory is None:
+            directory = os.path.expanduser(_DEFAULT_DIRECTORY)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.key_method = key
+
+    def key(self, fname, tag):
+        """ Compute the cache key for a file
+
+        Arguments:
+            fname: path to the file being parsed
+            tag: string identifying the parser, so that two parsers reading
+                the same file get separate entries
+
+        Returns:
+            key: hex string
+        """
+        digest = hashlib.sha1()
+        digest.update('{}:{}:'.format(CACHE_VERSION, tag).encode('utf-8'))
+        if self.key_method == 'hash':
+            with open(fname, 'rb') as data_file:
+                for block in iter(lambda: data_file.read(2**20), b''):
+                    digest.update(block)
+        else:
+            stat = os.stat(fname)
+            digest.update('{}:{}:{!r}'.format(
+                os.path.abspath(fname), stat.st_size, stat.st_mtime).encode(
+                    'utf-8'))
+        return digest.hexdigest()
+
+    def load(self, key):
+        """ Load an entry
+
+        Arguments:
+            key: cache key from key()
+
+        Returns:
+            entry: None on a miss, otherwise (columns, meta)
+                columns: dict of read-only, memory-mapped numpy arrays
+                meta: dict of the json metadata stored with the columns
+        """
+        entry_dir = os.path.join(self.directory, key)
+        try:
+            with open(os.path.join(entry_dir, _META_FILE), 'r') as meta_file:
+                stored = json.load(meta_file)
+            columns = dict(
+                (name, numpy.load(
+                    os.path.join(entry_dir, name + '.npy'), mmap_mode='r'))
+                for name in stored['columns'])
+            # mark this entry as recently used
+            os.utime(entry_dir, None)
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+        return (columns, stored['meta'])
+
+    def store(self, key, columns, meta=None):
+        """ Save an entry, then evict old entries if over the size limit
+
+        Arguments:
+            key: cache key from key()
+            columns: dict of name: numpy array. names must be valid file names
+            meta: optional json serializable dict to store with the columns
+
+        Returns:
+            no returns
+        """
+        entry_dir = os.path.join(self.directory, key)
+        if os.path.isdir(entry_dir):
+            return
+
+        # write into a scratch directory and rename it into place, so that
+        # readers (possibly in other processes) never see a partial entry
+        scratch = tempfile.mkdtemp(prefix='.tmp-', dir=self.directory)
+        try:
+            for name, column in columns.items():
+                numpy.save(
+                    os.path.join(scratch, name + '.npy'),
+                    numpy.ascontiguousarray(column))
+            with open(os.path.join(scratch, _META_FILE), 'w') as meta_file:
+                json.dump(
+                    {'columns': sorted(columns.keys()), 'meta': meta or {}},
+                    meta_file)
+            os.rename(scratch, entry_dir)
+        except OSError:
+            # somebody else stored the same entry first
+            if not os.path.isdir(entry_dir):
+                raise
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        self.evict()
+
+    def evict(self):
+        """ Remove least recently used entries until under max_bytes
+
+        Arguments:
+            no arguments
+
+        Returns:
+            no returns
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            entry_dir = os.path.join(self.directory, name)
+            if name.startswith('.') or not os.path.isdir(entry_dir):
+                continue
+            try:
+                size = sum(
+                    os.path.getsize(os.path.join(entry_dir, f))
+                    for f in os.listdir(entry_dir))
+                entries.append((os.path.getmtime(entry_dir), size, entry_dir))
+            except OSError:
+                continue
+            total += size
+
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """ Remove every entry
+
+        Arguments:
+            no arguments
+
+        Returns:
+            no returns
+        """
+        for name in os.listdir(self.directory):
+            entry_dir = os.path.join(self.directory, name)
+            if os.path.isdir(entry_dir):
+                shutil.rmtree(entry_dir, ignore_errors=True)
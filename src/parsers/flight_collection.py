@@ -0,0 +1,193 @@
+""" Load many IGC files in parallel into one columnar store
+
+The fixes from every flight are concatenated into a single structured array
+with an offsets array marking where each flight starts, so a day of contest
+files can be held and analyzed without thousands of separate objects.
+"""
+import functools
+import glob
+import multiprocessing
+import os
+
+import numpy
+
+import parsers.igc
+
+class FlightCollection(object):
+    """ Fixes and metadata for a set of flights
+
+    Fixes for flight i are fixes[offsets[i]:offsets[i + 1]].
+    """
+    def __init__(self, metadata=None, fixes=None, offsets=None):
+        """ Constructor
+
+        Arguments:
+            metadata: optional list of dicts, one per flight, with the file
+                name ('fname') and IGC header entries
+            fixes: optional numpy structured array of B_RECORD_DTYPE (from
+                parsers.igc) with the fixes of every flight, one after
+                another
+            offsets: optional numpy int array of length len(metadata) + 1,
+                index into fixes of the start of each flight and the end of
+                the last one
+
+        Returns:
+            class instance
+        """
+        if metadata is None:
+            metadata = []
+        if fixes is None:
+            fixes = numpy.empty((0,), dtype=parsers.igc.B_RECORD_DTYPE)
+        if offsets is None:
+            offsets = numpy.zeros((len(metadata) + 1,), dtype=numpy.int64)
+
+        assert len(offsets) == len(metadata) + 1,\
+            'offsets must have one more entry than metadata'
+        assert offsets[-1] == fixes.shape[0],\
+            'offsets must end at the number of fixes'
+
+        self.metadata = metadata
+        self.fixes = fixes
+        self.offsets = numpy.asarray(offsets, dtype=numpy.int64)
+
+    @classmethod
+    def from_flights(cls, flights):
+        """ Build a collection from individually loaded flights
+
+        Arguments:
+            flights: iterable of (metadata, fixes) tuples, metadata is a dict
+                and fixes a numpy structured array of B_RECORD_DTYPE
+
+        Returns:
+            collection: FlightCollection instance
+        """
+        metadata = []
+        blocks = []
+        for flight_metadata, flight_fixes in flights:
+            metadata.append(flight_metadata)
+            blocks.append(flight_fixes)
+
+        lengths = [block.shape[0] for block in blocks]
+        offsets = numpy.concatenate(([0], numpy.cumsum(lengths))).astype(
+            numpy.int64)
+        if blocks:
+            fixes = numpy.concatenate(blocks)
+        else:
+            fixes = None
+        return cls(metadata, fixes, offsets)
+
+    def __len__(self):
+        """ Number of flights in the collection
+        """
+        return len(self.metadata)
+
+    def __getitem__(self, idx):
+        """ Get one flight
+
+        Arguments:
+            idx: index of the flight
+
+        Returns:
+            (metadata, fixes)
+                metadata: dict of the file name and header entries
+                fixes: view into the fixes of this flight
+        """
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError('flight index out of range')
+        return (
+            self.metadata[idx],
+            self.fixes[self.offsets[idx]:self.offsets[idx + 1]])
+
+    def __iter__(self):
+        """ Iterate over (metadata, fixes) for every flight
+        """
+        for idx in range(len(self)):
+            yield self[idx]
+
+    @property
+    def lengths(self):
+        """ getter for the number of fixes in each flight
+
+        Returns:
+            lengths: numpy int array
+        """
+        return numpy.diff(self.offsets)
+
+    def flight_index(self, fix_index):
+        """ Find which flight fixes belong to
+
+        Arguments:
+            fix_index: int or numpy int array of indices into fixes
+
+        Returns:
+            flight: int or numpy int array of flight indices
+        """
+        return numpy.searchsorted(self.offsets, fix_index, side='right') - 1
+
+def _load_flight(fname, cache=None):
+    """ Parse one IGC file, run in the worker processes
+
+    Arguments:
+        fname: path to the igc file
+        cache: optional parsers.cache.ParseCache
+
+    Returns:
+        (metadata, fixes): the header entries plus the file name and the
+            structured array of fixes, which pickle compactly
+    """
+    flight = parsers.igc.IGC(fname, cache)
+    metadata = flight.header
+    metadata['fname'] = fname
+    return (metadata, flight.fixes)
+
+def find_igc_files(paths):
+    """ Expand directories and glob patterns into a list of IGC files
+
+    Arguments:
+        paths: a directory, glob pattern or file name, or a list of them.
+            directories are searched (not recursively) for *.igc files
+
+    Returns:
+        fnames: sorted list of file names
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+
+    fnames = set()
+    for path in paths:
+        if os.path.isdir(path):
+            fnames.update(glob.glob(os.path.join(path, '*.igc')))
+            fnames.update(glob.glob(os.path.join(path, '*.IGC')))
+        else:
+            fnames.update(glob.glob(path))
+    return sorted(fnames)
+
+def load_igc(paths, processes=None, chunksize=8, cache=None):
+    """ Parse IGC files with a process pool into a FlightCollection
+
+    Arguments:
+        paths: a directory, glob pattern or file name, or a list of them
+        processes: optional number of worker processes. defaults to the
+            number of cpus, 1 parses in this process without a pool
+        chunksize: optional number of files handed to a worker at a time
+        cache: optional parsers.cache.ParseCache shared by the workers
+
+    Returns:
+        collection: FlightCollection with the flights in file name order
+    """
+    fnames = find_igc_files(paths)
+    load_flight = functools.partial(_load_flight, cache=cache)
+
+    if processes == 1 or len(fnames) <= 1:
+        return FlightCollection.from_flights(
+            load_flight(fname) for fname in fnames)
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        flights = pool.map(load_flight, fnames, chunksize)
+    finally:
+        pool.close()
+        pool.join()
+    return FlightCollection.from_flights(flights)
@@ -1,24 +1,308 @@
-import pdb
-
 import os
 
 import re
 import datetime
 
 import numpy
-import scipy.interpolate
 
 import geodesy.conversions
 
+import parsers.interpolation
+
+# decoded B record (GPS fix) columns. time is gps seconds, lat/lon radians,
+# altitudes meters, valid is 1.0 for a 3d (A) or 2d (V) fix
+B_RECORD_DTYPE = numpy.dtype([
+    ('time', numpy.float64),
+    ('latitude', numpy.float64),
+    ('longitude', numpy.float64),
+    ('valid', numpy.float64),
+    ('pressure_altitude', numpy.float64),
+    ('gps_altitude', numpy.float64),
+    ])
+
+# length of B and K records without extensions, not counting the line ending
+_B_RECORD_LENGTH = 35
+_K_RECORD_LENGTH = 7
+
+# default number of fixes per block yielded by IGC.iter_chunks
+_CHUNK_SIZE = 65536
+
+# header fields reported with every block from IGC.iter_chunks
+_HEADER_FIELDS = (
+    'pilot', 'crew', 'glider', 'registration', 'datum', 'contest_id')
+
+# gps time of midnight on each flight date seen, see _midnight_gps
+_midnight_gps_cache = {}
+
+def _record_bounds(buf, record_type, min_length):
+    """ Find the records of one type in an IGC file
+
+    Arguments:
+        buf: numpy uint8 array of the file contents
+        record_type: the record letter, ex 'B'
+        min_length: shortest record to accept, not counting the line ending
+
+    Returns:
+        (starts, ends)
+            starts: numpy int array of the index of the first byte of each
+                record
+            ends: numpy int array of the index of the line ending of each
+                record (or the end of the file)
+    """
+    line_ends = numpy.flatnonzero(buf == ord('\n'))
+    starts = numpy.concatenate(([0], line_ends + 1))
+    ends = numpy.concatenate((line_ends, [buf.shape[0]]))
+    starts = starts[starts < buf.shape[0]]
+    ends = ends[:starts.shape[0]]
+    is_record = (
+        (buf[starts] == ord(record_type)) & (ends - starts >= min_length))
+    return (starts[is_record], ends[is_record])
+
+def _gather(buf, starts, ends, length):
+    """ Cut fixed-width records out of a file into a 2d array
+
+    Bytes past the end of a short line are filled with spaces.
+
+    Arguments:
+        buf: numpy uint8 array of the file contents
+        starts: numpy int array of record starts
+        ends: numpy int array of record ends
+        length: number of bytes to take from each record
+
+    Returns:
+        records: numpy len(starts)xlength uint8 array
+    """
+    idx = starts[:, numpy.newaxis] + numpy.arange(length)
+    past_end = idx >= ends[:, numpy.newaxis]
+    records = buf[numpy.minimum(idx, buf.shape[0] - 1)]
+    records[past_end] = ord(' ')
+    return records
+
+def _decimal(columns):
+    """ Decode fixed-width, unsigned decimal fields
+
+    Arguments:
+        columns: numpy nxk uint8 array of ascii digits
+
+    Returns:
+        value: n, numpy int64 array
+    """
+    weights = 10 ** numpy.arange(
+        columns.shape[1] - 1, -1, -1, dtype=numpy.int64)
+    return (columns.astype(numpy.int64) - ord('0')).dot(weights)
+
+def _midnight_gps(date):
+    """ Get the gps time of midnight on a date, remembering it
+
+    Record times are a time of day added to this, so streaming a file in
+    chunks converts each flight date once rather than once per chunk.
+
+    Arguments:
+        date: datetime.date
+
+    Returns:
+        time: gps time (seconds) at the start of the date
+    """
+    time = _midnight_gps_cache.get(date)
+    if time is None:
+        time = geodesy.conversions.datetime_to_gps(
+            datetime.datetime(date.year, date.month, date.day))
+        _midnight_gps_cache[date] = time
+    return time
+
+def _decode_times(records, start_date, last_time=None):
+    """ Decode the hhmmss time at the start of B or K records
+
+    Fix times are UTC time of day so they roll over at midnight, a day is
+    added every time the clock goes backwards.
+
+    Arguments:
+        records: numpy nxk uint8 array of records, k >= 7
+        start_date: datetime.date of the flight
+        last_time: optional gps time of the record before these
+
+    Returns:
+        time: n, numpy array of gps times
+    """
+    assert start_date is not None, 'records found without a start date'
+    seconds = (
+        _decimal(records[:, 1:3]) * 3600 +
+        _decimal(records[:, 3:5]) * 60 +
+        _decimal(records[:, 5:7]))
+    days = numpy.concatenate(([0], numpy.cumsum(numpy.diff(seconds) < 0)))
+    start_time = _midnight_gps(start_date)
+    if last_time is not None:
+        last_day = numpy.floor((last_time - start_time) / 86400.0)
+        if start_time + last_day * 86400.0 + seconds[0] < last_time:
+            last_day += 1.0
+        days = days + last_day
+    return start_time + (days * 86400.0 + seconds)
+
+def decode_b_records(data, start_date, last_time=None):
+    """ Decode all of the B records (GPS fixes) in an IGC file at once
+
+    The fixed-width fields of every record are cut out of the file as a 2d
+    byte array and converted with numpy, rather than parsing line by line.
+
+    Arguments:
+        data: bytes, the contents of the IGC file or a part of it
+        start_date: datetime.date of the flight (from the HFDTE header)
+        last_time: optional gps time of the fix before the first one in data,
+            used to carry the day rollover over when decoding a file in parts
+
+    Returns:
+        fixes: numpy structured array of B_RECORD_DTYPE, one per B record
+    """
+    buf = numpy.frombuffer(data, dtype=numpy.uint8)
+    starts, ends = _record_bounds(buf, 'B', _B_RECORD_LENGTH)
+    fixes = numpy.empty(starts.shape, dtype=B_RECORD_DTYPE)
+    if starts.shape[0] == 0:
+        return fixes
+
+    records = _gather(buf, starts, ends, _B_RECORD_LENGTH)
+    fixes['time'] = _decode_times(records, start_date, last_time)
+
+    latitude = _decimal(records[:, 7:9]) + _decimal(records[:, 9:14]) / 60000.0
+    latitude[records[:, 14] == ord('S')] *= -1.0
+    fixes['latitude'] = numpy.deg2rad(latitude)
+
+    longitude = (
+        _decimal(records[:, 15:18]) + _decimal(records[:, 18:23]) / 60000.0)
+    longitude[records[:, 23] == ord('W')] *= -1.0
+    fixes['longitude'] = numpy.deg2rad(longitude)
+
+    fixes['valid'] = (
+        (records[:, 24] == ord('A')) | (records[:, 24] == ord('V')))
+
+    # altitudes may have a leading minus sign in place of their first digit
+    for field, first in (('pressure_altitude', 25), ('gps_altitude', 30)):
+        columns = records[:, first:first + 5].copy()
+        negative = columns[:, 0] == ord('-')
+        columns[negative, 0] = ord('0')
+        fixes[field] = numpy.where(negative, -1.0, 1.0) * _decimal(columns)
+
+    return fixes
+
+def parse_extension_schema(line):
+    """ Parse an I or J record declaring the extensions of B or K records
+
+    The record is the letter, a two digit count and then for each extension
+    the two digit first and last byte (counting from 1) and a three letter
+    code, ex "I023638FXA3941ENL".
+
+    Arguments:
+        line: the I or J record
+
+    Returns:
+        schema: tuple of (code, start, stop) for each extension. start and
+            stop are python slice indices into the B or K record
+    """
+    n_extensions = int(line[1:3])
+    schema = []
+    for i in range(n_extensions):
+        entry = line[3 + 7 * i:10 + 7 * i]
+        if len(entry) < 7:
+            break
+        schema.append((entry[4:7], int(entry[0:2]) - 1, int(entry[2:4])))
+    return tuple(schema)
+
+def extension_dtype(schema, time=False):
+    """ The structured dtype of decoded extension columns
+
+    Arguments:
+        schema: extension schema from parse_extension_schema
+        time: optional, include a leading 'time' field (for K records)
+
+    Returns:
+        dtype: numpy structured dtype with a float64 field per extension
+    """
+    fields = [('time', numpy.float64)] if time else []
+    fields.extend((code, numpy.float64) for code, _, _ in schema)
+    return numpy.dtype(fields)
+
+def _decode_extensions(records, schema, out):
+    """ Decode the extension columns of B or K records
+
+    Extensions are decoded as their recorded integer value (the IGC spec
+    gives the units for each code). Anything which isn't a number, or is
+    missing because the line is short, becomes nan.
+
+    Arguments:
+        records: numpy nxk uint8 array of records
+        schema: extension schema from parse_extension_schema
+        out: numpy structured array to fill, with a field for each code
+
+    Returns:
+        no returns
+    """
+    for code, start, stop in schema:
+        columns = records[:, start:stop].copy()
+        sign = numpy.where(columns[:, 0] == ord('-'), -1.0, 1.0)
+        signed = (columns[:, 0] == ord('-')) | (columns[:, 0] == ord('+'))
+        columns[signed, 0] = ord('0')
+        is_number = numpy.all(columns - ord('0') <= 9, axis=1)
+        out[code] = numpy.where(is_number, sign * _decimal(columns), numpy.nan)
+
+def decode_b_extensions(data, schema):
+    """ Decode the extension columns of every B record in an IGC file
+
+    Arguments:
+        data: bytes, the contents of the IGC file or a part of it
+        schema: B record extension schema from parse_extension_schema of the
+            I record
+
+    Returns:
+        extensions: numpy structured array of extension_dtype(schema) with
+            one row per fix returned by decode_b_records for the same data
+    """
+    buf = numpy.frombuffer(data, dtype=numpy.uint8)
+    starts, ends = _record_bounds(buf, 'B', _B_RECORD_LENGTH)
+    extensions = numpy.empty(starts.shape, dtype=extension_dtype(schema))
+    if starts.shape[0] == 0 or not schema:
+        return extensions
+
+    length = max(stop for _, _, stop in schema)
+    _decode_extensions(
+        _gather(buf, starts, ends, length), schema, extensions)
+    return extensions
+
+def decode_k_records(data, start_date, schema, last_time=None):
+    """ Decode every K record (low rate data) in an IGC file
+
+    Arguments:
+        data: bytes, the contents of the IGC file or a part of it
+        start_date: datetime.date of the flight (from the HFDTE header)
+        schema: K record extension schema from parse_extension_schema of the
+            J record
+        last_time: optional gps time of the K record before these
+
+    Returns:
+        k_records: numpy structured array of extension_dtype(schema, True)
+    """
+    buf = numpy.frombuffer(data, dtype=numpy.uint8)
+    starts, ends = _record_bounds(buf, 'K', _K_RECORD_LENGTH)
+    k_records = numpy.empty(
+        starts.shape, dtype=extension_dtype(schema, True))
+    if starts.shape[0] == 0:
+        return k_records
+
+    length = max([_K_RECORD_LENGTH] + [stop for _, _, stop in schema])
+    records = _gather(buf, starts, ends, length)
+    k_records['time'] = _decode_times(records, start_date, last_time)
+    _decode_extensions(records, schema, k_records)
+    return k_records
+
 class IGC(object):
     """ A class for representing and manipulating flight data from an IGC file
     """
-    def __init__(self, fname=None):
+    def __init__(self, fname=None, cache=None):
         """ Constructor
 
         Arguments:
             fname: optionally, the file name to build this flight from. If not
                 specified, then internals will be initialized but left empty
+            cache: optional parsers.cache.ParseCache to load the parsed
+                file from, or save it to
 
         Returns:
             class instance
@@ -26,7 +310,7 @@ class IGC(object):
         self._set_init_state()
 
         if fname is not None:
-            self.from_igc_file(fname)
+            self.from_igc_file(fname, cache)
             return
 
     def _set_init_state(self):
@@ -46,20 +330,22 @@ class IGC(object):
         self.datum = None
         self.contest_id = None
 
-        self._time = []
-        self._latitude = []
-        self._longitude = []
-        self._pressure_altitude = []
-        self._gps_altitude = []
-        self._valid = []
+        self._fixes = numpy.empty((0,), dtype=B_RECORD_DTYPE)
+        self._b_schema = ()
+        self._k_schema = ()
+        self._extensions = numpy.empty((0,), dtype=extension_dtype(()))
+        self._k_records = numpy.empty((0,), dtype=extension_dtype((), True))
 
         self.clear_interp()
 
-    def from_igc_file(self, fname):
+    def from_igc_file(self, fname, cache=None):
         """ Populate data for this flight from an IGC file
 
         Arguments:
             fname: file path/name to the igc file to be used
+            cache: optional parsers.cache.ParseCache. If the file is in the
+                cache the fixes are memory-mapped from it instead of parsing,
+                otherwise the parsed file is added to it
 
         Returns:
             no returns
@@ -68,79 +354,198 @@ class IGC(object):
 
         self._set_init_state()
 
-        igc_file = open(fname, 'r')
-
-        record_parsers = {
-            'A': self._parse_a, 'B': self._parse_b, 'C': self._parse_c,
-            'D': self._parse_d, 'E': self._parse_e, 'F': self._parse_f,
-            'G': self._parse_g, 'H': self._parse_h, 'I': self._parse_i,
-            'J': self._parse_j, 'K': self._parse_k, 'L': self._parse_l}
+        if cache is not None:
+            key = cache.key(fname, 'igc')
+            entry = cache.load(key)
+            if entry is not None:
+                self._from_cache_entry(*entry)
+                return
+
+        blocks = list(self._iter_chunks(fname, _CHUNK_SIZE))
+        if blocks:
+            _, fixes, extensions, k_records = zip(*blocks)
+            self._fixes = numpy.concatenate(fixes)
+            self._extensions = numpy.concatenate(extensions)
+            self._k_records = numpy.concatenate(k_records)
+
+        if cache is not None:
+            cache.store(key, {
+                'fixes': self._fixes,
+                'extensions': self._extensions,
+                'k_records': self._k_records,
+                }, self._cache_meta())
+
+    def _cache_meta(self):
+        """ Collect the non-fix state to be stored in a cache entry
 
-        # clear out old flight data before reading in a new flight
+        Arguments:
+            no arguments
 
+        Returns:
+            meta: json serializable dict of the header entries
+        """
+        meta = self._header()
+        if meta['date'] is not None:
+            meta['date'] = meta['date'].isoformat()
+        meta['manufacturer'] = getattr(self, '_manufacturer', None)
+        meta['serial'] = getattr(self, '_serial', None)
+        meta['b_schema'] = self._b_schema
+        meta['k_schema'] = self._k_schema
+        return meta
+
+    def _from_cache_entry(self, columns, meta):
+        """ Restore this flight from a cache entry
 
-        # IGC files are a series of one-line records with the first letter
-        # identifying the record type. Make sure we have a parser for that
-        # type then feed the line to it.
-        for line in igc_file.readlines():
-            if line[0] in record_parsers:
-                record_parsers[line[0]](line)
+        Arguments:
+            columns: dict of memory-mapped arrays from ParseCache.load
+            meta: dict from _cache_meta
 
+        Returns:
+            no returns
+        """
+        self._fixes = columns['fixes']
+        self._extensions = columns['extensions']
+        self._k_records = columns['k_records']
+        self._b_schema = tuple(tuple(entry) for entry in meta['b_schema'])
+        self._k_schema = tuple(tuple(entry) for entry in meta['k_schema'])
+        for field in _HEADER_FIELDS:
+            setattr(self, field, meta[field])
+        if meta['date'] is not None:
+            self._date = datetime.datetime.strptime(
+                meta['date'], '%Y-%m-%d').date()
+        if meta['manufacturer'] is not None:
+            self._manufacturer = meta['manufacturer']
+            self._serial = meta['serial']
+
+    @classmethod
+    def iter_chunks(cls, fname, chunk_size=_CHUNK_SIZE):
+        """ Read an IGC file a block of fixes at a time
+
+        The file is streamed line by line and only one block of fixes is held
+        at once, so arbitrarily large (or concatenated) logs can be processed
+        in bounded memory. A new HFDTE header starts a new block so that a
+        block never spans two flights.
 
-    def _parse_a(self, line):
-        """ Parse the A (FR ID number) record
+        Arguments:
+            fname: file path/name to the igc file to be used
+            chunk_size: optional maximum number of fixes per block
+
+        Yields:
+            (header, fixes, extensions, k_records)
+                header: dict of the header entries parsed so far. 'date' is
+                    the datetime.date of the flight, the remaining entries
+                    are the same as the IGC attributes of the same name
+                fixes: numpy structured array of B_RECORD_DTYPE
+                extensions: numpy structured array of the B record
+                    extensions declared by the I record, one row per fix
+                k_records: numpy structured array of the time and
+                    extensions of the K records interleaved with the fixes
+        """
+        assert os.path.isfile(fname), 'invalid filepath specified'
+        assert chunk_size > 0, 'chunk_size must be positive'
+        return cls()._iter_chunks(fname, chunk_size)
 
-        ignores "ID extension"
+    def _iter_chunks(self, fname, chunk_size):
+        """ Stream an IGC file, parsing headers into this instance
 
         Arguments:
-            line: the line from the log file
+            fname: file path/name to the igc file to be used
+            chunk_size: maximum number of fixes per block
 
-        Returns:
-            no returns
+        Yields:
+            (header, fixes, extensions, k_records): see iter_chunks
         """
-        self._manufacturer = line[1:4]
-        self._serial = line[4:7]
+        record_parsers = {
+            'A': self._parse_a, 'C': self._parse_c,
+            'D': self._parse_d, 'E': self._parse_e, 'F': self._parse_f,
+            'G': self._parse_g, 'H': self._parse_h, 'I': self._parse_i,
+            'J': self._parse_j, 'L': self._parse_l}
 
-    def _parse_b(self, line):
-        """ Parse the B record (GPS fix)
+        # IGC files are a series of one-line records with the first letter
+        # identifying the record type. B records (fixes) make up nearly all
+        # of the file so they are collected and decoded a block at a time,
+        # along with the K records. Everything else is fed to the parser for
+        # its type.
+        lines = {b'B': [], b'K': []}
+        last_time = {b'B': None, b'K': None}
+        with open(fname, 'rb') as igc_file:
+            for raw_line in igc_file:
+                record_type = raw_line[:1]
+                if record_type in lines:
+                    lines[record_type].append(raw_line)
+                    if len(lines[b'B']) >= chunk_size:
+                        yield self._decode_block(lines, last_time)
+                    continue
+
+                # the date and extension declarations apply to the records
+                # which follow them, so finish the block before they change
+                if raw_line[:5] == b'HFDTE' or record_type in (b'I', b'J'):
+                    if lines[b'B'] or lines[b'K']:
+                        yield self._decode_block(lines, last_time)
+                    if raw_line[:5] == b'HFDTE':
+                        last_time = {b'B': None, b'K': None}
+
+                line = raw_line.rstrip(b'\r\n').decode('utf-8', 'replace')
+                line += '\n'
+                if line[0] in record_parsers:
+                    record_parsers[line[0]](line)
+
+        if lines[b'B'] or lines[b'K']:
+            yield self._decode_block(lines, last_time)
+
+    def _decode_block(self, lines, last_time):
+        """ Decode a block of B and K records collected by _iter_chunks
 
         Arguments:
-            line: the line from the log file
+            lines: dict of lists of B and K record lines, emptied by this
+            last_time: dict of the time of the last B and K record before
+                this block, updated by this
 
         Returns:
-            no returns
+            (header, fixes, extensions, k_records): see iter_chunks
         """
-        fix_time = datetime.datetime(
-            self._last_epoch.year,
-            self._last_epoch.month,
-            self._last_epoch.day,
-            int(line[1:3]), int(line[3:5]), int(line[5:7]))
-        dt = fix_time - self._last_epoch
-        if dt.days < 0:
-            fix_time += datetime.timedelta(1)
-        self._last_epoch = fix_time
-        self._time.append(geodesy.conversions.datetime_to_gps(fix_time))
+        b_data = b''.join(lines[b'B'])
+        k_data = b''.join(lines[b'K'])
+        lines[b'B'] = []
+        lines[b'K'] = []
+
+        fixes = decode_b_records(b_data, self._date, last_time[b'B'])
+        extensions = decode_b_extensions(b_data, self._b_schema)
+        k_records = decode_k_records(
+            k_data, self._date, self._k_schema, last_time[b'K'])
+        if fixes.shape[0] > 0:
+            last_time[b'B'] = fixes['time'][-1]
+        if k_records.shape[0] > 0:
+            last_time[b'K'] = k_records['time'][-1]
+        return (self._header(), fixes, extensions, k_records)
+
+    def _header(self):
+        """ Collect the header entries parsed so far
 
-        hemisphere = {'N': 1.0, 'S': -1.0, 'E': 1.0, 'W': -1.0}
+        Arguments:
+            no arguments
 
-        latitude = numpy.deg2rad(
-            float(line[7:9]) + float(line[9:14])/60000.0) * hemisphere[line[14]]
-        self._latitude.append(latitude)
+        Returns:
+            header: dict of the date and header fields
+        """
+        header = dict(
+            (field, getattr(self, field)) for field in _HEADER_FIELDS)
+        header['date'] = self._date
+        return header
 
-        longitude = numpy.deg2rad(
-            float(line[15:18]) + float(line[18:23])/60000.0)
-        longitude *= hemisphere[line[23]]
-        self._longitude.append(longitude)
+    def _parse_a(self, line):
+        """ Parse the A (FR ID number) record
 
-        valid = float(line[24] == 'V' or line[24] == 'A')
-        self._valid.append(valid)
+        ignores "ID extension"
 
-        p_alt = float(line[25:30])
-        self._pressure_altitude.append(p_alt)
-        gps_alt = float(line[30:35])
-        self._gps_altitude.append(gps_alt)
+        Arguments:
+            line: the line from the log file
 
-        # do things to handle additional data, but worry about it later
+        Returns:
+            no returns
+        """
+        self._manufacturer = line[1:4]
+        self._serial = line[4:7]
 
     def _parse_c(self, line):
         """ Parse the C record (task declaration)
@@ -209,7 +614,6 @@ class IGC(object):
         day = int(line[5:7])
         month = int(line[7:9])
         year = int(line[9:11]) + 2000
-        self._last_epoch = datetime.datetime(year, month, day, 0, 0, 0)
         self._date = datetime.date(year, month, day)
         return
 
@@ -232,22 +636,26 @@ class IGC(object):
         setattr(self, field, entry.groups()[0][0:-1])
 
     def _parse_i(self, line):
-        """ Parse I record (B record extension)
+        """ Parse I record (B record extension declaration)
 
-        Not yet implemented
+        Arguments:
+            line: line from the log file to parse
+
+        Returns:
+            no returns
         """
+        self._b_schema = parse_extension_schema(line)
 
     def _parse_j(self, line):
-        """ Parse J record (K record extension)
-
-        Not yet implemented
-        """
+        """ Parse J record (K record extension declaration)
 
-    def _parse_k(self, line):
-        """ Parse K record (lower rate information)
+        Arguments:
+            line: line from the log file to parse
 
-        Not yet implemented
+        Returns:
+            no returns
         """
+        self._k_schema = parse_extension_schema(line)
 
     def _parse_l(self, line):
         """ Parse L record (log book/comments)
@@ -255,11 +663,30 @@ class IGC(object):
         Not yet implemented
         """
 
+    @property
+    def header(self):
+        """ getter for the header entries
+
+        Returns:
+            header: dict with the flight 'date' and the pilot, crew, glider,
+                registration, datum and contest_id header fields
+        """
+        return self._header()
+
+    @property
+    def fixes(self):
+        """ getter for all of the decoded fixes
+
+        Returns:
+            fixes: numpy structured array of B_RECORD_DTYPE
+        """
+        return self._fixes
+
     @property
     def time(self):
         """ getter for time
         """
-        return numpy.array(self._time)
+        return self._fixes['time'].copy()
 
     def lla(self, time=None):
         """ Get lat/long/alt at specified times
@@ -273,10 +700,18 @@ class IGC(object):
         Returns:
             lla: numpy array of lla
         """
-        return numpy.vstack((
-            self.latitude(time),
-            self.longitude(time),
-            self.gps_altitude(time))).T
+        if time is None:
+            return numpy.vstack((
+                self.latitude(),
+                self.longitude(),
+                self.gps_altitude())).T
+
+        if not self._is_interps_current:
+            self._generate_interps()
+
+        # one bracket search and gather for all three channels
+        return self._interpolator(
+            time, ('latitude', 'longitude', 'gps_altitude')).reshape(-1, 3)
 
     def latitude(self, time=None):
         """ Get latitude at specified times
@@ -289,12 +724,12 @@ class IGC(object):
             latitude: in radians at specified epochs
         """
         if time is None:
-            return numpy.array(self._latitude)
+            return self._fixes['latitude'].copy()
 
         if not self._is_interps_current:
             self._generate_interps()
 
-        return self._interp_latitude(time)
+        return self._interpolator.channel('latitude', time)
 
     def longitude(self, time=None):
         """ Get longitude at specified times
@@ -307,12 +742,12 @@ class IGC(object):
             longitude: in radians at specified epochs
         """
         if time is None:
-            return numpy.array(self._longitude)
+            return self._fixes['longitude'].copy()
 
         if not self._is_interps_current:
             self._generate_interps()
 
-        return self.interp_longitude(time)
+        return self._interpolator.channel('longitude', time)
 
     def gps_altitude(self, time=None):
         """ Get gps altitude at specified times
@@ -325,12 +760,12 @@ class IGC(object):
             gps_altitude: in meters at specified epochs
         """
         if time is None:
-            return numpy.array(self._gps_altitude)
+            return self._fixes['gps_altitude'].copy()
 
         if not self._is_interps_current:
             self._generate_interps()
 
-        return self._interp_gps_altitude(time)
+        return self._interpolator.channel('gps_altitude', time)
 
     def pressure_altitude(self, time=None):
         """ Get pressure altitude at specified times
@@ -343,12 +778,63 @@ class IGC(object):
             pressure_altitude: in meters at specified epochs
         """
         if time is None:
-            return numpy.array(self._pressure_altitude)
+            return self._fixes['pressure_altitude'].copy()
 
         if not self._is_interps_current:
             self._generate_interps()
 
-        return self._interp_pressure_altitude(time)
+        return self._interpolator.channel('pressure_altitude', time)
+
+    @property
+    def extension_codes(self):
+        """ getter for the codes of the extensions in this file
+
+        Returns:
+            codes: tuple of the three letter codes of the B record extensions
+                followed by those of the K records
+        """
+        return (
+            tuple(code for code, _, _ in self._b_schema) +
+            tuple(code for code, _, _ in self._k_schema))
+
+    @property
+    def k_time(self):
+        """ getter for the times of the K records
+        """
+        return self._k_records['time'].copy()
+
+    def extension(self, code, time=None):
+        """ Get an extension (ex ENL, TAS, VAT) at specified times
+
+        B record extensions are reported at each fix, K record extensions at
+        each K record (see k_time). Values are the integers recorded in the
+        file, the IGC spec gives the units for each code. Missing or
+        non-numeric values are nan.
+
+        Arguments:
+            code: three letter extension code, one of extension_codes
+            time: optionally, the epochs of interest. if not specified all
+                epochs are returned
+
+        Returns:
+            value: numpy array of the extension at specified epochs
+        """
+        if code in self._extensions.dtype.names:
+            value = self._extensions[code]
+            interpolator = '_interpolator'
+        elif code in self._k_records.dtype.names and code != 'time':
+            value = self._k_records[code]
+            interpolator = '_k_interpolator'
+        else:
+            raise KeyError('no extension ' + str(code) + ' in this file')
+
+        if time is None:
+            return value.copy()
+
+        if not self._is_interps_current:
+            self._generate_interps()
+
+        return getattr(self, interpolator).channel(code, time)
 
     def _generate_interps(self):
         """ Generate interpolating functions
@@ -359,16 +845,19 @@ class IGC(object):
         Returns:
             no returns
         """
-        t = numpy.array(self._time)
-
-        self._interp_latitude = scipy.interpolate.interp1d(
-            t, numpy.array(self._latitude))
-        self.interp_longitude = scipy.interpolate.interp1d(
-            t, numpy.array(self._longitude))
-        self._interp_pressure_altitude = scipy.interpolate.interp1d(
-            t, numpy.array(self._pressure_altitude))
-        self._interp_gps_altitude = scipy.interpolate.interp1d(
-            t, numpy.array(self._gps_altitude))
+        fix_channels = [
+            (name, self._fixes[name]) for name in (
+                'latitude', 'longitude', 'pressure_altitude', 'gps_altitude')]
+        fix_channels.extend(
+            (code, self._extensions[code])
+            for code in self._extensions.dtype.names)
+        self._interpolator = parsers.interpolation.ChannelInterpolator(
+            self._fixes['time'], fix_channels, {'longitude': -numpy.pi})
+
+        self._k_interpolator = parsers.interpolation.ChannelInterpolator(
+            self._k_records['time'], [
+                (code, self._k_records[code])
+                for code in self._k_records.dtype.names if code != 'time'])
 
         self._is_interps_current = True
 
@@ -381,10 +870,8 @@ class IGC(object):
         Returns:
             no returns
         """
-        self._interp_latitude = None
-        self._interp_longitude = None
-        self._interp_pressure_altitude = None
-        self._interp_gps_altitude = None
+        self._interpolator = None
+        self._k_interpolator = None
         self._is_interps_current = False
 
     @property
@@ -0,0 +1,246 @@
+""" Interpolate many channels of a flight log on a shared time axis
+
+The parsers record several channels against the same epochs (every field
+of an RMC or LXWP0 sentence, every column of a B record). Rather than build
+an interpolating function per channel, which each search the time axis on
+every query, the channels are stored as the columns of one array. A query
+finds the bracketing samples and weights once and gathers every channel
+from them together.
+
+Samples can be added to an interpolator after it is built, so a live stream
+only pays for its new samples. Given a capacity it keeps just the latest
+samples, see parsers.buffers.SampleBuffer.
+"""
+import numpy
+
+import parsers.buffers
+
+class ChannelInterpolator(object):
+    """ Linear interpolation of several channels sampled at the same times
+
+    Angle channels are interpolated the short way around the circle and
+    wrapped into [minimum, minimum + 2 pi). Like scipy's interp1d, querying
+    outside the range of the samples raises a ValueError.
+    """
+    def __init__(self, time, channels, angles=None, capacity=None):
+        """ Constructor
+
+        Arguments:
+            time: n, numpy array of sample times
+            channels: list of (name, value) tuples. value is an n, or nxk
+                numpy array sampled at time
+            angles: optional dict of {name: minimum} for channels which are
+                angles (rad) to be wrapped into [minimum, minimum + 2 pi)
+            capacity: optional maximum number of samples to keep, older
+                samples are dropped as new ones are added with extend
+
+        Returns:
+            class instance
+        """
+        if angles is None:
+            angles = {}
+
+        time = numpy.asarray(time, dtype=float)
+        order = None
+        if numpy.any(numpy.diff(time) < 0.0):
+            order = numpy.argsort(time, kind='mergesort')
+            time = time[order]
+
+        self._columns = {}
+        self._is_vector = {}
+        self._names = []
+        n_columns = 0
+        angle_minimum = []
+        for name, value in channels:
+            value = numpy.asarray(value, dtype=float)
+            assert value.shape[0] == time.shape[0],\
+                'channel ' + name + ' must have a value for every time'
+            self._is_vector[name] = value.ndim > 1
+            width = 1 if value.ndim == 1 else value.shape[1]
+            self._columns[name] = numpy.arange(n_columns, n_columns + width)
+            self._names.append(name)
+            n_columns += width
+            angle_minimum.extend([angles.get(name, numpy.nan)] * width)
+        self._angle_minimum = numpy.array(angle_minimum, dtype=float)
+
+        self._time_buffer = parsers.buffers.SampleBuffer(capacity=capacity)
+        self._value_buffer = parsers.buffers.SampleBuffer(
+            n_columns, capacity=capacity)
+
+        values = self._stack(time.shape[0], channels)
+        if order is not None:
+            values = values[order]
+        self._time_buffer.extend(time)
+        self._value_buffer.extend(values)
+
+    def _stack(self, n_samples, channels):
+        """ Put the values of every channel side by side
+
+        Arguments:
+            n_samples: number of samples in each channel
+            channels: list of (name, value) tuples, as for the constructor
+
+        Returns:
+            values: n_samples x n_columns numpy array
+        """
+        columns = []
+        for _, value in channels:
+            value = numpy.asarray(value, dtype=float)
+            if value.ndim == 1:
+                value = value[:, numpy.newaxis]
+            if value.shape[0] != n_samples:
+                raise ValueError('channel values must match the time samples')
+            columns.append(value)
+        if not columns:
+            return numpy.empty((n_samples, 0))
+        return numpy.hstack(columns)
+
+    @property
+    def _time(self):
+        """ getter for the sample times
+        """
+        return self._time_buffer.view()
+
+    @property
+    def _values(self):
+        """ getter for the n_samples x n_columns sample values
+        """
+        return self._value_buffer.view()
+
+    @property
+    def n_appended(self):
+        """ getter for the number of samples ever added, including any which
+        have been dropped because of the capacity
+        """
+        return self._time_buffer.n_appended
+
+    def extend(self, time, channels):
+        """ Add samples after the ones already held
+
+        Arguments:
+            time: n, numpy array of sample times, sorted and no earlier than
+                the latest sample held
+            channels: list of (name, value) tuples with the same channels
+                and shapes as given to the constructor
+
+        Returns:
+            no returns
+        """
+        time = numpy.asarray(time, dtype=float).reshape(-1)
+        if [name for (name, _) in channels] != self._names:
+            raise ValueError('extend needs the same channels, in order')
+        if numpy.any(numpy.diff(time) < 0.0) or (
+                len(self._time_buffer) > 0 and time.shape[0] > 0 and
+                time[0] < self._time_buffer[-1]):
+            raise ValueError('extend needs samples in time order')
+        values = self._stack(time.shape[0], channels)
+        if values.shape[1] != self._angle_minimum.shape[0]:
+            raise ValueError('channel shapes changed')
+        self._time_buffer.extend(time)
+        self._value_buffer.extend(values)
+
+    @property
+    def names(self):
+        """ getter for the channel names
+        """
+        return list(self._names)
+
+    def bracket(self, time):
+        """ Find the samples either side of some times
+
+        Arguments:
+            time: float or numpy array of query times
+
+        Returns:
+            (idx, weight)
+                idx: numpy int array, time lies between samples idx and
+                    idx + 1
+                weight: numpy array, fraction of the way from sample idx to
+                    idx + 1
+        """
+        time = numpy.asarray(time, dtype=float)
+        sample_time = self._time
+        n_samples = sample_time.shape[0]
+        if n_samples == 0:
+            raise ValueError('no samples to interpolate')
+        if (numpy.any(time < sample_time[0]) or
+                numpy.any(time > sample_time[-1])):
+            raise ValueError(
+                'A value in time is outside the interpolation range')
+
+        idx = numpy.searchsorted(sample_time, time, side='right') - 1
+        idx = numpy.clip(idx, 0, max(n_samples - 2, 0))
+        next_idx = numpy.minimum(idx + 1, n_samples - 1)
+        dt = sample_time[next_idx] - sample_time[idx]
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            weight = numpy.where(
+                dt > 0.0, (time - sample_time[idx]) / dt, 0.0)
+        return (idx, weight)
+
+    def __call__(self, time, names=None):
+        """ Interpolate channels at some times
+
+        Arguments:
+            time: float or numpy array of query times
+            names: optional list of channel names, defaults to all channels
+                in the order they were given
+
+        Returns:
+            values: numpy array, shaped like time with a trailing axis of
+                the columns of the requested channels
+        """
+        idx, weight = self.bracket(time)
+        if names is None:
+            names = self._names
+        columns = numpy.concatenate([self._columns[name] for name in names])
+        return self._interpolate(idx, weight, columns)
+
+    def channel(self, name, time):
+        """ Interpolate one channel at some times
+
+        Arguments:
+            name: the channel name
+            time: float or numpy array of query times
+
+        Returns:
+            values: numpy array shaped like time (with a trailing axis for
+                channels given as nxk arrays)
+        """
+        idx, weight = self.bracket(time)
+        values = self._interpolate(idx, weight, self._columns[name])
+        if self._is_vector[name]:
+            return values
+        return values[..., 0]
+
+    def _interpolate(self, idx, weight, columns):
+        """ Gather and blend the bracketing samples of some columns
+
+        Arguments:
+            idx: numpy int array of lower sample indices from bracket
+            weight: numpy array of weights from bracket
+            columns: numpy int array of the columns to interpolate
+
+        Returns:
+            values: numpy array shaped like idx with a trailing axis of
+                len(columns)
+        """
+        rows = idx[..., numpy.newaxis]
+        samples = self._values
+        next_rows = numpy.minimum(rows + 1, samples.shape[0] - 1)
+        v0 = samples[rows, columns]
+        delta = samples[next_rows, columns] - v0
+
+        minimum = self._angle_minimum[columns]
+        is_angle = numpy.isfinite(minimum)
+        has_angles = numpy.any(is_angle)
+        two_pi = 2.0 * numpy.pi
+        if has_angles:
+            delta = numpy.where(
+                is_angle, numpy.mod(delta + numpy.pi, two_pi) - numpy.pi,
+                delta)
+        values = v0 + weight[..., numpy.newaxis] * delta
+        if has_angles:
+            values = numpy.where(
+                is_angle, numpy.mod(values - minimum, two_pi) + minimum,
+                values)
+        return values
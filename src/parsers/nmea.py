@@ -1,50 +1,219 @@
-import pdb
-
-import os
-
-import re
 import datetime
+import itertools
+import threading
 
 import numpy
-import scipy.interpolate
 
 import geodesy.conversions
 
+import parsers.buffers
+import parsers.interpolation
+
+try:
+    basestring
+except NameError:
+    basestring = str
+
+# longest partial line kept between calls to NMEA.feed, anything longer is
+# not a sentence and is dropped
+_MAX_PARTIAL_LINE = 4096
+
+# most sentences saved per hold of the parser lock, so a query made while a
+# large buffer is parsed waits for at most this many sentences
+_LOCKED_SENTENCES = 1024
+
+# buffers with fewer lines than this are split line by line, framing with
+# numpy only pays off once its fixed cost is spread over enough lines
+_MIN_FRAMED_LINES = 16
+
+# columns of the table of RMC data
+_RMC_COLUMNS = (
+    'time', 'latitude', 'longitude', 'ground_speed', 'ground_track')
+
+# value of each byte as a hex digit, -1 if it isn't one
+_HEX_DIGITS = numpy.full((256,), -1, dtype=numpy.int16)
+for _value, _digit in enumerate('0123456789ABCDEF'):
+    _HEX_DIGITS[ord(_digit)] = _value
+    _HEX_DIGITS[ord(_digit.lower())] = _value
+
+def _frame_lines(buf, prefix=None):
+    """ Find the sentence in each line of a buffer and check its checksum
+
+    The whole buffer is scanned at once: the first $ of each line, the
+    first * after it and the xor of every byte between them all come from
+    whole-array operations, so only lines holding a sentence are visited in
+    python.
+
+    Arguments:
+        buf: bytes of newline separated lines
+        prefix: optional character which must come directly before the $,
+            after at least one other character on the line
+
+    Returns:
+        (start, stop, checksum_ok)
+            start: list of the index in buf just after the $ of each sentence
+            stop: list of the index of its * (or the end of the line)
+            checksum_ok: list of booleans, True if the sentence ends with a
+                checksum which matches
+    """
+    data = numpy.frombuffer(buf, dtype=numpy.uint8)
+    if data.shape[0] == 0:
+        return ([], [], [])
+    newlines = numpy.flatnonzero(data == ord('\n'))
+    line_start = numpy.concatenate(([0], newlines + 1))
+    line_stop = numpy.concatenate((newlines, [data.shape[0]]))
+
+    dollars = numpy.flatnonzero(data == ord('$'))
+    if dollars.shape[0] == 0:
+        return ([], [], [])
+    idx = numpy.searchsorted(dollars, line_start)
+    dollar = dollars[numpy.minimum(idx, dollars.shape[0] - 1)]
+    has_sentence = (idx < dollars.shape[0]) & (dollar < line_stop)
+    if prefix is not None:
+        has_sentence &= (dollar - 1 > line_start) & (
+            data[dollar - 1] == ord(prefix))
+    dollar = dollar[has_sentence]
+    line_stop = line_stop[has_sentence]
+
+    stars = numpy.flatnonzero(data == ord('*'))
+    if stars.shape[0] == 0:
+        stars = numpy.array([data.shape[0]])
+    idx = numpy.searchsorted(stars, dollar)
+    star = stars[numpy.minimum(idx, stars.shape[0] - 1)]
+    has_star = (idx < stars.shape[0]) & (star < line_stop)
+
+    # a carriage return isn't part of a sentence without a checksum
+    line_stop -= data[numpy.maximum(line_stop - 1, 0)] == ord('\r')
+    stop = numpy.where(has_star, star, line_stop)
+
+    # xor of the bytes strictly between the $ and the *
+    running_xor = numpy.bitwise_xor.accumulate(data)
+    computed = running_xor[stop - 1] ^ running_xor[dollar]
+    last = data.shape[0] - 1
+    high = _HEX_DIGITS[data[numpy.minimum(stop + 1, last)]]
+    low = _HEX_DIGITS[data[numpy.minimum(stop + 2, last)]]
+    checksum_ok = (
+        has_star & (stop + 2 < line_stop) & (high >= 0) & (low >= 0) &
+        (high * 16 + low == computed))
+
+    return ((dollar + 1).tolist(), stop.tolist(), checksum_ok.tolist())
+
+def _split_sentence(string_data, prefix=None):
+    """ Split one nmea sentence into its fields and check its checksum
+
+    Arguments:
+        string_data: a string containing one nmea sentence
+        prefix: optional character which must come directly before the $,
+            after at least one other character
+
+    Returns:
+        (fields, checksum_ok)
+            fields: list of the comma separated fields between the $ and
+                the *, the first is the sentence id. None if there is no
+                sentence
+            checksum_ok: True if the sentence ends with a matching checksum
+    """
+    dollar = string_data.find('$')
+    if dollar < 0:
+        return (None, False)
+    if prefix is not None and (
+            dollar < 2 or string_data[dollar - 1] != prefix):
+        return (None, False)
+    star = string_data.find('*', dollar)
+    if star < 0:
+        return (string_data[dollar + 1:].rstrip('\r\n').split(','), False)
+
+    body = string_data[dollar + 1:star]
+    computed_checksum = 0
+    # latin-1 gives back the bytes a line was decoded from, so this is the
+    # same xor _frame_lines takes
+    for byte in bytearray(body.encode('latin-1', 'replace')):
+        computed_checksum ^= byte
+    reported_checksum = string_data[star + 1:star + 3]
+    checksum_ok = (
+        len(reported_checksum) == 2 and
+        all(ord(digit) < 256 and _HEX_DIGITS[ord(digit)] >= 0
+            for digit in reported_checksum) and
+        int(reported_checksum, 16) == computed_checksum)
+    return (body.split(','), checksum_ok)
+
+def _dm_to_degrees(dm):
+    """Convert degrees / minutes to decimal degrees
+
+    Arguments:
+        dm: string containing degrees and decimal minutes
+            concatenated togeter. Ex:
+            "12319.943281" = 123 degrees, 19.953281 minutes)
+
+    Returns:
+        dd: decimal degrees (floating point)
+    """
+    if not dm or dm == '0':
+        return 0.
+    dot = dm.find('.')
+    if dot < 3:
+        raise ValueError('bad degrees / minutes: ' + dm)
+    return float(dm[:dot - 2]) + float(dm[dot - 2:]) / 60
+
 class NMEA(object):
     """Parser for NMEA data
     """
-    def __init__(self, file_path=None, string_data=None):
+    # data tables saved to and restored from a parsers.cache.ParseCache
+    _CACHED_COLUMNS = ('_rmc',)
+    # other (json serializable) state saved with the cached columns
+    _CACHED_STATE = ()
+    # character which must come directly before the $ of a sentence
+    _SENTENCE_PREFIX = None
+    # channels interpolated from each table, table name: (list of (name,
+    # column) tuples, angle channels). column is an int or a slice of the
+    # table columns, angles are as for ChannelInterpolator
+    _INTERPOLATED = {
+        '_rmc': ([
+            ('latitude', 1),
+            ('longitude', 2),
+            ('ground_speed', 3),
+            ('ground_track', 4),
+            ], {'longitude': -numpy.pi, 'ground_track': 0.0}),
+        }
+
+    def __init__(
+            self, file_path=None, string_data=None, cache=None,
+            retention=None):
         """Constructor
 
         Arguments:
             file_path: path to a file with nmea data in it
             string_data: alternate option, can directly pass nmea data to
                 be parsed.
+            cache: optional parsers.cache.ParseCache used when parsing
+                file_path
+            retention: optional number of samples of each channel to keep.
+                older samples are dropped, so a live stream (see feed) can
+                run indefinitely in fixed memory. defaults to keeping all
 
         Returns:
             class instance
         """
-        self._reading = False
-
-        self._time_latitude = []
-        self._latitude = []
-        self._time_longitude = []
-        self._longitude = []
-        self._time_speed = []
-        self._ground_speed = []
-        self._time_track = []
-        self._ground_track = []
-
+        # held while saving data and while reading it or updating the
+        # interpolators, so one thread can parse while others query
+        self._lock = threading.RLock()
+        self._retention = retention
+        self._partial_line = b''
+        # gps time of midnight, keyed by the ddmmyy date field of a sentence
+        self._day_offsets = {}
+
+        # one row per saved sentence, see _RMC_COLUMNS
+        self._rmc = self._new_table(len(_RMC_COLUMNS))
+
+        # sentence id: function of (fields, checksum_ok, save)
         self._sentence_parsers = {
-            'GPRMC': self.parse_rmc,
+            'GPRMC': self._parse_rmc_fields,
             }
 
-        self._extract_sentence_header = self._get_nmea_header
-
         self.clear_interp()
 
         if file_path is not None:
-            self.parse_file(file_path)
+            self.parse_file(file_path, cache)
             return
         if string_data is not None:
             self.parse_string(string_data)
@@ -59,27 +228,127 @@ class NMEA(object):
         Returns:
             no returns
         """
-        self._is_interps_current = False
+        with self._lock:
+            # interpolator of each table, made when one of its channels is
+            # first queried
+            self._interpolators = {}
+            # number of rows saved to each table when its interpolator was
+            # last brought up to date
+            self._n_interpolated = {}
+
+    def __getstate__(self):
+        """Get the state to pickle, everything but the lock
+        """
+        with self._lock:
+            state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        """Restore a pickled state, with a new lock
+        """
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def _new_table(self, width):
+        """Make an empty table of data
 
-        self._interp_latitude = None
-        self._interp_longitude = None
-        self._interp_ground_speed = None
-        self._interp_track = None
+        Each sentence saves one row to a table, so saving costs a single
+        append and every channel is a column view of it.
+
+        Arguments:
+            width: number of columns
+
+        Returns:
+            table: parsers.buffers.SampleBuffer, a ring buffer if this
+                parser has a retention
+        """
+        return parsers.buffers.SampleBuffer(width, capacity=self._retention)
+
+    def _snapshot(self, table):
+        """Get the rows of a table saved so far
+
+        Rows saved later don't change the snapshot, so it can be used
+        without holding the lock while other threads keep parsing.
+
+        Arguments:
+            table: SampleBuffer table of data
+
+        Returns:
+            rows: read-only numpy array of the rows, see SampleBuffer.snapshot
+        """
+        with self._lock:
+            return table.snapshot()
 
-    def parse_file(self, file_path):
+    def parse_file(self, file_path, cache=None):
         """Parse a file of nmea data
 
         Arguments:
             file_path: path to file to parse
+            cache: optional parsers.cache.ParseCache. If this parser has no
+                data yet and the file is in the cache, its columns are
+                memory-mapped from the cache instead of parsing. Otherwise
+                the parsed file is added to the cache
 
         Returns:
             no returns
         """
-        self._reading = True
-        with open(file_path, 'r') as nmea_file:
-            for line in nmea_file.readlines():
-                self.parse_sentence(line, save=True)
-        self._reading = False
+        if cache is not None and self._is_empty():
+            key = cache.key(file_path, type(self).__name__)
+            entry = cache.load(key)
+            if entry is not None:
+                self._from_cache_entry(*entry)
+                return
+        else:
+            cache = None
+
+        with open(file_path, 'rb') as nmea_file:
+            self._parse_buffer(nmea_file.read())
+
+        if cache is not None:
+            with self._lock:
+                columns = dict(
+                    (name.lstrip('_'), getattr(self, name).snapshot())
+                    for name in self._CACHED_COLUMNS)
+                state = dict((name.lstrip('_'), getattr(self, name))
+                    for name in self._CACHED_STATE)
+            cache.store(key, columns, state)
+
+    def _is_empty(self):
+        """Check if this parser has no data saved yet
+
+        Arguments:
+            no arguments
+
+        Returns:
+            is_empty: True if every data column is empty
+        """
+        with self._lock:
+            return all(len(getattr(self, name)) == 0
+                for name in self._CACHED_COLUMNS)
+
+    def _from_cache_entry(self, columns, meta):
+        """Restore the data columns from a cache entry
+
+        The memory-mapped arrays become the storage of the columns, they are
+        only copied if more data is saved (or if this parser has a
+        retention).
+
+        Arguments:
+            columns: dict of memory-mapped arrays from ParseCache.load
+            meta: dict of state from ParseCache.load
+
+        Returns:
+            no returns
+        """
+        with self._lock:
+            for name in self._CACHED_COLUMNS:
+                setattr(self, name, parsers.buffers.SampleBuffer.from_array(
+                    columns[name.lstrip('_')], getattr(self, name).width,
+                    self._retention))
+            for name in self._CACHED_STATE:
+                setattr(self, name, meta[name.lstrip('_')])
+            self.clear_interp()
 
     def parse_string(self, string_data):
         """Parse a bunch of string data
@@ -92,24 +361,86 @@ class NMEA(object):
         Returns:
             no returns
         """
-        if isinstance(string_data, basestring):
-            string_data = string_data.split('\n')
-        for line in string_data:
-            self.parse_sentence(line, save=True)
+        if not isinstance(string_data, basestring):
+            string_data = '\n'.join(string_data)
+        if not isinstance(string_data, bytes):
+            string_data = string_data.encode('ascii', 'replace')
+        self._parse_buffer(string_data)
 
-    def _get_nmea_header(self, string_data):
-        """Get an nmea header from string data
+    def feed(self, data):
+        """Parse the next chunk of a live stream of nmea data
+
+        Chunks can start or stop anywhere, part of a sentence left at the end
+        of one chunk is completed by the next. Saving samples doesn't touch
+        the interpolators, the next query of a channel adds just the new
+        samples to the interpolator of its table rather than rebuilding.
 
         Arguments:
-            string_data: a string with an nmea sentence
+            data: bytes (or string) read from a serial port, socket or file
 
         Returns:
-            header: string with just the sentence id
+            sentences: list of (id, data) tuples from parse_sentence for
+                each complete sentence of a known type in the chunk
         """
-        search_result = re.search('\$([A-Z0-9]+),', string_data)
-        if not search_result:
-            return
-        return search_result.groups()[0]
+        if not isinstance(data, bytes):
+            data = data.encode('ascii', 'replace')
+        with self._lock:
+            data = self._partial_line + data
+            end = data.rfind(b'\n')
+            self._partial_line = data[end + 1:]
+            if len(self._partial_line) > _MAX_PARTIAL_LINE:
+                self._partial_line = b''
+        if end < 0:
+            return []
+        return self._parse_buffer(data[:end])
+
+    def _parse_buffer(self, buf, save=True):
+        """Parse a buffer of whole lines of nmea data
+
+        Lines are framed and checksummed together by _frame_lines, then each
+        sentence is split once and handed to the parser for its id. Short
+        buffers from a live stream go through _split_sentence instead.
+        Malformed sentences are skipped. Sentences are saved in blocks, each
+        holding the lock, so queries from other threads aren't held up until
+        the whole buffer is parsed.
+
+        Arguments:
+            buf: bytes of newline separated lines
+            save: optional boolean, defaults True. save the sentence data
+
+        Returns:
+            sentences: list of (id, data) tuples, see parse_sentence, for
+                each sentence of a known type
+        """
+        prefix = self._SENTENCE_PREFIX
+        if buf.count(b'\n') < _MIN_FRAMED_LINES:
+            framed = (
+                _split_sentence(line.decode('latin-1'), prefix)
+                for line in buf.split(b'\n'))
+        else:
+            framed = (
+                (buf[start:stop].decode('latin-1').split(','), ok)
+                for (start, stop, ok) in zip(*_frame_lines(buf, prefix)))
+
+        sentence_parsers = self._sentence_parsers
+        sentences = []
+        while True:
+            # lines are framed and split before taking the lock
+            block = list(itertools.islice(framed, _LOCKED_SENTENCES))
+            if not block:
+                return sentences
+            with self._lock:
+                for fields, checksum_ok in block:
+                    if fields is None:
+                        continue
+                    parser = sentence_parsers.get(fields[0])
+                    if parser is None:
+                        continue
+                    try:
+                        sentence_data = parser(fields, checksum_ok, save)
+                    except (ValueError, IndexError):
+                        continue
+                    sentences.append((fields[0], sentence_data))
 
     def parse_sentence(self, string_data, save=True):
         """Parse an NMEA sentence into its parts
@@ -124,14 +455,17 @@ class NMEA(object):
                 id: string identifying this sentence
                 data: tuple of data from this sentence
         """
-        sentence = self._extract_sentence_header(string_data)
-        if sentence not in self._sentence_parsers:
+        fields, checksum_ok = _split_sentence(
+            string_data, self._SENTENCE_PREFIX)
+        if fields is None or fields[0] not in self._sentence_parsers:
             return ('', tuple())
-        sentence_data = self._sentence_parsers[sentence](string_data, save=True)
-        # we have new data so clear our interpolators if we're saving this
-        if save:
-            self.clear_interp()
-        return (sentence, sentence_data)
+        with self._lock:
+            try:
+                sentence_data = self._sentence_parsers[fields[0]](
+                    fields, checksum_ok, save)
+            except (ValueError, IndexError):
+                return ('', tuple())
+        return (fields[0], sentence_data)
 
     def parse_rmc(self, string_data, save=True):
         """Parse an rmc sentence
@@ -148,110 +482,75 @@ class NMEA(object):
                 speed: ground speed (m/s)
                 course: course track (radians)
         """
-        def dm_to_sd(dm):
-            """Convert degrees / minutes to decimal degrees
-
-            Arguments:
-                dm: string containing degrees and decimal minutes
-                    concatenated togeter. Ex:
-                    "12319.943281" = 123 degrees, 19.953281 minutes)
-
-            Returns:
-                dd: decimal degrees (floating point)
-             """
-            if not dm or dm == '0':
-                return 0.
-            d, m = re.match(r'^(\d+)(\d\d\.\d+)$', dm).groups()
-            return float(d) + float(m) / 60
-
-        data = string_data.split(',')
-        if len(data) < 10:
+        fields, checksum_ok = _split_sentence(string_data)
+        if fields is None or fields[0] != 'GPRMC':
             return None
-        if (
-            data[0] != '$GPRMC' or
-            data[2] == 'V' or not
-            self.verify_checksum(string_data)):
+        with self._lock:
+            return self._parse_rmc_fields(fields, checksum_ok, save)
+
+    def _parse_rmc_fields(self, data, checksum_ok, save=True):
+        """Parse the fields of an rmc sentence
+
+        Arguments:
+            data: list of the sentence fields, starting with the id
+            checksum_ok: True if the sentence checksum matched
+            save: boolean, defaults True. Save this data to the object
+
+        Returns:
+            rmc_data: tuple containing rmc data, see parse_rmc. returns None
+                if invalid
+        """
+        if len(data) < 10 or data[2] == 'V' or not checksum_ok:
             return None
-        year = int(data[9][4:6]) + 2000
-        month = int(data[9][2:4])
-        day = int(data[9][0:2])
+        day_offset = self._day_offsets.get(data[9])
+        if day_offset is None:
+            day_offset = self._day_offset(data[9])
         hour = int(data[1][0:2])
         minute = int(data[1][2:4])
         second = float(data[1][4:])
+        # 60 seconds is a leap second, it lands on the next midnight
+        if not (0 <= hour < 24 and 0 <= minute < 60 and 0.0 <= second < 61.0):
+            raise ValueError('bad time of day: ' + data[1])
         n_s = 2 * (data[4] == 'N') - 1
         e_w = 2 * (data[6] == 'E') - 1
-        latitude = numpy.deg2rad((dm_to_sd(data[3]))  * n_s)
-        longitude = numpy.deg2rad((dm_to_sd(data[5])) * e_w)
+        latitude = numpy.deg2rad((_dm_to_degrees(data[3]))  * n_s)
+        longitude = numpy.deg2rad((_dm_to_degrees(data[5])) * e_w)
         speed = float(data[7]) * 0.5144 # knots to m/s
         if data[8] == '':
             course = numpy.nan
         else:
             course = numpy.deg2rad(float(data[8]))
 
-        time = geodesy.conversions.datetime_to_gps(
-            datetime.datetime(
-                year,
-                month,
-                day,
-                hour,
-                minute,
-                int(second),
-                int((second - int(second)) * 1000)))
+        time = day_offset + (hour * 3600 + minute * 60 + second)
 
         if save:
-            self._time_latitude.append(time)
-            self._latitude.append(latitude)
-            self._time_longitude.append(time)
-            self._longitude.append(longitude)
-            self._time_speed.append(time)
-            self._ground_speed.append(speed)
-            self._time_track.append(time)
-            self._ground_track.append(course)
+            self._rmc.append((time, latitude, longitude, speed, course))
 
         return (time, latitude, longitude, speed, course)
 
-    def latitude(self, time=None):
-        """ Get latitude at specified times
-
-        Arguments:
-            time: optionally, the epochs of interest. if not specified all
-                epochs are returnd. time in GPS seconds
-
-        Returns:
-            time: time values we got the latitude at
-            latitude: in radians at specified epochs
-        """
-        if time is None:
-            return (
-                numpy.array(self._time_latitude), numpy.array(self._latitude))
-
-        if not self._is_interps_current:
-            self._generate_interps()
-
-        return (time, self._interp_latitude(time))
+    def _day_offset(self, date_field):
+        """Get the gps time of midnight on a sentence date, remembering it
 
-    def longitude(self, time=None):
-        """ Get longitude at specified times
+        Fix times only need the time of day added to this, so the datetime
+        conversion is done once per day rather than once per sentence.
 
         Arguments:
-            time: optionally, the epochs of interest. if not specified all
-                epochs are returnd. time in GPS seconds
+            date_field: ddmmyy date field of a sentence
 
         Returns:
-            time: time values we got the latitude at
-            longitude : in radians at specified epochs
+            day_offset: gps time (seconds) at the start of that date. raises
+                ValueError if the date is not valid
         """
-        if time is None:
-            return (
-                numpy.array(self._time_longitude), numpy.array(self._longitude))
+        midnight = datetime.datetime(
+            int(date_field[4:6]) + 2000,
+            int(date_field[2:4]),
+            int(date_field[0:2]))
+        day_offset = geodesy.conversions.datetime_to_gps(midnight)
+        self._day_offsets[date_field] = day_offset
+        return day_offset
 
-        if not self._is_interps_current:
-            self._generate_interps()
-
-        return (time, self._interp_longitude(time))
-
-    def ground_speed(self, time=None):
-        """ Get ground speed at specified times
+    def latitude(self, time=None):
+        """ Get latitude at specified times
 
         Arguments:
             time: optionally, the epochs of interest. if not specified all
@@ -259,16 +558,13 @@ class NMEA(object):
 
         Returns:
             time: time values we got the latitude at
-            ground_speed: in m/s at specified epochs
+            latitude: in radians at specified epochs
         """
         if time is None:
-            return (
-                numpy.array(self._time_longitude), numpy.array(self._longitude))
-
-        if not self._is_interps_current:
-            self._generate_interps()
+            rmc = self._snapshot(self._rmc)
+            return (rmc[:, 0], rmc[:, 1])
 
-        return (time, self._interp_longitude(time))
+        return (time, self._interpolate('_rmc', 'latitude', time))
 
     def longitude(self, time=None):
         """ Get longitude at specified times
@@ -282,13 +578,10 @@ class NMEA(object):
             longitude : in radians at specified epochs
         """
         if time is None:
-            return (
-                numpy.array(self._time_longitude), numpy.array(self._longitude))
+            rmc = self._snapshot(self._rmc)
+            return (rmc[:, 0], rmc[:, 2])
 
-        if not self._is_interps_current:
-            self._generate_interps()
-
-        return (time, self._interp_longitude(time))
+        return (time, self._interpolate('_rmc', 'longitude', time))
 
     def ground_speed(self, time=None):
         """ Get ground speed at specified times
@@ -302,13 +595,10 @@ class NMEA(object):
             ground_speed: in m/s at specified epochs
         """
         if time is None:
-            return (
-                numpy.array(self._time_speed), numpy.array(self._ground_speed))
-
-        if not self._is_interps_current:
-            self._generate_interps()
+            rmc = self._snapshot(self._rmc)
+            return (rmc[:, 0], rmc[:, 3])
 
-        return (time, self._interp_ground_speed(time))
+        return (time, self._interpolate('_rmc', 'ground_speed', time))
 
     def ground_track(self, time=None):
         """ Get ground track at specified times
@@ -322,33 +612,66 @@ class NMEA(object):
             ground_track: in radians at specified epochs
         """
         if time is None:
-            return (
-                numpy.array(self._time_track), numpy.array(self._ground_track))
+            rmc = self._snapshot(self._rmc)
+            return (rmc[:, 0], rmc[:, 4])
 
-        if not self._is_interps_current:
-            self._generate_interps()
+        return (time, self._interpolate('_rmc', 'ground_track', time))
 
-        return (time, self._interp_track(time))
+    def _interpolate(self, table_name, channel, time):
+        """Interpolate a channel at specified times
 
-    def _generate_interps(self):
-        """Generate interpolating functions
+        Only the interpolator of the channel's table is made or brought up
+        to date, so a query doesn't pay for the rows saved to other tables.
 
         Arguments:
-            no arguments
+            table_name: name of the table attribute holding the channel, a
+                key of _INTERPOLATED
+            channel: name of the channel
+            time: the epochs of interest, time in GPS seconds
 
         Returns:
-            no returns
+            values: channel values at the specified epochs
         """
-        self._interp_latitude = scipy.interpolate.interp1d(
-            numpy.array(self._time_latitude), numpy.array(self._latitude))
-        self._interp_longitude = scipy.interpolate.interp1d(
-            numpy.array(self._time_longitude), numpy.array(self._longitude))
-        self._interp_ground_speed = scipy.interpolate.interp1d(
-            numpy.array(self._time_speed), numpy.array(self._ground_speed))
-        self._interp_track = scipy.interpolate.interp1d(
-            numpy.array(self._time_track), numpy.array(self._ground_track))
+        with self._lock:
+            interpolator = self._update_interpolator(table_name)
+            return interpolator.channel(channel, time)
+
+    def _update_interpolator(self, table_name):
+        """Add the rows saved since a table's interpolator was updated, or
+        build it
+
+        Arguments:
+            table_name: name of the table attribute, a key of _INTERPOLATED
 
-        self._is_interps_current = True
+        Returns:
+            interpolator: parsers.interpolation.ChannelInterpolator with
+                every row of the table
+        """
+        table = getattr(self, table_name)
+        channels, angles = self._INTERPOLATED[table_name]
+        interpolator = self._interpolators.get(table_name)
+        n_saved = table.n_appended
+        n_new = n_saved - self._n_interpolated.get(table_name, 0)
+        if interpolator is not None and 0 <= n_new <= len(table):
+            if n_new == 0:
+                return interpolator
+            rows = table[-n_new:]
+            try:
+                interpolator.extend(rows[:, 0], [
+                    (name, rows[:, column]) for (name, column) in channels])
+                self._n_interpolated[table_name] = n_saved
+                return interpolator
+            except ValueError:
+                # rows out of time order, start again and sort them
+                pass
+        rows = table.view()
+        interpolator = parsers.interpolation.ChannelInterpolator(
+            rows[:, 0],
+            [(name, rows[:, column]) for (name, column) in channels],
+            angles, capacity=self._retention)
+        self._interpolators[table_name] = interpolator
+        self._n_interpolated[table_name] = n_saved
+        return interpolator
 
     def verify_checksum(self, string_data):
         """Verify the checksum in a nmea packet
@@ -361,16 +684,4 @@ class NMEA(object):
         Returns:
             good_packet: True if the checksum is correct. False otherwise
         """
-        find_checksum = re.search('\*([A-Z0-9]{2})', string_data)
-        if not find_checksum:
-            return False
-        reported_checksum = find_checksum.groups()[0]
-
-        packet_interior = re.search('\$(.+)\*', string_data)
-        if not packet_interior:
-            return False
-        computed_checksum = 0
-        for byte in packet_interior.groups()[0]:
-            computed_checksum ^= ord(byte)
-
-        return hex(computed_checksum)[2:].upper() == reported_checksum.upper()
+        return _split_sentence(string_data)[1]
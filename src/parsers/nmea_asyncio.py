@@ -0,0 +1,331 @@
+""" Read live nmea (or Perlan) telemetry with asyncio
+
+An NMEAStreamProtocol feeds whatever a transport receives, UDP datagrams,
+TCP stream chunks or reads from a serial port or pty, to a parser without
+blocking the event loop. Each connection is framed into lines separately
+and every datagram is taken to hold whole sentences, so any number of
+connections and UDP senders can share one parser. Every sentence parsed is
+passed to an optional callback and/or put on a SentenceStream for a
+coroutine to consume. A stream holds a bounded number of sentences, when it
+is full reading pauses on every source feeding it until the consumer has
+caught up, so a slow consumer holds back the senders (TCP) or lets the
+operating system drop datagrams (UDP) rather than growing without limit.
+
+Requires python 3.7 or later.
+"""
+import asyncio
+import collections
+import os
+
+import parsers.nmea
+
+# default most sentences a SentenceStream holds before pausing its sources
+_MAX_QUEUED = 1024
+
+class SentenceStream(object):
+    """ Bounded queue of parsed sentences from one or more sources
+
+    Iterate over it with async for to get (sentence_id, data, source) tuples,
+    see NMEAStreamProtocol. Iteration stops once the stream is closed and
+    every queued sentence has been taken.
+    """
+    def __init__(self, max_queued=_MAX_QUEUED):
+        """ Constructor
+
+        Arguments:
+            max_queued: optional number of sentences to hold before pausing
+                the sources. reading resumes once half of them are taken
+
+        Returns:
+            class instance
+        """
+        assert max_queued > 0, 'max_queued must be positive'
+        self.max_queued = max_queued
+        self._sentences = collections.deque()
+        self._paused = set()
+        self._ready = asyncio.Event()
+        self._closed = False
+
+    def __len__(self):
+        """ Number of sentences waiting
+        """
+        return len(self._sentences)
+
+    @property
+    def closed(self):
+        """ getter for whether close has been called
+        """
+        return self._closed
+
+    def put(self, sentence, transport=None):
+        """ Add a sentence, pausing its transport if the stream is full
+
+        Sentences are never dropped, a transport can still deliver the data
+        it already read after it is paused.
+
+        Arguments:
+            sentence: (sentence_id, data, source) tuple
+            transport: optional asyncio transport the sentence came from
+
+        Returns:
+            no returns
+        """
+        self._sentences.append(sentence)
+        self._ready.set()
+        if (transport is None or transport in self._paused or
+                len(self._sentences) < self.max_queued):
+            return
+        if hasattr(transport, 'pause_reading'):
+            transport.pause_reading()
+            self._paused.add(transport)
+
+    def discard(self, transport):
+        """ Forget a transport which has closed
+
+        Arguments:
+            transport: asyncio transport
+
+        Returns:
+            no returns
+        """
+        self._paused.discard(transport)
+
+    def close(self):
+        """ End the stream once the sentences queued so far are taken
+
+        Arguments:
+            no arguments
+
+        Returns:
+            no returns
+        """
+        self._closed = True
+        self._ready.set()
+
+    async def get(self):
+        """ Take the oldest sentence, waiting for one if there are none
+
+        Arguments:
+            no arguments
+
+        Returns:
+            sentence: (sentence_id, data, source) tuple, or None if the stream
+                is closed and empty
+        """
+        while not self._sentences:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        sentence = self._sentences.popleft()
+        if self._paused and len(self._sentences) <= self.max_queued // 2:
+            for transport in self._paused:
+                transport.resume_reading()
+            self._paused.clear()
+        return sentence
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        sentence = await self.get()
+        if sentence is None:
+            raise StopAsyncIteration
+        return sentence
+
+class NMEAStreamProtocol(asyncio.Protocol, asyncio.DatagramProtocol):
+    """ asyncio protocol feeding received data to an nmea parser
+
+    The same class serves stream (TCP, pipe) and datagram (UDP) transports.
+    Lines of a stream are completed before being handed to the parser, so
+    the parser should only be fed through protocols while they are in use.
+    A datagram must hold whole sentences, a line isn't continued in the
+    next one.
+    """
+    def __init__(self, parser, on_sentence=None, stream=None):
+        """ Constructor
+
+        Arguments:
+            parser: parsers.nmea.NMEA (or PerlanParser) instance, may be
+                shared by several protocols
+            on_sentence: optional function of (sentence_id, data, source)
+                called for each sentence as it is parsed. data is the tuple
+                the parser returns for the sentence and source the address
+                it came from (None for pipes)
+            stream: optional SentenceStream to put the sentences on
+
+        Returns:
+            class instance
+        """
+        self.parser = parser
+        self.on_sentence = on_sentence
+        self.stream = stream
+        self.transport = None
+        self._peer = None
+        # unterminated line at the end of the stream data so far
+        self._partial_line = b''
+        self._closed = asyncio.Event()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._peer = transport.get_extra_info('peername')
+
+    def data_received(self, data):
+        data = self._partial_line + data
+        end = data.rfind(b'\n')
+        self._partial_line = data[end + 1:]
+        if len(self._partial_line) > parsers.nmea._MAX_PARTIAL_LINE:
+            self._partial_line = b''
+        if end >= 0:
+            self._publish(self.parser.feed(data[:end + 1]), self._peer)
+
+    def datagram_received(self, data, addr):
+        # datagrams can arrive out of order, so joining lines across them
+        # isn't reliable and would keep state for every sender
+        if not data.endswith(b'\n'):
+            data += b'\n'
+        self._publish(self.parser.feed(data), addr)
+
+    def eof_received(self):
+        self._flush()
+
+    def error_received(self, exc):
+        # an icmp error for an earlier datagram, keep listening
+        pass
+
+    def connection_lost(self, exc):
+        self._flush()
+        if self.stream is not None:
+            self.stream.discard(self.transport)
+        self._closed.set()
+
+    async def wait_closed(self):
+        """ Wait until the transport has closed
+
+        Arguments:
+            no arguments
+
+        Returns:
+            no returns
+        """
+        await self._closed.wait()
+
+    def _flush(self):
+        """ Parse the unterminated last line of the stream
+
+        Arguments:
+            no arguments
+
+        Returns:
+            no returns
+        """
+        partial_line = self._partial_line
+        self._partial_line = b''
+        if partial_line:
+            self._publish(self.parser.feed(partial_line + b'\n'), self._peer)
+
+    def _publish(self, sentences, source):
+        """ Hand parsed sentences to the callback and stream
+
+        Arguments:
+            sentences: list of (id, data) tuples returned by parser.feed
+            source: address the sentences came from
+
+        Returns:
+            no returns
+        """
+        for sentence_id, data in sentences:
+            # sentences which failed to parse
+            if data is None:
+                continue
+            if self.on_sentence is not None:
+                self.on_sentence(sentence_id, data, source)
+            if self.stream is not None:
+                self.stream.put((sentence_id, data, source), self.transport)
+
+def _protocol_factory(parser, on_sentence, stream):
+    """ Make a function which makes protocols sharing a parser
+    """
+    return lambda: NMEAStreamProtocol(parser, on_sentence, stream)
+
+async def open_udp(parser, local_addr, on_sentence=None, stream=None):
+    """ Listen for nmea datagrams
+
+    Arguments:
+        parser: parser to feed, see NMEAStreamProtocol
+        local_addr: (host, port) tuple to listen on
+        on_sentence: optional callback, see NMEAStreamProtocol
+        stream: optional SentenceStream to put the sentences on
+
+    Returns:
+        transport: asyncio datagram transport, close it to stop listening
+        protocol: NMEAStreamProtocol instance
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.create_datagram_endpoint(
+        _protocol_factory(parser, on_sentence, stream), local_addr=local_addr)
+
+async def open_tcp(parser, host, port, on_sentence=None, stream=None):
+    """ Connect to a TCP server sending nmea data
+
+    Arguments:
+        parser: parser to feed, see NMEAStreamProtocol
+        host: server host name or address
+        port: server port
+        on_sentence: optional callback, see NMEAStreamProtocol
+        stream: optional SentenceStream to put the sentences on
+
+    Returns:
+        transport: asyncio transport, close it to disconnect
+        protocol: NMEAStreamProtocol instance
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.create_connection(
+        _protocol_factory(parser, on_sentence, stream), host, port)
+
+async def serve_tcp(parser, host, port, on_sentence=None, stream=None):
+    """ Accept TCP connections from senders of nmea data
+
+    Every connection gets its own protocol, all feeding the same parser,
+    callback and stream.
+
+    Arguments:
+        parser: parser to feed, see NMEAStreamProtocol
+        host: address to listen on
+        port: port to listen on
+        on_sentence: optional callback, see NMEAStreamProtocol
+        stream: optional SentenceStream to put the sentences on
+
+    Returns:
+        server: asyncio Server, close it to stop accepting connections
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.create_server(
+        _protocol_factory(parser, on_sentence, stream), host, port)
+
+async def open_serial(parser, device_path, on_sentence=None, stream=None):
+    """ Read nmea data from a serial port or pty
+
+    The device is opened read only and non-blocking. Port settings such as
+    the baud rate must be set beforehand (ex with stty). Not available on
+    windows.
+
+    Arguments:
+        parser: parser to feed, see NMEAStreamProtocol
+        device_path: path to the device, ex /dev/ttyUSB0
+        on_sentence: optional callback, see NMEAStreamProtocol
+        stream: optional SentenceStream to put the sentences on
+
+    Returns:
+        transport: asyncio read pipe transport, close it to stop reading
+        protocol: NMEAStreamProtocol instance
+    """
+    loop = asyncio.get_running_loop()
+    fd = os.open(device_path, os.O_RDONLY | os.O_NOCTTY | os.O_NONBLOCK)
+    device = os.fdopen(fd, 'rb', buffering=0)
+    try:
+        return await loop.connect_read_pipe(
+            _protocol_factory(parser, on_sentence, stream), device)
+    except Exception:
+        device.close()
+        raise
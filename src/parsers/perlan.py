@@ -1,19 +1,12 @@
 
-import pdb
-
-import os
-
-import re
-import datetime
-
 import numpy
-import scipy.interpolate
-
-import geodesy.conversions
 
 import parsers.nmea
 
-import time
+# columns of the tables of LXWP0 and therm data
+_LXWP0_COLUMNS = (
+    'time', 'baro_altitude', 'v_ias', 'edot', 'psi', 'u_wind', 'v_wind')
+_THERM_COLUMNS = ('time', 'OAT', 'therm_field_1', 'therm_field_2')
 
 class PerlanParser(parsers.nmea.NMEA):
     """Parser for data stream from the perlan
@@ -24,72 +17,74 @@ class PerlanParser(parsers.nmea.NMEA):
     messages. This means that the time in LXNAV messages could be off by up to
     the GPSRMC interval (usually 1 second)
     """
-    def __init__(self, file_path=None, string_data=None):
+    _CACHED_COLUMNS = parsers.nmea.NMEA._CACHED_COLUMNS + (
+        '_lxwp0', '_therm')
+    _CACHED_STATE = parsers.nmea.NMEA._CACHED_STATE + ('_latest_time',)
+    # lines look like "<counter>:$GPRMC,..."
+    _SENTENCE_PREFIX = ':'
+    _INTERPOLATED = dict(parsers.nmea.NMEA._INTERPOLATED)
+    _INTERPOLATED.update({
+        '_lxwp0': ([
+            ('baro_altitude', 1),
+            ('v_ias', 2),
+            ('edot', 3),
+            ('psi', 4),
+            ('wind', slice(5, 7)),
+            ], {'psi': 0.0}),
+        '_therm': ([
+            ('OAT', 1),
+            ('therm_field_1', 2),
+            ('therm_field_2', 3),
+            ], None),
+        })
+
+    def __init__(
+            self, file_path=None, string_data=None, cache=None,
+            retention=None):
         """constructor
 
         Arguments:
             file_path: path to a file with nmea data in it
             string_data: alternate option, can directly pass nmea data to
                 be parsed.
+            cache: optional parsers.cache.ParseCache used when parsing
+                file_path
+            retention: optional number of samples of each channel to keep,
+                see parsers.nmea.NMEA
 
         Returns:
             class instance
         """
-        super(PerlanParser, self).__init__()
+        super(PerlanParser, self).__init__(retention=retention)
 
         self._latest_time = None
 
-        self._time_lxwp0 = []
-        self._baro_altitude = []
-        self._v_ias = []
-        self._edot = []
-        self._psi = []
-        self._wind = []
-
-        self._time_therm = []
-        self._OAT = []
-        self._therm_field_1 = []
-        self._therm_field_2 = []
+        self._lxwp0 = self._new_table(len(_LXWP0_COLUMNS))
+        self._therm = self._new_table(len(_THERM_COLUMNS))
 
         additional_parsers = {
-            'LXWP0': self.parse_lxwp0,
-            'therm': self.parse_therm,
+            'LXWP0': self._parse_lxwp0_fields,
+            'therm': self._parse_therm_fields,
             }
         self._sentence_parsers.update(additional_parsers)
 
-        self._extract_sentence_header = self._get_perlan_header
-
         if file_path is not None:
-            self.parse_file(file_path)
+            self.parse_file(file_path, cache)
             return
         if string_data is not None:
             self.parse_string(string_data)
             return
 
-    def _get_perlan_header(self, string_data):
-        """Get an nmea header from string data
-
-        Arguments:
-            string_data: a string with an nmea sentence
-
-        Returns:
-            header: string with just the sentence id
-        """
-        search_result = re.search('.+\:\$([a-zA-Z0-9]+),', string_data)
-        if not search_result:
-            return
-        return search_result.groups()[0]
-
-    def parse_rmc(self, string_data, save=True):
-        """Redefinition of parse_rmc to save the time
+    def _parse_rmc_fields(self, data, checksum_ok, save=True):
+        """Redefinition of _parse_rmc_fields to save the time
         """
-        if ':' in string_data:
-            string_data = string_data.split(':')[1]
-        rmc_data = super(PerlanParser, self).parse_rmc(string_data, save)
+        rmc_data = super(PerlanParser, self)._parse_rmc_fields(
+            data, checksum_ok, save)
         if rmc_data:
             self._latest_time = rmc_data[0]
         else:
             self._latest_time = None
+        return rmc_data
 
     def parse_lxwp0(self, string_data, save=True):
         """Parse an lxnav LXWP0 message
@@ -107,12 +102,27 @@ class PerlanParser(parsers.nmea.NMEA):
                 u_wind: east wind component (m/s)
                 v_wind: north wind component (m/s)
         """
-        data = re.split(',|\*', string_data)
+        fields, checksum_ok = parsers.nmea._split_sentence(string_data)
+        if fields is None:
+            return None
+        with self._lock:
+            return self._parse_lxwp0_fields(fields, checksum_ok, save)
 
-        if len(data) <= 13:
+    def _parse_lxwp0_fields(self, data, checksum_ok, save=True):
+        """Parse the fields of an lxnav LXWP0 message
+
+        Arguments:
+            data: list of the message fields, starting with the id
+            checksum_ok: True if the message checksum matched, not required
+            save: save this data
+
+        Returns:
+            lxwp0_data: tuple containing lxwp0 data, see parse_lxwp0
+        """
+        if len(data) <= 12:
             return None
-        if len(self._time_lxwp0) > 0:
-            if self._latest_time == self._time_lxwp0[-1]:
+        if len(self._lxwp0) > 0:
+            if self._latest_time == self._lxwp0.last()[0]:
                 return None
 
         v_ias = float(data[2]) * 1000.0 / 3600.0
@@ -138,37 +148,46 @@ class PerlanParser(parsers.nmea.NMEA):
         v_wind = -wind_M * numpy.cos(wind_psi)
 
         if save and self._latest_time is not None:
-            self._time_lxwp0.append(self._latest_time)
+            self._lxwp0.append((
+                self._latest_time, h_baro, v_ias, edot, psi, u_wind, v_wind))
 
-            self._baro_altitude.append(h_baro)
-            self._v_ias.append(v_ias)
-            self._edot.append(edot)
-            self._psi.append(psi)
-            self._wind.append(numpy.array([u_wind, v_wind]))
+        return (v_ias, h_baro, edot, psi, u_wind, v_wind)
 
     def parse_therm(self, string_data, save=True):
         """Parse a perlan therm message
 
         Arguments:
-            string_data: string with an LXWP0 message in it
+            string_data: string with a therm message in it
             save: save this data
 
         Returns:
-            lxwp0_data: tuple containing lxwp0 data
-                v_ias: indicated airspeed (m/s)
-                h_baro: barometric altitude (m)
-                edot: vario reading (m/s)
-                psi: heading (rad)
-                u_wind: east wind component (m/s)
-                v_wind: north wind component (m/s)
+            therm_data: tuple containing therm data
+                OAT: outside air temperature
+                therm_field_1: value of therm message field 1
+                therm_field_2: value of therm message field 2
         """
-        data = re.split(',|\*', string_data)
+        fields, checksum_ok = parsers.nmea._split_sentence(string_data)
+        if fields is None:
+            return None
+        with self._lock:
+            return self._parse_therm_fields(fields, checksum_ok, save)
 
+    def _parse_therm_fields(self, data, checksum_ok, save=True):
+        """Parse the fields of a perlan therm message
+
+        Arguments:
+            data: list of the message fields, starting with the id
+            checksum_ok: True if the message checksum matched, not required
+            save: save this data
+
+        Returns:
+            therm_data: tuple containing therm data, see parse_therm
+        """
         if len(data) <= 3:
             return None
 
-        if len(self._time_therm) > 0:
-            if self._latest_time == self._time_therm[-1]:
+        if len(self._therm) > 0:
+            if self._latest_time == self._therm.last()[0]:
                 return None
 
         OAT = float(data[1])
@@ -176,11 +195,10 @@ class PerlanParser(parsers.nmea.NMEA):
         therm_field_2 = float(data[3])
 
         if save and self._latest_time is not None:
-            self._time_therm.append(self._latest_time)
+            self._therm.append((
+                self._latest_time, OAT, therm_field_1, therm_field_2))
 
-            self._OAT.append(OAT)
-            self._therm_field_1.append(therm_field_1)
-            self._therm_field_2.append(therm_field_2)
+        return (OAT, therm_field_1, therm_field_2)
 
     def baro_altitude(self, time=None):
         """ Get barometric altitude at specified times
@@ -194,14 +212,10 @@ class PerlanParser(parsers.nmea.NMEA):
             baro_altitude: in m at specified epochs
         """
         if time is None:
-            return (
-                numpy.array(self._time_lxwp0),
-                numpy.array(self._baro_altitude))
-
-        if not self._is_interps_current:
-            self._generate_interps()
+            lxwp0 = self._snapshot(self._lxwp0)
+            return (lxwp0[:, 0], lxwp0[:, 1])
 
-        return (time, self._interp_baro_altitude(time))
+        return (time, self._interpolate('_lxwp0', 'baro_altitude', time))
 
     def v_ias(self, time=None):
         """ Get indicated airspeed at specified times
@@ -215,14 +229,10 @@ class PerlanParser(parsers.nmea.NMEA):
             v_ias: in m/s at specified epochs
         """
         if time is None:
-            return (
-                numpy.array(self._time_lxwp0),
-                numpy.array(self._v_ias))
-
-        if not self._is_interps_current:
-            self._generate_interps()
+            lxwp0 = self._snapshot(self._lxwp0)
+            return (lxwp0[:, 0], lxwp0[:, 2])
 
-        return (time, self._interp_v_ias(time))
+        return (time, self._interpolate('_lxwp0', 'v_ias', time))
 
     def edot(self, time=None):
         """ Get vario reading at specified times
@@ -236,14 +246,10 @@ class PerlanParser(parsers.nmea.NMEA):
             edot: specific total energy rate in m/s at specified epochs
         """
         if time is None:
-            return (
-                numpy.array(self._time_lxwp0),
-                numpy.array(self._edot))
+            lxwp0 = self._snapshot(self._lxwp0)
+            return (lxwp0[:, 0], lxwp0[:, 3])
 
-        if not self._is_interps_current:
-            self._generate_interps()
-
-        return (time, self._interp_edot(time))
+        return (time, self._interpolate('_lxwp0', 'edot', time))
 
     def psi(self, time=None):
         """ Get heading at specified times
@@ -257,14 +263,10 @@ class PerlanParser(parsers.nmea.NMEA):
             psi: heading angle in radians at specified epochs
         """
         if time is None:
-            return (
-                numpy.array(self._time_lxwp0),
-                numpy.array(self._psi))
-
-        if not self._is_interps_current:
-            self._generate_interps()
+            lxwp0 = self._snapshot(self._lxwp0)
+            return (lxwp0[:, 0], lxwp0[:, 4])
 
-        return (time, self._interp_psi(time))
+        return (time, self._interpolate('_lxwp0', 'psi', time))
 
     def wind(self, time=None):
         """ Get wind at specified times
@@ -278,14 +280,10 @@ class PerlanParser(parsers.nmea.NMEA):
             wind: wind vector in m/s at specified epochs
         """
         if time is None:
-            return (
-                numpy.array(self._time_lxwp0),
-                numpy.array(self._wind))
-
-        if not self._is_interps_current:
-            self._generate_interps()
+            lxwp0 = self._snapshot(self._lxwp0)
+            return (lxwp0[:, 0], lxwp0[:, 5:7])
 
-        return (time, self._interp_wind(time))
+        return (time, self._interpolate('_lxwp0', 'wind', time))
 
     def OAT(self, time=None):
         """Get outside air temperature at specified times
@@ -298,14 +296,10 @@ class PerlanParser(parsers.nmea.NMEA):
             OAT: outside air temperature at requested times
         """
         if time is None:
-            return (
-                numpy.array(self._time_therm),
-                numpy.array(self._OAT))
+            therm = self._snapshot(self._therm)
+            return (therm[:, 0], therm[:, 1])
 
-        if not self._is_interps_current:
-            self._generate_interps()
-
-        return (time, self._interp_OAT(time))
+        return (time, self._interpolate('_therm', 'OAT', time))
 
     def therm_field_1(self, time=None):
         """Get therm message field 1
@@ -318,14 +312,10 @@ class PerlanParser(parsers.nmea.NMEA):
             value: values of therm_field_1 at requested times
         """
         if time is None:
-            return (
-                numpy.array(self._time_therm),
-                numpy.array(self._therm_field_1))
-
-        if not self._is_interps_current:
-            self._generate_interps()
+            therm = self._snapshot(self._therm)
+            return (therm[:, 0], therm[:, 2])
 
-        return (time, self._interp_therm_field_1(time))
+        return (time, self._interpolate('_therm', 'therm_field_1', time))
 
     def therm_field_2(self, time=None):
         """Get therm message field 1
@@ -338,60 +328,7 @@ class PerlanParser(parsers.nmea.NMEA):
             value: values of therm_field_2 at requested times
         """
         if time is None:
-            return (
-                numpy.array(self._time_therm),
-                numpy.array(self._therm_field_2))
-
-        if not self._is_interps_current:
-            self._generate_interps()
-
-        return (time, self._interp_therm_field_2(time))
-
-    def clear_interp(self):
-        """Clear interpolators so we can pickle
-        """
-        super(PerlanParser, self).clear_interp()
-
-        self._interp_baro_altitude = None
-        self._interp_v_ias = None
-        self._interp_edot = None
-        self._interp_psi = None
-        self._interp_wind = None
+            therm = self._snapshot(self._therm)
+            return (therm[:, 0], therm[:, 3])
 
-        self._interp_OAT = None
-        self._interp_therm_field_1 = None
-        self._interp_therm_field_2 = None
-
-    def _generate_interps(self):
-        """Generate interpolating functions
-
-        Arguments:
-            no arguments
-
-        Returns:
-            no returns
-        """
-        while self._reading:
-            time.sleep(0.001)
-
-        self._interp_baro_altitude = scipy.interpolate.interp1d(
-            numpy.array(self._time_lxwp0),
-            numpy.array(self._baro_altitude))
-        self._interp_v_ias = scipy.interpolate.interp1d(
-            numpy.array(self._time_lxwp0), numpy.array(self._v_ias))
-        self._interp_edot = scipy.interpolate.interp1d(
-            numpy.array(self._time_lxwp0), numpy.array(self._edot))
-        self._interp_psi = scipy.interpolate.interp1d(
-            numpy.array(self._time_lxwp0), numpy.array(self._psi))
-        self._interp_wind= scipy.interpolate.interp1d(
-            numpy.array(self._time_lxwp0), numpy.array(self._wind), axis=0)
-        self._interp_OAT= scipy.interpolate.interp1d(
-            numpy.array(self._time_therm), numpy.array(self._OAT), axis=0)
-        self._interp_therm_field_1 = scipy.interpolate.interp1d(
-            numpy.array(self._time_therm),
-            numpy.array(self._therm_field_1), axis=0)
-        self._interp_therm_field_2 = scipy.interpolate.interp1d(
-            numpy.array(self._time_therm),
-            numpy.array(self._therm_field_2), axis=0)
-
-        super(PerlanParser, self)._generate_interps()
+        return (time, self._interpolate('_therm', 'therm_field_2', time))